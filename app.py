@@ -1,303 +1,614 @@
 import streamlit as st
 import base64
-import uuid
+import hashlib
+import math
 import os
-from fpdf import FPDF
+import time
+import uuid
 from dotenv import load_dotenv
 from modules.audio_bar import CustomAudioPlayer
+from modules.audio_encoder import AUDIO_BITRATES, AUDIO_FORMATS, mime_type_for
 
-from modules.settings_manager import SettingsManager
-from modules.voice_assistant import VoiceAssistant
-from modules.explainer import CodeExplainer
-from modules.history_manager import HistoryManager
+from modules.explainer import StreamError
+from modules.history_storage import DEFAULT_NAMESPACE, normalize_namespace
+from modules.batch_explainer import read_uploaded_files, explain_files
+from modules.prompt_compactor import COMPACTION_LEVELS
+from modules.resources import create_app_resources
+from modules.retention import format_bytes
 
 load_dotenv("codi.env")  # specify the custom filename
 
 HF_TOKEN = os.getenv("HF_TOKEN")
 
-settings_mgr = SettingsManager()
-voice_mgr = VoiceAssistant()
-explainer = CodeExplainer(HF_TOKEN)
-history_mgr = HistoryManager()
-# audio_bar = CustomAudioPlayer()
-
-# --------------------- Page Config --------------------- #
-st.set_page_config(page_title="project_Codi", layout="wide")
-# st.title("👩‍💻 Codi")
-st.markdown("<h1 style='text-align: center;'>👩‍💻 Codi</h1>", unsafe_allow_html=True)
-
-tabs = st.tabs(["📘 File upload","🕘 History"])
-
-# audio_file_url = "./modules/data/audio/test.mp3"
-
-# --------------------- Initialize Settings --------------------- #
-if "settings_loaded" not in st.session_state:
-    loaded_settings = settings_mgr.load_settings()
-    if loaded_settings:
-        for key, value in loaded_settings.items():
-            st.session_state[key] = value
-        st.session_state.settings_loaded = True
-
-# Save upload to history if not already present
-if "upload_history" not in st.session_state:
-    st.session_state.upload_history = history_mgr.load_upload_history()
-# save explanation history
-if "explanation_history" not in st.session_state:
-    st.session_state.explanation_history = history_mgr.load_explanation_history()
-# save chat history
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = history_mgr.load_chat_history()
-
-
-# --------------------- Sidebar --------------------- #
-st.sidebar.header("⚙️ Settings")
-
-# Toggles with tracked updates
-va_toggle = st.sidebar.toggle("🎙️ Enable Voice Assistant", st.session_state.voice_assistant)
-if va_toggle != st.session_state.voice_assistant:
-    st.session_state.voice_assistant = va_toggle
-
-
-st.session_state.voice_gender = st.sidebar.selectbox("Assistant Voice Gender", ["Neutral", "Female", "Male"], index=["Neutral", "Female", "Male"].index(st.session_state.voice_gender))
-
-
-# Explanation style buttons
-st.sidebar.header("📖 Explanation Style")
-if st.sidebar.button("Reiterate"):
-    st.session_state.explanation_style = "Reiterate"
-if st.sidebar.button("Concise"):
-    st.session_state.explanation_style = "concise"
-if st.sidebar.button("In-Depth"):
-    st.session_state.explanation_style = "in-depth"
-st.sidebar.write(f"Current Style: {st.session_state.explanation_style.capitalize()}")
-
-# Save button
-if st.sidebar.button("💾 Save Settings"):
-    settings_to_save = {
-        "voice_assistant": st.session_state.voice_assistant,
-        "voice_activation": st.session_state.voice_activation,
-        "voice_gender": st.session_state.voice_gender,
-        "explanation_style": st.session_state.explanation_style,
-    }
-    settings_mgr.save_settings(settings_to_save)
-    st.sidebar.success("Settings saved!")
-
-# --------------------- Explanation UI --------------------- #
-# Collapsible explanation display
-def display_explanation(explanation_txt):
-    with st.expander("📘 View Explanation", expanded=True):
-        st.text_area("Explanation", explanation_txt, height=200, disabled=True, label_visibility="collapsed")
-        b64 = base64.b64encode(explanation_txt.encode()).decode()
-        href = f'<a href="data:file/txt;base64,{b64}" download="explanation.txt">📄 Download as .txt</a>'
-        st.markdown(href, unsafe_allow_html=True)
-
-# --------------------- Main Tabs --------------------- #
-with tabs[0]:
-    uploaded_code = None
-    st.header("Upload Your File")
-    left_col, mid_col, right_col = st.columns([2, 0.5, 2])
-
-    with left_col:
-        uploaded_file = st.file_uploader(label="Upload a python file", type="py")
-        has_uploaded = uploaded_file is not None
-
-        if has_uploaded:
-            uploaded_code = uploaded_file.read().decode("utf-8")
-            st.code(uploaded_code, language="python", height=415)
-
-            # Prevent duplicate insert on rerun
-            if not st.session_state.get("uploaded_file_saved") or st.session_state.get("last_uploaded_filename") != uploaded_file.name:
-                new_entry = {
-                    "filename": uploaded_file.name,
-                    "content": uploaded_code,
-                }
-                st.session_state.upload_history.insert(0, new_entry)
-                history_mgr.save_upload_history(st.session_state.upload_history)
-
-                # Mark as saved with current filename
-                st.session_state.uploaded_file_saved = True
-                st.session_state.last_uploaded_filename = uploaded_file.name
+@st.cache_resource
+def get_resources():
+    # Created once per server process and shared by all sessions; everything starts warming
+    # up in the background as soon as the first page loads
+    resources = create_app_resources(HF_TOKEN)
+    resources.warm_up()
+    return resources
+
+
+# Number of entries shown per page of the History tab
+HISTORY_PAGE_SIZE = 20
+
+
+# The page itself, run by Streamlit on every interaction
+def main():
+    resources = get_resources()
+    settings_mgr = resources.get("settings")
+    pipeline = resources.get("pipeline")
+    media_server = resources.get("media_server")
+    retention_sweeper = resources.get("retention")
+
+    # Explainer of this session: shares the caches and HTTP connections of the process-wide one
+    if "explainer" not in st.session_state:
+        st.session_state.explainer = resources.get("explainer").for_session()
+    explainer = st.session_state.explainer
+
+    # History of this session: ?user=<name> in the URL keeps a separate history per user, and
+    # CODI_HISTORY_PER_SESSION=1 gives every browser session its own history
+    if "history_namespace" not in st.session_state:
+        history_user = st.query_params.get("user")
+        if not history_user and os.getenv("CODI_HISTORY_PER_SESSION") == "1":
+            history_user = f"session-{uuid.uuid4().hex[:12]}"
+        st.session_state.history_namespace = normalize_namespace(history_user)
+    history_mgr = resources.get("history").for_namespace(st.session_state.history_namespace)
+    # audio_bar = CustomAudioPlayer()
+
+    # --------------------- Page Config --------------------- #
+    st.set_page_config(page_title="project_Codi", layout="wide")
+    # st.title("👩‍💻 Codi")
+    st.markdown("<h1 style='text-align: center;'>👩‍💻 Codi</h1>", unsafe_allow_html=True)
+
+    tabs = st.tabs(["📘 File upload","🕘 History"])
+
+    # audio_file_url = "./modules/data/audio/test.mp3"
+
+    # --------------------- Initialize Settings --------------------- #
+    if "settings_loaded" not in st.session_state:
+        loaded_settings = settings_mgr.load_settings()
+        if loaded_settings:
+            for key, value in loaded_settings.items():
+                st.session_state[key] = value
+            st.session_state.settings_loaded = True
+
+    # background PDF/audio jobs of this session, keyed by explanation
+    if "artifact_jobs" not in st.session_state:
+        st.session_state.artifact_jobs = {}
+
+
+    # --------------------- Sidebar --------------------- #
+    st.sidebar.header("⚙️ Settings")
+
+    # Toggles with tracked updates
+    va_toggle = st.sidebar.toggle("🎙️ Enable Voice Assistant", st.session_state.voice_assistant)
+    if va_toggle != st.session_state.voice_assistant:
+        st.session_state.voice_assistant = va_toggle
+
+
+    st.session_state.voice_gender = st.sidebar.selectbox("Assistant Voice Gender", ["Neutral", "Female", "Male"], index=["Neutral", "Female", "Male"].index(st.session_state.voice_gender))
+
+    # Audio output format (kept as WAV when no local encoder is installed)
+    audio_codecs = list(AUDIO_FORMATS)
+    st.session_state.audio_codec = st.sidebar.selectbox("Audio Format", audio_codecs, index=audio_codecs.index(st.session_state.audio_codec))
+    st.session_state.audio_bitrate = st.sidebar.selectbox(
+        "Audio Bitrate",
+        AUDIO_BITRATES,
+        index=AUDIO_BITRATES.index(st.session_state.audio_bitrate),
+        disabled=st.session_state.audio_codec == "wav"
+    )
+
+
+    # Explanation style buttons
+    st.sidebar.header("📖 Explanation Style")
+    if st.sidebar.button("Reiterate"):
+        st.session_state.explanation_style = "Reiterate"
+    if st.sidebar.button("Concise"):
+        st.session_state.explanation_style = "concise"
+    if st.sidebar.button("In-Depth"):
+        st.session_state.explanation_style = "in-depth"
+    st.sidebar.write(f"Current Style: {st.session_state.explanation_style.capitalize()}")
+
+    # Prompt compaction level
+    st.sidebar.header("🗜️ Prompt Compaction")
+    st.session_state.prompt_compaction = st.sidebar.selectbox(
+        "Compaction level",
+        COMPACTION_LEVELS,
+        index=COMPACTION_LEVELS.index(st.session_state.prompt_compaction),
+        help="Strips comments, docstrings and blank lines from code before it is sent to the model."
+    )
+    explainer.compactor.level = st.session_state.prompt_compaction
+
+    st.sidebar.header("🧹 Storage")
+    if st.sidebar.button("Clean Up Now"):
+        with st.sidebar.spinner("Cleaning up..."):
+            retention_sweeper.sweep_now()
+    report = retention_sweeper.last_report
+    if report:
+        removed_entries = sum(report["entries"].values())
+        st.sidebar.caption(
+            f"Last cleanup {time.strftime('%H:%M', time.localtime(report['finished_at']))}: "
+            f"reclaimed {format_bytes(report['bytes_reclaimed'])} "
+            f"({report['orphans'] + report['evicted']} files, {removed_entries} history entries). "
+            f"Generated files: {format_bytes(report['artifact_bytes'])}; "
+            f"reclaimed since start: {format_bytes(retention_sweeper.total_bytes_reclaimed)}."
+        )
+
+    # Shared resources: state, creation time and health of each (checked only while open)
+    resources_panel = st.sidebar.expander("🩺 Resources", key="resources_panel", on_change="rerun")
+    with resources_panel:
+        for status in (resources.health() if resources_panel.open else ()):
+            icon = {True: "🟢", False: "🔴"}.get(status["healthy"], "⚪")
+            timing = f" · built in {status['build_seconds']:.2f}s" if status["build_seconds"] is not None else ""
+            st.caption(f"{icon} **{status['description']}** ({status['state']}{timing}) {status['detail']}")
+        if resources.warm_up_seconds is not None:
+            st.caption(f"Warm-up finished in {resources.warm_up_seconds:.2f}s.")
+
+    # Save button
+    if st.sidebar.button("💾 Save Settings"):
+        settings_to_save = {
+            "voice_assistant": st.session_state.voice_assistant,
+            "voice_activation": st.session_state.voice_activation,
+            "voice_gender": st.session_state.voice_gender,
+            "explanation_style": st.session_state.explanation_style,
+            "prompt_compaction": st.session_state.prompt_compaction,
+            "audio_codec": st.session_state.audio_codec,
+            "audio_bitrate": st.session_state.audio_bitrate,
+        }
+        settings_mgr.save_settings(settings_to_save)
+        st.sidebar.success("Settings saved!")
+
+    # --------------------- Explanation UI --------------------- #
+    # Collapsible explanation display
+    def display_explanation(explanation_txt):
+        with st.expander("📘 View Explanation", expanded=True):
+            # Render a token stream incrementally, then keep the full text for downloads
+            if not isinstance(explanation_txt, str):
+                try:
+                    explanation_txt = st.write_stream(explanation_txt)
+                except StreamError as e:
+                    # The tokens shown so far are incomplete: report the failure, keep nothing
+                    st.error(str(e))
+                    return None
+            else:
+                st.text_area("Explanation", explanation_txt, height=200, disabled=True, label_visibility="collapsed")
+            b64 = base64.b64encode(explanation_txt.encode()).decode()
+            href = f'<a href="data:file/txt;base64,{b64}" download="explanation.txt">📄 Download as .txt</a>'
+            st.markdown(href, unsafe_allow_html=True)
+        return explanation_txt
+
+    # One page of a history for the History tab, with its page selector
+    def history_page(kind, fields):
+        """
+        Shows the page selector of a history and loads the entries of the selected page.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+            fields (tuple): Fields needed to list the entries (the rest is loaded on demand).
+
+        Returns:
+            tuple: Entries of the page, offset of its first entry and the total number of entries.
+        """
+        total = history_mgr.count(kind)
+        pages = max(1, math.ceil(total / HISTORY_PAGE_SIZE))
+        page_key = f"{kind}_history_page"
+        # The history may have shrunk since the page was picked
+        if st.session_state.get(page_key, 1) > pages:
+            st.session_state[page_key] = pages
+        page = 1
+        if pages > 1:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key)
+            st.caption(f"{total} entries")
+        offset = (page - 1) * HISTORY_PAGE_SIZE
+        return history_mgr.query(kind, offset, HISTORY_PAGE_SIZE, fields=fields), offset, total
+
+    # Download and player widgets for finished background jobs
+    def show_artifacts(job_key, jobs, filename):
+        pdf_job, audio_job = jobs["pdf"], jobs["audio"]
+        if pdf_job.done() and pdf_job.exception() is None:
+            with open(pdf_job.result(), "rb") as pdf_file:
+                st.download_button("📄 Download as PDF", pdf_file.read(), file_name=f"{filename}_explanation.pdf", mime="application/pdf")
+        if audio_job is not None and audio_job.done() and audio_job.exception() is None:
+            # A listener who already started the preview keeps playing its segments
+            audio_bar = CustomAudioPlayer(
+                audio_job.result(), media_server=media_server, state_key=job_key,
+                resume_segments=jobs["audio_segments"] if jobs.get("audio_preview") else None
+            )
+            audio_bar.render()
+
+        # Record finished artifacts on the history entry of this explanation
+        entry = jobs.get("entry")
+        if entry is not None and not jobs.get("recorded"):
+            artifact_paths = {"pdf_path": pdf_job.result() if pdf_job.exception() is None else None}
+            if audio_job is not None:
+                artifact_paths["audio_path"] = audio_job.result() if audio_job.exception() is None else None
+            entry.update(artifact_paths)
+            history_mgr.update_explanation(entry["id"], artifact_paths)
+            jobs["recorded"] = True
+
+    @st.fragment(run_every=1)
+    def poll_artifacts(job_key, jobs):
+        # Re-run only this fragment until every job has finished, then refresh the page once
+        pending = [job for job in (jobs["pdf"], jobs["audio"]) if job is not None and not job.done()]
+        if pending:
+            st.caption("⏳ Preparing PDF and audio in the background...")
+            # Play the segments synthesized so far. The player is re-rendered as more arrive
+            # and resumes where the previous one was (see CustomAudioPlayer's state_key)
+            if jobs["audio"] is not None and not jobs["audio"].done() and jobs["audio_segments"]:
+                jobs["audio_preview"] = True
+                CustomAudioPlayer(
+                    segments=jobs["audio_segments"], media_server=media_server, state_key=job_key
+                ).render()
         else:
-            st.session_state.uploaded_file_saved = False
-            st.session_state.last_uploaded_filename = None
-    with right_col:
-        if has_uploaded:
-            explanation = explainer.explain_code(uploaded_code, st.session_state.explanation_style)
-            display_explanation(explanation)
-            # Generate PDF and audio once, save paths
-            file_id = str(uuid.uuid4())
-
-            # PDF generation
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_auto_page_break(auto=True, margin=15)
-
-            # Add a Unicode font
-            pdf.add_font("DejaVu", "", "./modules/data/fonts/DejaVuSans.ttf", uni=True)
-            pdf.set_font("DejaVu", size=12)
-
-            for line in explanation.split('\n'):
-                pdf.multi_cell(0, 10, txt=line)
-
-            pdf_path = f"./modules/data/expl_{file_id}.pdf"
-            pdf.output(pdf_path)
-
-            # Audio generation
-            engine = voice_mgr.set_voice_by_gender(st.session_state.voice_gender)
-            audio_path = f"./modules/data/audio/{file_id}.mp3"
-            voice_mgr.save_audio(explanation,audio_path)
-
-            # Store explanation history with file paths
-            explanation_entry = {
-                "filename": uploaded_file.name,
-                "explanation": explanation,
-                "pdf_path": pdf_path,
-                "audio_path": audio_path,
-            }
-            if not st.session_state.get("explanation_saved") or st.session_state.get("last_explained_filename") != uploaded_file.name:
-                explanation_entry = {
-                    "filename": uploaded_file.name,
-                    "explanation": explanation
-                }
-                st.session_state.explanation_history.insert(0, explanation_entry)
-                history_mgr.save_explanation_history(st.session_state.explanation_history)
-
-                st.session_state.explanation_saved = True
-                st.session_state.last_explained_filename = uploaded_file.name
-            if st.session_state.voice_assistant:
-                engine = voice_mgr.set_voice_by_gender(st.session_state.voice_gender)
-                audio_path = voice_mgr.save_audio(explanation, f"./modules/data/audio/{file_id}.mp3")
-                audio_bar = CustomAudioPlayer(audio_path)
-                audio_bar.render()
-                
+            st.rerun()
+
+    # In-memory PDF for a history export; a failed render is reported instead of breaking the tab
+    def export_pdf(text):
+        try:
+            return pipeline.pdf_renderer.render(text)
+        except Exception as e:
+            st.error(f"❌ Could not create the PDF: {e}")
+            return None
+
+    def render_artifacts(job_key, filename):
+        jobs = st.session_state.artifact_jobs[job_key]
+        if all(job is None or job.done() for job in (jobs["pdf"], jobs["audio"])):
+            show_artifacts(job_key, jobs, filename)
         else:
-            st.subheader("Explanation")
-            st.info("Upload a file to see the explanation here.")
-            st.session_state.explanation_saved = False
-            st.session_state.last_explained_filename = None
-
-    question = st.chat_input("Ask a question about your code")
-
-    if question:
-        answer = explainer.answer_question(question,st.session_state.explanation_style,uploaded_code)
-
-        with st.chat_message("user"):
-            st.markdown(question)
+            poll_artifacts(job_key, jobs)
+
+    # --------------------- Main Tabs --------------------- #
+    with tabs[0]:
+        uploaded_code = None
+        uploaded_name = None
+        previous_code = None
+        st.header("Upload Your File")
+        left_col, mid_col, right_col = st.columns([2, 0.5, 2])
+
+        with left_col:
+            uploaded_files = st.file_uploader(
+                label="Upload python files or a zipped package",
+                type=["py", "zip"],
+                accept_multiple_files=True
+            )
+            code_files, skipped_files = read_uploaded_files(uploaded_files)
+            for skipped_name, reason in skipped_files:
+                st.warning(f"⚠️ Skipped {skipped_name}: {reason}")
+            has_uploaded = len(code_files) > 0
+            is_batch = len(code_files) > 1
+
+            if has_uploaded:
+                if is_batch:
+                    st.caption(f"{len(code_files)} Python files uploaded")
+                    preview_name = st.selectbox("Preview file", [name for name, _ in code_files])
+                    st.code(dict(code_files)[preview_name], language="python", height=415)
+                    # Give the chat the whole package as context, one file after another
+                    uploaded_name = ", ".join(name for name, _ in code_files)
+                    uploaded_code = "\n\n".join(f"# ---- {name} ----\n{code}" for name, code in code_files)
+                else:
+                    uploaded_name, uploaded_code = code_files[0]
+                    st.code(uploaded_code, language="python", height=415)
+
+                    # An earlier, different version of this file lets us re-explain only what changed
+                    previous_entry = history_mgr.find_previous_upload(
+                        uploaded_name, history_mgr.blobs.digest(uploaded_code)
+                    )
+                    if previous_entry is not None:
+                        previous_code = history_mgr.load_upload_content(previous_entry)
+
+                # Prevent duplicate insert on rerun
+                if not st.session_state.get("uploaded_file_saved") or st.session_state.get("last_uploaded_filename") != uploaded_name:
+                    # Insert in reverse so the first uploaded file ends up on top
+                    for filename, code in reversed(code_files):
+                        new_entry = {
+                            "filename": filename,
+                            "content": code,
+                        }
+                        history_mgr.add_upload(new_entry)
+
+                    # Mark as saved with current filename
+                    st.session_state.uploaded_file_saved = True
+                    st.session_state.last_uploaded_filename = uploaded_name
+            else:
+                st.session_state.uploaded_file_saved = False
+                st.session_state.last_uploaded_filename = None
+        with right_col:
+            if is_batch:
+                st.subheader("Explanations")
+                progress = st.progress(0.0, text="Explaining files...")
+                explanations = [None] * len(code_files)
+                results = explain_files(explainer, code_files, st.session_state.explanation_style)
+                for done, (index, filename, file_explanation) in enumerate(results, start=1):
+                    progress.progress(done / len(code_files), text=f"Explained {done}/{len(code_files)}: {filename}")
+                    explanations[index] = file_explanation
+                    with st.expander(f"📘 {filename}"):
+                        st.markdown(file_explanation)
+                progress.empty()
+
+                if not st.session_state.get("explanation_saved") or st.session_state.get("last_explained_filename") != uploaded_name:
+                    for (filename, _), file_explanation in reversed(list(zip(code_files, explanations))):
+                        new_entry = {
+                            "filename": filename,
+                            "explanation": file_explanation
+                        }
+                        history_mgr.add_explanation(new_entry)
+
+                    st.session_state.explanation_saved = True
+                    st.session_state.last_explained_filename = uploaded_name
+            elif has_uploaded:
+                tokens_saved_before = explainer.tokens_saved
+                if explainer.needs_chunking(uploaded_code):
+                    # Large files are explained in token-budgeted chunks in parallel, then merged;
+                    # each chunk's explanation is cached, so after an edit only the chunks around
+                    # changed code are redone
+                    with st.spinner(
+                        "Re-explaining changed code..." if previous_code is not None
+                        else "Explaining a large file in parallel chunks..."
+                    ):
+                        explanation, report = explainer.explain_incremental(
+                            uploaded_code, st.session_state.explanation_style, previous_code
+                        )
+                    if previous_code is not None:
+                        changed = report.get("added", []) + report.get("changed", [])
+                        st.caption(
+                            f"♻️ Reused {report['reused']} cached section(s), re-explained {report['fresh']}"
+                            + (f": {', '.join(changed)}" if changed else "")
+                        )
+                    explanation = display_explanation(explanation)
+                else:
+                    # Small files take one request, which is cheaper than re-explaining chunks
+                    explanation = display_explanation(
+                        explainer.explain_code_stream(uploaded_code, st.session_state.explanation_style)
+                    )
+                # Nothing is compacted when the explanation came from the cache
+                tokens_saved = explainer.tokens_saved - tokens_saved_before
+                if tokens_saved > 0:
+                    st.caption(f"🗜️ Prompt compaction saved ~{tokens_saved} tokens")
+                # A failed stream leaves no explanation to save or turn into artifacts
+                if explanation is not None:
+                    # Store explanation history; artifact paths are added once they are ready
+                    if not st.session_state.get("explanation_saved") or st.session_state.get("last_explained_filename") != uploaded_name:
+                        explanation_entry = {
+                            "filename": uploaded_name,
+                            "explanation": explanation
+                        }
+                        history_mgr.add_explanation(explanation_entry)
+
+                        st.session_state.explanation_saved = True
+                        st.session_state.last_explained_filename = uploaded_name
+                        st.session_state.current_explanation_entry = explanation_entry
+
+                    # Generate PDF and audio in the background, once per explanation and voice
+                    job_key = hashlib.sha256(
+                        (
+                            f"{explanation}|{st.session_state.voice_assistant}|{st.session_state.voice_gender}"
+                            f"|{st.session_state.audio_codec}|{st.session_state.audio_bitrate}"
+                        ).encode("utf-8")
+                    ).hexdigest()
+                    if job_key not in st.session_state.artifact_jobs:
+                        entry = st.session_state.get("current_explanation_entry")
+                        audio_segments = []
+                        st.session_state.artifact_jobs[job_key] = {
+                            "pdf": pipeline.submit_pdf(explanation),
+                            "audio": (
+                                pipeline.submit_audio(
+                                    explanation, st.session_state.voice_gender, audio_segments,
+                                    codec=st.session_state.audio_codec, bitrate=st.session_state.audio_bitrate
+                                )
+                                if st.session_state.voice_assistant else None
+                            ),
+                            "audio_segments": audio_segments,
+                            # Only attach paths to the history entry this explanation was saved as
+                            "entry": entry if entry is not None and entry["explanation"] == explanation else None,
+                        }
+                    render_artifacts(job_key, uploaded_name)
+
+            else:
+                st.subheader("Explanation")
+                st.info("Upload a file to see the explanation here.")
+                st.session_state.explanation_saved = False
+                st.session_state.last_explained_filename = None
+
+        question = st.chat_input("Ask a question about your code")
 
-        with st.chat_message("assistant"):
-            st.markdown(answer)
-
-        # Save to history if you want
         if question:
-            if "chat_history" not in st.session_state:
-                st.session_state.chat_history = []
-
-            st.session_state.chat_history.insert(0,{"question": question, "answer": answer})
-            history_mgr.save_chat_history(st.session_state.chat_history)
-
-
-with tabs[1]:
-    st.header("History")
-    history_tabs = st.selectbox("View Your History", ["Uploads","Explanation","Chat"])
-    if history_tabs == "Uploads":
-        st.header("📜 Upload History")
-
-        if "upload_history" not in st.session_state:
-            st.session_state.upload_history = []
-
-
-        if st.session_state.upload_history:
-            # Clear history button
-            if st.button("🗑️ Clear History"):
-                st.session_state.upload_history.clear()
-                history_mgr.clear_upload_history()
-                st.success("Upload history cleared.")
-            for idx, entry in enumerate(st.session_state.upload_history):
-                filename = entry["filename"]
-                code = entry["content"]
-
-                with st.expander(f"{filename}"):
-                    st.code(code, language="python", height=300)
-
-                    # Generate a PDF
-                    # .py download link
-                    b64_py = base64.b64encode(code.encode()).decode()
-                    py_href = f'<a href="data:file/python;base64,{b64_py}" download="{filename}">🐍 Download as .py</a>'
-                    st.markdown(py_href, unsafe_allow_html=True)
-        else:
-            st.info("No file uploads yet.")
-
-    elif history_tabs == "Explanation":
-        st.header("🧠 Explanation History")
-
-        if st.session_state.explanation_history:
-            if st.button("🗑️ Clear Explanation History"):
-                st.session_state.explanation_history.clear()
-                history_mgr.clear_explanation_history()
-                st.success("Explanation history cleared.")
-
-            for idx, entry in enumerate(st.session_state.explanation_history):
-                filename = entry["filename"]
-                explanation = entry["explanation"]
-                pdf_path = entry.get("pdf_path")
-                audio_path = entry.get("audio_path")
-
-                with st.expander(f"{filename}"):
-                    st.text_area("Explanation History", explanation, height=200, disabled=True, label_visibility="collapsed", key=f"explanation_{idx}")
-
-                    # PDF download link if file exists
-                    if pdf_path and os.path.exists(pdf_path):
-                        with open(pdf_path, "rb") as pdf_file:
-                            b64_pdf = base64.b64encode(pdf_file.read()).decode()
-                            href_pdf = f'<a href="data:application/pdf;base64,{b64_pdf}" download="{filename}_explanation.pdf">📄 Download as PDF</a>'
-                            st.markdown(href_pdf, unsafe_allow_html=True)
-
-                    # MP3 download link if file exists
-                    if audio_path and os.path.exists(audio_path):
-                        with open(audio_path, "rb") as audio_file:
-                            b64_mp3 = base64.b64encode(audio_file.read()).decode()
-                            href_mp3 = f'<a href="data:audio/mp3;base64,{b64_mp3}" download="{filename}_explanation.mp3">🔊 Download MP3</a>'
-                            st.markdown(href_mp3, unsafe_allow_html=True)
-        else:
-            st.info("No explanations generated yet.")
-    elif history_tabs == "Chat":
-        st.header("💬 Chat History")
-
-        if "chat_history" not in st.session_state:
-            st.session_state.chat_history = []
-
-        if st.session_state.chat_history:
-            # Clear chat history button
-            if st.button("🗑️ Clear Chat History"):
-                st.session_state.chat_history.clear()
-                if hasattr(history_mgr, "clear_chat_history"):
+            with st.chat_message("user"):
+                st.markdown(question)
+
+            with st.chat_message("assistant"):
+                answer = explainer.lookup_answer(question, st.session_state.explanation_style, uploaded_code)
+                answer_cached = answer is not None
+                if answer_cached:
+                    st.markdown(answer)
+                    st.caption("⚡ Cached answer")
+                else:
+                    try:
+                        answer = st.write_stream(
+                            explainer.answer_question_stream(
+                                question, st.session_state.explanation_style, uploaded_code, check_cache=False
+                            )
+                        )
+                    except StreamError as e:
+                        st.error(str(e))
+                        answer = None
+
+            # Save to history if you want (a failed answer is not saved)
+            if question and answer is not None:
+                chat_entry = {"question": question, "answer": answer, "cached": answer_cached}
+                history_mgr.add_chat(chat_entry)
+
+
+    with tabs[1]:
+        st.header("History")
+        if history_mgr.namespace != DEFAULT_NAMESPACE:
+            st.caption(f"👤 History of {history_mgr.namespace}")
+
+        # Full-text search over uploads, explanations and chats
+        search_text = st.text_input("🔎 Search History", placeholder="Filenames, code, explanations or questions")
+        if search_text:
+            search_started = time.perf_counter()
+            results = history_mgr.search(search_text)
+            st.caption(f"{len(results)} result(s) in {(time.perf_counter() - search_started) * 1000:.0f} ms")
+            for result in results:
+                icon = {"upload": "📜", "explanation": "🧠", "chat": "💬"}[result["kind"]]
+                st.markdown(f"{icon} **{result['kind'].title()}** · {result['title']}")
+                st.caption(result["snippet"].replace("\n", " "))
+            if not results:
+                st.info("No matching history entries.")
+
+        history_tabs = st.selectbox("View Your History", ["Uploads","Explanation","Chat"])
+        if history_tabs == "Uploads":
+            st.header("📜 Upload History")
+
+            if history_mgr.count("upload"):
+                # Clear history button
+                if st.button("🗑️ Clear History"):
+                    history_mgr.clear_upload_history()
+                    st.success("Upload history cleared.")
+
+                entries, _, _ = history_page("upload", ("filename", "content_hash", "size"))
+                for entry in entries:
+                    filename = entry["filename"]
+
+                    # Code is only read from the blob store once the expander is opened
+                    expander = st.expander(f"{filename}", key=f"upload_{entry['id']}", on_change="rerun")
+                    with expander:
+                        details = []
+                        if entry.get("size") is not None:
+                            details.append(f"{entry['size']:,} bytes")
+                        if entry.get("created_at"):
+                            details.append(time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created_at"])))
+                        if details:
+                            st.caption(" · ".join(details))
+
+                        if not expander.open:
+                            continue
+                        code = history_mgr.load_upload_content(entry)
+                        if code is None:
+                            st.warning("⚠️ The stored code for this upload is no longer available.")
+                            continue
+                        st.code(code, language="python", height=300)
+
+                        # Generate a PDF
+                        # .py download link
+                        b64_py = base64.b64encode(code.encode()).decode()
+                        py_href = f'<a href="data:file/python;base64,{b64_py}" download="{filename}">🐍 Download as .py</a>'
+                        st.markdown(py_href, unsafe_allow_html=True)
+            else:
+                st.info("No file uploads yet.")
+
+        elif history_tabs == "Explanation":
+            st.header("🧠 Explanation History")
+
+            if history_mgr.count("explanation"):
+                if st.button("🗑️ Clear Explanation History"):
+                    history_mgr.clear_explanation_history()
+                    st.success("Explanation history cleared.")
+
+                entries, _, _ = history_page("explanation", ("filename",))
+                for entry in entries:
+                    filename = entry["filename"]
+
+                    expander = st.expander(f"{filename}", key=f"explanation_{entry['id']}", on_change="rerun")
+                    with expander:
+                        if not expander.open:
+                            continue
+                        # The explanation and its artifacts are loaded only for opened entries
+                        entry = history_mgr.get_entry("explanation", entry["id"])
+                        if entry is None:
+                            continue
+                        explanation = entry.get("explanation", "")
+                        pdf_path = entry.get("pdf_path")
+                        audio_path = entry.get("audio_path")
+
+                        st.text_area("Explanation History", explanation, height=200, disabled=True, label_visibility="collapsed", key=f"explanation_text_{entry['id']}")
+
+                        # PDF download link if file exists
+                        if pdf_path and os.path.exists(pdf_path):
+                            with open(pdf_path, "rb") as pdf_file:
+                                b64_pdf = base64.b64encode(pdf_file.read()).decode()
+                                href_pdf = f'<a href="data:application/pdf;base64,{b64_pdf}" download="{filename}_explanation.pdf">📄 Download as PDF</a>'
+                                st.markdown(href_pdf, unsafe_allow_html=True)
+
+                        # Audio download link if file exists (MP3, Ogg or WAV)
+                        if audio_path and os.path.exists(audio_path):
+                            audio_ext = os.path.splitext(audio_path)[1]
+                            with open(audio_path, "rb") as audio_file:
+                                b64_audio = base64.b64encode(audio_file.read()).decode()
+                                href_audio = f'<a href="data:{mime_type_for(audio_path)};base64,{b64_audio}" download="{filename}_explanation{audio_ext}">🔊 Download {audio_ext[1:].upper()}</a>'
+                                st.markdown(href_audio, unsafe_allow_html=True)
+            else:
+                st.info("No explanations generated yet.")
+        elif history_tabs == "Chat":
+            st.header("💬 Chat History")
+
+            # chats whose PDF the user asked for (PDFs are only rendered on request)
+            if "chat_pdf_requests" not in st.session_state:
+                st.session_state.chat_pdf_requests = set()
+
+            if history_mgr.count("chat"):
+                # Clear chat history button
+                if st.button("🗑️ Clear Chat History"):
+                    st.session_state.chat_pdf_requests.clear()
                     history_mgr.clear_chat_history()
-                st.success("Chat history cleared.")
-
-            for idx, entry in enumerate(st.session_state.chat_history):
-                question = entry.get("question", "")
-                answer = entry.get("answer", "")
-
-                with st.expander(f"🗨️ Q{len(st.session_state.chat_history)-(idx)}: {question[:60]}..."):
-                    st.markdown(f"**Question:**\n{question}")
-                    st.markdown(f"**Answer:**\n{answer}")
-                    
-                    # Save as PDF
-                    pdf = FPDF()
-                    pdf.add_page()
-                    pdf.set_auto_page_break(auto=True, margin=15)
-                    pdf.add_font("DejaVu", "", "./modules/data/fonts/DejaVuSans.ttf", uni=True)
-                    pdf.set_font("DejaVu", size=12)
-                    pdf.multi_cell(0, 10, txt=f"Q: {question}\n\nA: {answer}")
-                    
-                    chat_file_id = str(uuid.uuid4())
-                    pdf_path = f"./modules/data/chat_{chat_file_id}.pdf"
-                    pdf.output(pdf_path)
-
-                    with open(pdf_path, "rb") as chat_pdf:
-                        b64_pdf = base64.b64encode(chat_pdf.read()).decode()
-                        href_pdf = f'<a href="data:application/pdf;base64,{b64_pdf}" download="chat_{chat_file_id}.pdf">📄 Download Chat PDF</a>'
-                        st.markdown(href_pdf, unsafe_allow_html=True)
-        else:
-            st.info("No chat interactions yet.")
- 
\ No newline at end of file
+                    st.success("Chat history cleared.")
+
+                # Export every chat into one PDF, rendered in memory
+                if st.button("📚 Export All Chats as PDF"):
+                    st.session_state.chat_pdf_requests.add("all")
+                if "all" in st.session_state.chat_pdf_requests and history_mgr.count("chat"):
+                    all_chats = "\n\n".join(
+                        f"Q: {entry.get('question', '')}\n\nA: {entry.get('answer', '')}"
+                        for entry in history_mgr.query("chat", newest_first=False, fields=("question", "answer"))
+                    )
+                    all_chats_pdf = export_pdf(all_chats)
+                    if all_chats_pdf is not None:
+                        st.download_button(
+                            "⬇️ Download All Chats (PDF)",
+                            all_chats_pdf,
+                            file_name="chat_history.pdf",
+                            mime="application/pdf"
+                        )
+
+                entries, offset, total = history_page("chat", ("question",))
+                for idx, entry in enumerate(entries):
+                    question = entry.get("question", "")
+
+                    expander = st.expander(f"🗨️ Q{total - (offset + idx)}: {question[:60]}...", key=f"chat_{entry['id']}", on_change="rerun")
+                    with expander:
+                        if not expander.open:
+                            continue
+                        # The answer is loaded only for opened entries
+                        entry = history_mgr.get_entry("chat", entry["id"])
+                        if entry is None:
+                            continue
+                        answer = entry.get("answer", "")
+                        st.markdown(f"**Question:**\n{question}")
+                        st.markdown(f"**Answer:**\n{answer}")
+                        if entry.get("cached"):
+                            st.caption("⚡ Answered from cache")
+
+                        # Render the PDF in memory only once the user asks for it
+                        chat_text = f"Q: {question}\n\nA: {answer}"
+                        pdf_id = pipeline.pdf_renderer.content_key(chat_text)[:16]
+                        if pdf_id not in st.session_state.chat_pdf_requests:
+                            if st.button("📄 Export Chat as PDF", key=f"chat_pdf_{entry['id']}"):
+                                st.session_state.chat_pdf_requests.add(pdf_id)
+                        chat_pdf = export_pdf(chat_text) if pdf_id in st.session_state.chat_pdf_requests else None
+                        if chat_pdf is not None:
+                            st.download_button(
+                                "📄 Download Chat PDF",
+                                chat_pdf,
+                                file_name=f"chat_{pdf_id}.pdf",
+                                mime="application/pdf",
+                                key=f"chat_pdf_download_{entry['id']}"
+                            )
+            else:
+                st.info("No chat interactions yet.")
+
+
+# Spawned worker processes (TTS and its segment pool) run this script as '__mp_main__' while
+# they start; they need none of the app, so only the server process builds it
+if __name__ != "__mp_main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Stress test of the history storage backends.
+
+Many writer processes append to one history location at once, spread over several
+namespaces; afterwards every entry must be present exactly once, in its own namespace.
+Run `python -m benchmarks.history_stress` to print throughput for both backends.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from multiprocessing import get_context
+
+from modules.history_storage import HISTORY_TABLES, JsonHistoryStorage, SqliteHistoryStorage
+
+
+def _stress_writer(backend: str, location: str, namespace: str, writer: int, entries: int, barrier, spans) -> None:
+    """
+    Appends chat entries from one process, as a busy session would, and reports the
+    wall-clock start and end time of its writes. All writers start together at the barrier.
+    """
+    if backend == "json":
+        storage = JsonHistoryStorage(
+            {kind: os.path.join(location, f"{kind}_history.json") for kind in HISTORY_TABLES}, namespace
+        )
+    else:
+        storage = SqliteHistoryStorage(os.path.join(location, "history.db"), namespace)
+    barrier.wait()
+    start = time.time()
+    for i in range(entries):
+        storage.append("chat", {"question": f"writer {writer} question {i}", "answer": "x" * 200, "cached": False})
+    end = time.time()
+    storage.close()
+    spans.put((start, end))
+
+
+def stress_test(backend: str = "sqlite", writers: int = 16, entries_per_writer: int = 100, namespaces: int = 4) -> dict:
+    """
+    Runs concurrent writer processes against one history location and checks that no entry
+    was lost, duplicated or written to the wrong namespace.
+
+    Args:
+        backend (str): 'sqlite' or 'json'.
+        writers (int): Concurrent writer processes.
+        entries_per_writer (int): Entries appended by each writer.
+        namespaces (int): Namespaces the writers are spread over.
+
+    Returns:
+        dict: 'entries' written, 'lost' (or duplicated) entries, 'seconds' from the first to
+            the last write and overall 'entries_per_second'.
+    """
+    location = tempfile.mkdtemp(prefix="codi_history_stress_")
+    try:
+        # Create the schema before the writers race for it
+        if backend == "sqlite":
+            SqliteHistoryStorage(os.path.join(location, "history.db")).close()
+        names = [f"user{i}" for i in range(namespaces)]
+        context = get_context("spawn")
+        barrier, queue = context.Barrier(writers), context.Queue()
+        processes = [
+            context.Process(
+                target=_stress_writer,
+                args=(backend, location, names[w % namespaces], w, entries_per_writer, barrier, queue)
+            )
+            for w in range(writers)
+        ]
+        for process in processes:
+            process.start()
+        spans = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        lost = 0
+        for n, namespace in enumerate(names):
+            if backend == "json":
+                storage = JsonHistoryStorage(
+                    {kind: os.path.join(location, f"{kind}_history.json") for kind in HISTORY_TABLES}, namespace
+                )
+            else:
+                storage = SqliteHistoryStorage(os.path.join(location, "history.db"), namespace)
+            entries = storage.load("chat")
+            expected = {
+                f"writer {w} question {i}"
+                for w in range(n, writers, namespaces) for i in range(entries_per_writer)
+            }
+            questions = [entry["question"] for entry in entries]
+            ids = [entry["id"] for entry in entries]
+            lost += len(expected.symmetric_difference(questions)) + (len(questions) - len(set(questions)))
+            lost += len(ids) - len(set(ids))
+            storage.close()
+
+        # From the first write to the last one, across all writers
+        seconds = max(end for _, end in spans) - min(start for start, _ in spans)
+        return {
+            "entries": writers * entries_per_writer,
+            "lost": lost,
+            "seconds": seconds,
+            "entries_per_second": writers * entries_per_writer / seconds,
+        }
+    finally:
+        shutil.rmtree(location, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    for backend in ("sqlite", "json"):
+        for writers in (1, 4, 16, 32):
+            results = stress_test(backend, writers=writers, entries_per_writer=100 if backend == "sqlite" else 25)
+            print(
+                f"{backend:6} {writers:2} writers: {results['entries']:5} entries, {results['lost']} lost, "
+                f"{results['entries_per_second']:8.0f} entries/s"
+            )
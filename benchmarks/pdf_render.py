@@ -0,0 +1,82 @@
+"""
+Throughput benchmark of PDF rendering.
+
+Compares the original rendering (font loaded per document, one `multi_cell` per line) with
+`PdfRenderer`, with and without its content cache, through its public `render` and
+`render_to_file`. Run `python -m benchmarks.pdf_render`.
+"""
+
+import tempfile
+import time
+
+from fpdf import FPDF
+
+from modules.pdf_renderer import FONT_PATH, PdfRenderer
+
+
+def render_with_multi_cell(text: str, font_path: str = FONT_PATH) -> bytes:
+    """
+    Renders text the previous way (font loaded per document, one `multi_cell` per line).
+    Used as the baseline of the benchmark.
+    """
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_font("DejaVu", "", font_path, uni=True)
+    pdf.set_font("DejaVu", size=12)
+    for line in text.split('\n'):
+        pdf.multi_cell(0, 10, txt=line)
+    data = pdf.output(dest="S")
+    return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+
+def count_pages(data: bytes) -> int:
+    """
+    Counts the pages of a PDF document written by PyFPDF.
+    """
+    return data.count(b"/Type /Page") - data.count(b"/Type /Pages")
+
+
+def benchmark(paragraphs: int = 200, rounds: int = 5) -> dict:
+    """
+    Measures rendering throughput for a long explanation.
+
+    Args:
+        paragraphs (int): Paragraphs in the generated sample text.
+        rounds (int): Documents rendered per measurement.
+
+    Returns:
+        dict: Pages of the sample, and pages per second of the baseline, the renderer
+            without cache hits (in memory and to files), and cached renders.
+    """
+    sentence = "This function loads the rows, validates each record and returns the parsed values. "
+    text = "\n\n".join(f"Step {i}: " + sentence * 3 for i in range(paragraphs))
+
+    with tempfile.TemporaryDirectory() as pdf_dir:
+        renderer = PdfRenderer(pdf_dir=pdf_dir)
+        pages = count_pages(renderer.render(text))
+
+        def pages_per_second(render, fresh: str = None) -> float:
+            # A different last line per round misses the content cache without changing the layout
+            texts = [f"{text}\n{fresh}{round_number}" if fresh else text for round_number in range(rounds)]
+            start = time.perf_counter()
+            for sample in texts:
+                render(sample)
+            return pages * rounds / (time.perf_counter() - start)
+
+        return {
+            "pages": pages,
+            "baseline_pages_per_second": pages_per_second(render_with_multi_cell, fresh="baseline"),
+            "renderer_pages_per_second": pages_per_second(renderer.render, fresh="memory"),
+            "file_pages_per_second": pages_per_second(renderer.render_to_file, fresh="file"),
+            "cached_pages_per_second": pages_per_second(renderer.render),
+        }
+
+
+if __name__ == "__main__":
+    results = benchmark()
+    print(f"Sample explanation: {results['pages']} pages")
+    print(f"multi_cell baseline: {results['baseline_pages_per_second']:.1f} pages/s")
+    print(f"PdfRenderer:         {results['renderer_pages_per_second']:.1f} pages/s")
+    print(f"PdfRenderer to file: {results['file_pages_per_second']:.1f} pages/s")
+    print(f"PdfRenderer cached:  {results['cached_pages_per_second']:.1f} pages/s")
@@ -0,0 +1,216 @@
+"""
+Cache for answers to questions about uploaded code.
+
+Answers are grouped by a context key (code, style and model) and looked up by the
+normalized question. Optionally, a near-duplicate question ("what does foo return" vs.
+"what does foo() return?") is matched by the Jaccard similarity of its word shingles; it must
+mention exactly the same identifiers, so a question about `save_data` never gets the answer
+cached for `load_data`.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+# Names defined by code: functions, classes and assignment targets
+DEFINED_NAME_PATTERN = re.compile(
+    r"^\s*(?:async\s+)?(?:def|class)\s+(\w+)|^\s*([^\W\d]\w*)\s*(?::[^=\n]*)?=(?!=)", re.MULTILINE
+)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Lowercases a question and strips punctuation and repeated whitespace (words in any
+    script are kept).
+
+    Args:
+        question (str): The user's question.
+
+    Returns:
+        str: Normalized question ('' if it has no words).
+    """
+    return " ".join(re.findall(r"\w+", question.lower()))
+
+
+def code_names(code: str) -> frozenset:
+    """
+    Returns the names a piece of code defines (functions, classes and assigned variables).
+
+    Args:
+        code (str): Python source code.
+
+    Returns:
+        frozenset: Defined names.
+    """
+    return frozenset(
+        def_name or assigned_name for def_name, assigned_name in DEFINED_NAME_PATTERN.findall(code or "")
+    )
+
+
+def question_identifiers(question: str, names: frozenset = frozenset()) -> frozenset:
+    """
+    Returns the identifiers a question mentions: snake_case and camelCase words, words
+    followed by '(' and names defined by the code.
+
+    Args:
+        question (str): The user's question (not normalized, so case is kept).
+        names (frozenset): Names defined by the code the question is about.
+
+    Returns:
+        frozenset: Identifiers of the question.
+    """
+    identifiers = set()
+    for match in re.finditer(r"\w+", question):
+        word = match.group()
+        if (
+            word in names
+            or re.search(r"[^\W_]_[^\W_]", word)
+            or re.search(r"[a-z0-9][A-Z]", word)
+            or question[match.end():match.end() + 1] == "("
+        ):
+            identifiers.add(word)
+    return frozenset(identifiers)
+
+
+def question_shingles(normalized: str) -> frozenset:
+    """
+    Returns the word unigrams and bigrams of a normalized question.
+
+    Args:
+        normalized (str): Output of `normalize_question`.
+
+    Returns:
+        frozenset: Shingles used for similarity matching.
+    """
+    words = normalized.split()
+    return frozenset(words) | frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    """
+    Computes the Jaccard similarity of two shingle sets.
+    """
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class AnswerCache:
+    """
+    Bounded LRU cache of answers with exact and near-duplicate question matching.
+    """
+
+    def __init__(self, max_entries: int = 512, similarity_threshold: float = 0.75):
+        """
+        Initializes the cache.
+
+        Args:
+            max_entries (int): Maximum number of cached answers across all contexts.
+            similarity_threshold (float): Minimum Jaccard similarity for a near-duplicate
+                match (None disables near-duplicate matching).
+        """
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # (context_key, normalized question) -> (shingles, identifiers, answer)
+        self._contexts = {}  # context_key -> set of normalized questions
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def get(self, context_key: str, question: str, names: frozenset = frozenset()):
+        """
+        Looks up the answer to a question in the given context.
+
+        Args:
+            context_key (str): Identifies the code, style and model the answer belongs to.
+            question (str): The user's question.
+            names (frozenset): Names defined by the code (see `code_names`); a near-duplicate
+                must mention the same ones.
+
+        Returns:
+            str | None: Cached answer, or None on a miss.
+        """
+        normalized = normalize_question(question)
+        with self._lock:
+            if not normalized:
+                self.misses += 1
+                return None
+            entry = self._entries.get((context_key, normalized))
+            if entry is not None:
+                self._entries.move_to_end((context_key, normalized))
+                self.hits += 1
+                return entry[2]
+
+            if self.similarity_threshold is not None:
+                shingles = question_shingles(normalized)
+                identifiers = question_identifiers(question, names)
+                best_key, best_score = None, self.similarity_threshold
+                for other in self._contexts.get(context_key, ()):
+                    other_shingles, other_identifiers, _ = self._entries[(context_key, other)]
+                    if other_identifiers != identifiers:
+                        continue
+                    score = jaccard(shingles, other_shingles)
+                    if score >= best_score:
+                        best_key, best_score = (context_key, other), score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.hits += 1
+                    self.near_hits += 1
+                    return self._entries[best_key][2]
+
+            self.misses += 1
+            return None
+
+    def set(self, context_key: str, question: str, answer: str, names: frozenset = frozenset()) -> None:
+        """
+        Stores an answer, evicting the least recently used answers beyond `max_entries`.
+        Questions without any words are not cached.
+
+        Args:
+            context_key (str): Identifies the code, style and model the answer belongs to.
+            question (str): The user's question.
+            answer (str): Answer to cache.
+            names (frozenset): Names defined by the code (see `code_names`).
+        """
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        with self._lock:
+            self._entries[(context_key, normalized)] = (
+                question_shingles(normalized), question_identifiers(question, names), answer
+            )
+            self._entries.move_to_end((context_key, normalized))
+            self._contexts.setdefault(context_key, set()).add(normalized)
+
+            while len(self._entries) > self.max_entries:
+                (old_context, old_question), _ = self._entries.popitem(last=False)
+                questions = self._contexts[old_context]
+                questions.discard(old_question)
+                if not questions:
+                    del self._contexts[old_context]
+
+    def clear(self) -> None:
+        """
+        Removes all cached answers.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._contexts.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns cache statistics.
+
+        Returns:
+            dict: Hit, near-duplicate hit and miss counts, hit rate and number of entries.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
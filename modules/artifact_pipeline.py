@@ -0,0 +1,108 @@
+"""
+Background generation of explanation artifacts (PDF and audio).
+
+PDF layout runs on worker threads and text-to-speech in a dedicated worker process, so
+the explanation can be shown immediately; the page polls the returned futures and shows
+download and player widgets once the files are ready.
+"""
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from modules.pdf_renderer import PdfRenderer
+from modules.tts_worker import TTSWorker
+from modules.voice_assistant import DEFAULT_AUDIO_CACHE_DIR
+
+
+class ArtifactPipeline:
+    """
+    Runs PDF jobs on background worker threads and audio jobs on the TTS worker process.
+    """
+
+    def __init__(
+        self,
+        pdf_dir: str = "./modules/data",
+        audio_dir: str = DEFAULT_AUDIO_CACHE_DIR,
+        pdf_workers: int = 2,
+        pdf_renderer: PdfRenderer = None
+    ):
+        """
+        Initializes the pipeline and its worker pools.
+
+        Args:
+            pdf_dir (str): Directory for generated PDF files.
+            audio_dir (str): Directory of the (deduplicated) audio cache.
+            pdf_workers (int): Number of concurrent PDF jobs.
+            pdf_renderer (PdfRenderer): Renderer for PDFs (created for `pdf_dir` if omitted).
+        """
+        self.pdf_dir = pdf_dir
+        self.audio_dir = audio_dir
+        os.makedirs(self.pdf_dir, exist_ok=True)
+        os.makedirs(self.audio_dir, exist_ok=True)
+        self.pdf_renderer = pdf_renderer or PdfRenderer(pdf_dir=pdf_dir)
+
+        self._pdf_pool = ThreadPoolExecutor(max_workers=pdf_workers, thread_name_prefix="codi-pdf")
+        # pyttsx3 engines are not thread-safe, so one process owns the only engine
+        self._tts_worker = TTSWorker(cache_dir=self.audio_dir)
+
+    def submit_pdf(self, text: str) -> Future:
+        """
+        Queues PDF generation for an explanation. Identical text resolves to the PDF
+        already rendered for it.
+
+        Args:
+            text (str): Explanation text.
+
+        Returns:
+            Future: Resolves to the PDF path.
+        """
+        return self._pdf_pool.submit(self.pdf_renderer.render_to_file, text, "expl")
+
+    def submit_audio(
+        self,
+        text: str,
+        gender: str = "Neutral",
+        segments: list = None,
+        codec: str = "mp3",
+        bitrate: str = "64k"
+    ) -> Future:
+        """
+        Queues speech synthesis for an explanation. Text already spoken with the same
+        voice resolves to the cached file without running the TTS engine; longer text is
+        synthesized in sentence segments on worker processes.
+
+        Args:
+            text (str): Explanation text.
+            gender (str): Voice gender ('Male', 'Female' or 'Neutral').
+            segments (list): Optional list that receives segment file paths, in playback
+                order, as they become ready (for playback before the whole file exists).
+            codec (str): Output format ('mp3', 'ogg' or 'wav').
+            bitrate (str): Output bitrate, e.g. '64k'.
+
+        Returns:
+            Future: Resolves to the audio file path.
+        """
+        return self._tts_worker.submit(
+            text, gender, on_segment=segments.append if segments is not None else None,
+            codec=codec, bitrate=bitrate
+        )
+
+    @property
+    def tts_running(self) -> bool:
+        """
+        Whether the TTS worker process is alive (it is started by `warm_up` or the first audio job).
+        """
+        return self._tts_worker.running
+
+    def warm_up(self) -> None:
+        """
+        Starts the TTS worker process now instead of on the first audio job.
+        """
+        self._tts_worker.start()
+
+    def shutdown(self) -> None:
+        """
+        Stops the PDF workers and the TTS process after pending jobs finish.
+        """
+        self._pdf_pool.shutdown(wait=True)
+        self._tts_worker.shutdown()
@@ -0,0 +1,292 @@
+"""
+Asyncio-native counterpart of CodeExplainer.
+
+Uses aiohttp with a shared connection pool and a bounded semaphore so a single
+process can keep many inference requests in flight without a thread per request.
+Cache reads and writes touch the disk, so they run in worker threads off the event loop.
+Prompt building, caching and response parsing come from BaseExplainer, so the
+sync and async explainers always send and interpret the same payloads.
+"""
+
+import asyncio
+
+import aiohttp
+
+from modules.answer_cache import AnswerCache
+from modules.explainer import BaseExplainer, ExplanationCache, UNEXPECTED_FORMAT_MESSAGE
+from modules.http_transport import RETRY_STATUS_CODES, backoff_delay, retry_delay
+from modules.prompt_compactor import PromptCompactor
+
+
+class AsyncCodeExplainer(BaseExplainer):
+    """
+    Explains code and answers questions through the inference API using coroutines.
+
+    Use as an async context manager, or call `close()` when done:
+
+        async with AsyncCodeExplainer(token) as explainer:
+            explanations = await explainer.explain_many(sources)
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model_url: str = None,
+        cache: ExplanationCache = None,
+        max_concurrency: int = 32,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 40.0,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 30.0,
+        max_loading_wait: float = 120.0,
+        compactor: PromptCompactor = None,
+        answer_cache: AnswerCache = None
+    ):
+        """
+        Initializes the AsyncCodeExplainer.
+
+        Args:
+            api_key (str): Hugging Face API key.
+            model_url (str, optional): Custom model URL. Defaults to Mixtral 8x7B model.
+            cache (ExplanationCache, optional): Cache for explanations.
+            max_concurrency (int): Maximum number of requests in flight at once.
+            connect_timeout (float): Seconds to wait for a connection to be established.
+            read_timeout (float): Seconds to wait between bytes of the response.
+            max_retries (int): Number of retries after the first attempt.
+            backoff_base (float): Delay of the first backoff attempt in seconds.
+            backoff_cap (float): Upper bound for backoff delays in seconds.
+            max_loading_wait (float): Upper bound for a single model-loading wait in seconds.
+            compactor (PromptCompactor, optional): Compacts code before it goes into a prompt.
+            answer_cache (AnswerCache, optional): Cache for answers to questions.
+        """
+        super().__init__(api_key, model_url, cache, compactor, answer_cache)
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_loading_wait = max_loading_wait
+        # Sessions and semaphores belong to the event loop they were created in
+        self._loop = None
+        self._semaphore = None
+        self._session = None
+        self._session_closer = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Lazily creates the client session (and the semaphore) inside the running event loop.
+
+        An explainer used from another loop, e.g. by a second `asyncio.run`, gets a new session
+        and semaphore there. Each session is closed by a background task when its loop shuts
+        down, since `asyncio.run` cancels the remaining tasks before closing the loop.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._session = None
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=self.timeout,
+                connector=connector
+            )
+            self._session_closer = loop.create_task(self._close_on_shutdown(self._session))
+        return self._session
+
+    @staticmethod
+    async def _close_on_shutdown(session: aiohttp.ClientSession) -> None:
+        try:
+            await asyncio.Future()  # Runs until cancelled by `close` or the loop shutting down
+        finally:
+            await session.close()
+
+    async def close(self) -> None:
+        """
+        Closes the client session and its pooled connections.
+        """
+        if self._loop is not asyncio.get_running_loop():
+            return  # The session belongs to a loop that has shut down (and closed it)
+        if self._session_closer is not None:
+            self._session_closer.cancel()
+            self._session_closer = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _post_json(self, payload: dict):
+        """
+        Posts a payload and returns the decoded JSON body, retrying transient failures.
+
+        Args:
+            payload (dict): JSON request body.
+
+        Returns:
+            list | dict: Decoded JSON response.
+
+        Raises:
+            aiohttp.ClientError: If the last attempt fails.
+        """
+        session = self._get_session()
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                is_last = attempt == self.max_retries
+                try:
+                    async with session.post(self.api_url, json=payload) as response:
+                        if response.status not in RETRY_STATUS_CODES or is_last:
+                            response.raise_for_status()
+                            return await response.json(content_type=None)
+
+                        try:
+                            body = await response.json(content_type=None)
+                        except ValueError:
+                            body = None
+                        delay = retry_delay(
+                            attempt,
+                            status=response.status,
+                            body=body,
+                            retry_after=response.headers.get("Retry-After"),
+                            base=self.backoff_base,
+                            cap=self.backoff_cap,
+                            max_loading_wait=self.max_loading_wait
+                        )
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if is_last:
+                        raise
+                    delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+
+                await asyncio.sleep(delay)
+
+    async def explain_code(self, code: str, style: str = "concise") -> str:
+        """
+        Sends a code snippet to the API for explanation.
+        Repeated requests for the same code, style and model are served from the cache.
+
+        Args:
+            code (str): Python code to be explained.
+            style (str): Explanation style ('concise', 'reiterate', 'in-depth').
+
+        Returns:
+            str: Model-generated explanation or error message.
+        """
+        return await self._generate_cached(
+            self.explanation_cache_key(code, style),
+            lambda: self.explanation_payload(code, style),
+            "❌ Error explaining code"
+        )
+
+    async def _generate_cached(self, cache_key: str, make_payload, error_prefix: str) -> str:
+        """
+        Returns a cached completion, or requests one and caches it if it parsed cleanly.
+
+        Args:
+            cache_key (str): Cache key for the request.
+            make_payload (Callable[[], dict]): Builds the JSON payload; only called on a miss.
+            error_prefix (str): Prefix of the message returned when the request fails.
+
+        Returns:
+            str: Generated text or error message.
+        """
+        cached = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+        payload = make_payload()
+        try:
+            result = await self._post_json(payload)
+            text = self.parse_explanation(result, payload["inputs"])
+            if text != UNEXPECTED_FORMAT_MESSAGE:
+                await asyncio.to_thread(self.cache.set, cache_key, text)
+            return text
+
+        except Exception as e:
+            return f"{error_prefix}: {str(e)}"
+
+    async def summarize_outline(self, outline_text: str) -> str:
+        """
+        Produces a short file-level summary from a module outline.
+
+        Args:
+            outline_text (str): Outline of the module's top-level definitions.
+
+        Returns:
+            str: Summary or error message.
+        """
+        return await self._generate_cached(
+            self.summary_cache_key(outline_text),
+            lambda: self.summary_payload(outline_text),
+            "❌ Error summarizing code"
+        )
+
+    async def explain_large_code(self, code: str, style: str = "concise") -> str:
+        """
+        Explains a large file chunk by chunk, requesting all chunks and the summary concurrently.
+
+        Args:
+            code (str): Python code to be explained.
+            style (str): Explanation style ('concise', 'reiterate', 'in-depth').
+
+        Returns:
+            str: Merged explanation in source order.
+        """
+        chunks, outline_text = self.plan_chunks(code) if self.needs_chunking(code) else ([], "")
+        if len(chunks) <= 1:
+            return await self.explain_code(code, style)
+
+        summary, *explanations = await asyncio.gather(
+            self.summarize_outline(outline_text) if outline_text else asyncio.sleep(0, result=""),
+            *(self.explain_code(chunk.source, style) for chunk in chunks)
+        )
+        if summary.startswith("❌"):
+            summary = ""
+        return self.merge_chunk_explanations(summary, chunks, explanations)
+
+    async def answer_question(self, question: str, style: str = "concise", uploaded_code: str = None) -> str:
+        """
+        Sends a natural language question (with optional code context) to the API.
+
+        Args:
+            question (str): The user's question.
+            style (str): Response style ('concise', 'reiterate', or 'in-depth').
+            uploaded_code (str, optional): Python code to provide as context.
+
+        Returns:
+            str: Model-generated answer or error message.
+        """
+        if not question:
+            return "❌ Please enter a question."
+
+        cached = self.lookup_answer(question, style, uploaded_code)
+        if cached is not None:
+            return cached
+
+        prompt = self.generate_question_prompt(question, style, uploaded_code)
+
+        try:
+            result = await self._post_json({"inputs": prompt})
+            answer = self.parse_answer(result, prompt)
+            self.store_answer(question, style, uploaded_code, answer)
+            return answer
+
+        except Exception as e:
+            return f"❌ Error fetching answer: {str(e)}"
+
+    async def explain_many(self, codes: list, style: str = "concise") -> list:
+        """
+        Explains several code snippets concurrently, bounded by `max_concurrency`.
+
+        Args:
+            codes (list): Python code snippets to be explained.
+            style (str): Explanation style applied to all snippets.
+
+        Returns:
+            list: Explanations in the same order as `codes`.
+        """
+        return await asyncio.gather(*(self.explain_code(code, style) for code in codes))
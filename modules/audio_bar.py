@@ -3,10 +3,20 @@ Custom audio player component for Streamlit apps.
 
 Provides a stylized HTML5 audio player with playback controls,
 speed adjustment, and a seekable timeline, embedded using Streamlit Components.
+Can also play a list of audio segments back to back while a long file is still produced.
+Audio is referenced by URL when a local media server is running, otherwise inlined as base64.
+
+Streamlit replaces the player's iframe whenever its content changes (e.g. when more segments
+are ready), so a player with a `state_key` keeps its position in the browser's session storage
+and picks up where the previous one left off.
 """
 
 import streamlit.components.v1 as components
 import base64
+import json
+import os
+
+from modules.audio_encoder import mime_type_for
 
 class CustomAudioPlayer:
     """
@@ -14,28 +24,67 @@ class CustomAudioPlayer:
     including seeking, speed adjustment, and a real-time progress slider.
     """
 
-    def __init__(self, audio_path: str, player_width: int = 600, player_height: int = 200):
+    def __init__(
+        self,
+        audio_path: str = None,
+        player_width: int = 600,
+        player_height: int = 200,
+        segments: list = None,
+        media_server=None,
+        state_key: str = None,
+        resume_segments: list = None
+    ):
         """
         Initializes the CustomAudioPlayer instance.
 
         Args:
-            audio_path (str): Path to the audio file to be played (MP3 format recommended).
+            audio_path (str): Path to the audio file to be played (MP3, Ogg or WAV).
             player_width (int): Maximum width of the player in pixels. Defaults to 600.
             player_height (int): Height of the rendered HTML player. Defaults to 200.
+            segments (list): Paths of audio segments played one after another, used instead
+                of `audio_path` while the full file is still being produced.
+            media_server (MediaServer): Running media endpoint; audio is referenced by URL
+                through it instead of being inlined as base64.
+            state_key (str): Identifies what is played across re-renders; the playback
+                position, speed and play state are restored from the last player with this key.
+            resume_segments (list): Segments played before `audio_path` was ready (the
+                preview). If playback of the preview has started, the player keeps playing
+                them instead of switching to `audio_path`.
         """
         self.audio_path = audio_path
+        self.segmented = bool(segments)
+        self.segments = list(segments) if segments else [audio_path]
+        self.resume_segments = list(resume_segments or [])
+        if not all(os.path.exists(path) for path in self.resume_segments):
+            self.resume_segments = []  # Evicted from the audio cache since the preview
+        self.state_key = state_key
         self.player_width = player_width
         self.player_height = player_height
-        self.audio_base64 = self._load_audio_base64()  # Load and encode audio on init
+        self.mime_types = [mime_type_for(path) for path in self.segments]
+        self.media_server = media_server if media_server is not None and media_server.running else None
+        self.sources = [self._source_for(path) for path in self.segments]
+        self.resume_sources = [self._source_for(path) for path in self.resume_segments]
 
-    def _load_audio_base64(self) -> str:
+    def _source_for(self, path: str) -> str:
         """
-        Reads the audio file from disk and encodes it to a base64 string.
+        Returns the URL the browser loads an audio file from.
+        """
+        if self.media_server is not None:
+            # The browser fetches (and seeks in) the files itself via Range requests
+            return self.media_server.url_for(path)
+        return f"data:{mime_type_for(path)};base64,{self._load_audio_base64(path)}"
+
+    def _load_audio_base64(self, path: str) -> str:
+        """
+        Reads an audio file from disk and encodes it to a base64 string.
+
+        Args:
+            path (str): Path to the audio file.
 
         Returns:
             str: Base64-encoded audio content.
         """
-        with open(self.audio_path, "rb") as f:
+        with open(path, "rb") as f:
             return base64.b64encode(f.read()).decode()
 
     def render(self):
@@ -47,8 +96,8 @@ class CustomAudioPlayer:
         html_code = f"""
         <div style="width: 100%; max-width: {self.player_width}px; margin: auto; font-family: Arial, sans-serif;">
             <!-- Audio Element -->
-            <audio id="audio" style="width: 100%; margin-bottom: 10px;">
-                <source src="data:audio/mp3;base64,{self.audio_base64}" type="audio/mp3">
+            <audio id="audio" preload="metadata" style="width: 100%; margin-bottom: 10px;">
+                <source src="{self.sources[0]}" type="{self.mime_types[0]}">
                 Your browser does not support the audio element.
             </audio>
 
@@ -66,6 +115,11 @@ class CustomAudioPlayer:
                 <button class="audio-btn" onclick="changeSpeed(0.25)">➕ Speed</button>
             </div>
 
+            <!-- Segment indicator (only shown for segmented playback) -->
+            <div id="segmentDisplay" style="text-align: center; font-size: 12px; display: {'block' if len(self.segments) > 1 else 'none'};">
+                Part 1 of {len(self.segments)}
+            </div>
+
             <!-- Seekable Slider -->
             <div style="margin-top: 10px;">
                 <input type="range" id="seekSlider" value="0" min="0" max="100" step="0.1" style="width: 100%;">
@@ -102,6 +156,45 @@ class CustomAudioPlayer:
                 const speedDisplay = document.getElementById('speedDisplay');
                 const currentTimeText = document.getElementById('currentTime');
                 const totalTimeText = document.getElementById('totalTime');
+                const segmentDisplay = document.getElementById('segmentDisplay');
+                let segments = {json.dumps(self.sources)};
+                const resumeSegments = {json.dumps(self.resume_sources)};
+                const stateKey = {json.dumps("codi-audio:" + self.state_key if self.state_key else None)};
+                let segmented = {json.dumps(self.segmented)};
+                let segmentIndex = 0;
+
+                // Playback state of the previous player with this key (null if none)
+                function loadState() {{
+                    try {{
+                        return stateKey ? JSON.parse(window.sessionStorage.getItem(stateKey)) : null;
+                    }} catch (e) {{
+                        return null;
+                    }}
+                }}
+
+                // The player being replaced must not record the pause its removal causes
+                let leaving = false;
+                window.addEventListener('pagehide', () => {{ leaving = true; }});
+
+                function saveState() {{
+                    if (!stateKey || leaving) return;
+                    const state = {{
+                        index: segmentIndex,
+                        time: audio.currentTime,
+                        rate: audio.playbackRate,
+                        playing: !audio.paused && !audio.ended,
+                        ended: audio.ended,
+                        segmented: segmented
+                    }};
+                    try {{
+                        window.sessionStorage.setItem(stateKey, JSON.stringify(state));
+                    }} catch (e) {{}}
+                }}
+
+                function showSegment() {{
+                    segmentDisplay.style.display = segments.length > 1 ? 'block' : 'none';
+                    segmentDisplay.textContent = "Part " + (segmentIndex + 1) + " of " + segments.length;
+                }}
 
                 // Toggle play/pause
                 function togglePlay() {{
@@ -140,10 +233,56 @@ class CustomAudioPlayer:
                     currentTimeText.textContent = formatTime(audio.currentTime);
                 }});
 
+                // Continue with the next segment, keeping the selected speed
+                audio.addEventListener('ended', () => {{
+                    saveState();
+                    if (segmentIndex + 1 < segments.length) {{
+                        segmentIndex += 1;
+                        const rate = audio.playbackRate;
+                        audio.src = segments[segmentIndex];
+                        audio.defaultPlaybackRate = rate;
+                        audio.playbackRate = rate;
+                        showSegment();
+                        audio.play();
+                    }}
+                }});
+
                 // Allow manual seeking
                 seekSlider.addEventListener('input', () => {{
                     audio.currentTime = seekSlider.value;
                 }});
+
+                // Pick up where the previous player with this key left off: keep playing the
+                // preview segments if it had started them, and move on to the next segment if
+                // it had played all segments that were ready then
+                const saved = loadState();
+                if (saved) {{
+                    if (saved.segmented && resumeSegments.length) {{
+                        segments = resumeSegments;
+                        segmented = true;
+                    }}
+                    if (saved.segmented === segmented) {{
+                        let index = Math.min(saved.index, segments.length - 1);
+                        let time = saved.time;
+                        let playing = saved.playing;
+                        if (saved.ended && saved.index + 1 < segments.length) {{
+                            index = saved.index + 1;
+                            time = 0;
+                            playing = true;
+                        }}
+                        segmentIndex = index;
+                        audio.src = segments[index];
+                        audio.addEventListener('loadedmetadata', () => {{
+                            audio.currentTime = time;
+                            audio.defaultPlaybackRate = saved.rate;
+                            audio.playbackRate = saved.rate;
+                            speedDisplay.textContent = "Speed: " + saved.rate.toFixed(2) + "x";
+                            if (playing) audio.play().catch(() => {{}});
+                        }}, {{ once: true }});
+                        showSegment();
+                    }}
+                }}
+                ['play', 'pause', 'ratechange', 'timeupdate'].forEach(name => audio.addEventListener(name, saveState));
             </script>
         </div>
         """
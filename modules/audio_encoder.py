@@ -0,0 +1,120 @@
+"""
+Compression of synthesized speech.
+
+pyttsx3 drivers write uncompressed WAV/AIFF data. This module re-encodes it to MP3 or Ogg
+Vorbis at a configurable bitrate using a locally installed encoder (ffmpeg, or lame for
+MP3). Without an encoder the audio is kept as WAV, with a matching extension and MIME type.
+"""
+
+import os
+import shutil
+import subprocess
+
+# Supported output formats: file extension, MIME type and ffmpeg audio codec
+AUDIO_FORMATS = {
+    "mp3": {"extension": ".mp3", "mime_type": "audio/mpeg", "ffmpeg_codec": "libmp3lame"},
+    "ogg": {"extension": ".ogg", "mime_type": "audio/ogg", "ffmpeg_codec": "libvorbis"},
+    "wav": {"extension": ".wav", "mime_type": "audio/wav", "ffmpeg_codec": None},
+}
+
+# Bitrates offered in the settings
+AUDIO_BITRATES = ("32k", "48k", "64k", "96k", "128k")
+
+# Seconds an encoder may run before it is considered stuck
+ENCODER_TIMEOUT = 120
+
+
+def mime_type_for(path: str) -> str:
+    """
+    Returns the MIME type of an audio file from its extension.
+
+    Args:
+        path (str): Audio file path.
+
+    Returns:
+        str: MIME type; WAV is assumed for unknown extensions (the pyttsx3 output format).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for audio_format in AUDIO_FORMATS.values():
+        if audio_format["extension"] == extension:
+            return audio_format["mime_type"]
+    return "audio/wav"
+
+
+class AudioEncoder:
+    """
+    Encodes WAV files to a compressed format with the first available local encoder.
+    """
+
+    def __init__(self, codec: str = "mp3", bitrate: str = "64k"):
+        """
+        Initializes the encoder and looks up the encoder binaries.
+
+        Args:
+            codec (str): Output format, one of 'mp3', 'ogg' or 'wav'.
+            bitrate (str): Target bitrate, e.g. '64k'.
+        """
+        self.codec = codec if codec in AUDIO_FORMATS else "mp3"
+        self.bitrate = bitrate
+        self.ffmpeg = shutil.which("ffmpeg")
+        self.lame = shutil.which("lame")
+
+        # Fall back to WAV when no installed encoder handles the requested format
+        if self.codec == "mp3" and not (self.ffmpeg or self.lame):
+            self.codec = "wav"
+        elif self.codec == "ogg" and not self.ffmpeg:
+            self.codec = "wav"
+
+    @property
+    def extension(self) -> str:
+        """
+        File extension of the encoded output.
+        """
+        return AUDIO_FORMATS[self.codec]["extension"]
+
+    @property
+    def mime_type(self) -> str:
+        """
+        MIME type of the encoded output.
+        """
+        return AUDIO_FORMATS[self.codec]["mime_type"]
+
+    @property
+    def signature(self) -> str:
+        """
+        Identifies the output format and bitrate (part of audio cache keys).
+        """
+        return "wav" if self.codec == "wav" else f"{self.codec}@{self.bitrate}"
+
+    def encode(self, wav_path: str, output_path: str) -> bool:
+        """
+        Encodes a WAV file into the configured format.
+
+        Args:
+            wav_path (str): Uncompressed input file.
+            output_path (str): Encoded output file (should end with `extension`).
+
+        Returns:
+            bool: True if the output was written; False if encoding failed or the codec is
+                'wav' (the caller then keeps the WAV file).
+        """
+        if self.codec == "wav":
+            return False
+
+        if self.ffmpeg:
+            command = [
+                self.ffmpeg, "-y", "-loglevel", "error", "-i", wav_path, "-vn",
+                "-codec:a", AUDIO_FORMATS[self.codec]["ffmpeg_codec"], "-b:a", self.bitrate,
+                "-f", self.codec, output_path,
+            ]
+        else:
+            command = [self.lame, "--quiet", "-b", self.bitrate.rstrip("k"), wav_path, output_path]
+
+        try:
+            subprocess.run(command, check=True, capture_output=True, timeout=ENCODER_TIMEOUT)
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"⚠️ Audio encoding failed, keeping WAV: {e}")
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return False
+        return True
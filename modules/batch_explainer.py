@@ -0,0 +1,107 @@
+"""
+Explains several uploaded Python files at once.
+
+Reads `.py` uploads and `.py` members of zip archives, then fans the files out to the
+explainer on a bounded thread pool and yields each result as soon as it lands. Files and
+their chunks share the explainer's HTTP connection pool, so together they never have more
+requests in flight than it holds connections.
+"""
+
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Skip archive members larger than this (bytes); they are rarely hand-written code
+MAX_ZIP_MEMBER_SIZE = 1024 * 1024
+
+
+def _is_python_member(info: zipfile.ZipInfo) -> bool:
+    """
+    Checks whether a zip member is a regular, non-hidden Python source file.
+    """
+    parts = info.filename.split("/")
+    if info.is_dir() or not info.filename.endswith(".py"):
+        return False
+    if any(part.startswith(".") or part == "__MACOSX" for part in parts):
+        return False
+    return info.file_size <= MAX_ZIP_MEMBER_SIZE
+
+
+def _read_archive(data: bytes) -> list:
+    """
+    Reads the Python members of a zip archive, sorted by path.
+    """
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = sorted(
+            (info for info in archive.infolist() if _is_python_member(info)),
+            key=lambda info: info.filename
+        )
+        return [(info.filename, archive.read(info).decode("utf-8", errors="replace")) for info in members]
+
+
+def read_uploaded_files(uploaded_files) -> tuple:
+    """
+    Reads Python sources from Streamlit uploads, expanding zip archives.
+
+    Args:
+        uploaded_files (list): Uploaded file objects (with `name` and `read()`).
+
+    Returns:
+        tuple: (code_files, skipped), where code_files holds (filename, code) tuples in upload
+            order, with zip members named by their path, and skipped holds (filename, reason)
+            tuples for uploads that could not be read (corrupt or encrypted archives,
+            files that are not UTF-8 text).
+    """
+    code_files = []
+    skipped = []
+    for uploaded in uploaded_files or []:
+        data = uploaded.read()
+        filename = os.path.basename(uploaded.name)
+        if uploaded.name.lower().endswith(".zip"):
+            try:
+                code_files.extend(_read_archive(data))
+            except zipfile.BadZipFile as e:
+                skipped.append((filename, f"not a valid zip archive ({e})"))
+            except (RuntimeError, NotImplementedError) as e:
+                # Encrypted members or an unsupported compression method
+                skipped.append((filename, str(e)))
+        else:
+            try:
+                code_files.append((filename, data.decode("utf-8")))
+            except UnicodeDecodeError:
+                skipped.append((filename, "not UTF-8 text"))
+    return code_files, skipped
+
+
+def explain_files(explainer, code_files: list, style: str = "concise", max_workers: int = 4):
+    """
+    Explains files concurrently and yields results in completion order.
+    Large files are additionally split into chunks by the explainer.
+
+    Args:
+        explainer (CodeExplainer): Explainer used for each file.
+        code_files (list): (filename, code) tuples to explain.
+        style (str): Explanation style applied to every file.
+        max_workers (int): Maximum number of files explained at the same time.
+
+    Yields:
+        tuple: (index, filename, explanation), where index is the file's position in `code_files`.
+    """
+    if not code_files:
+        return
+
+    # Each file may fan out into chunk requests; split the connection pool between the files
+    # so that requests never wait for a connection or open ones the pool cannot keep
+    pool_size = explainer.transport.pool_size
+    file_workers = min(max_workers, len(code_files), pool_size)
+    chunk_workers = max(1, pool_size // file_workers)
+
+    with ThreadPoolExecutor(max_workers=file_workers) as pool:
+        futures = {
+            pool.submit(explainer.explain_large_code, code, style, chunk_workers): (index, filename)
+            for index, (filename, code) in enumerate(code_files)
+        }
+        for future in as_completed(futures):
+            index, filename = futures[future]
+            yield index, filename, future.result()
@@ -0,0 +1,129 @@
+"""
+Content-addressed store for uploaded source code.
+
+Each distinct content is stored once, zlib-compressed, under its SHA-256 digest, so the
+same file uploaded many times takes the space of one copy and history entries only need
+to hold the digest.
+"""
+
+import hashlib
+import os
+import threading
+import zlib
+
+
+class BlobStore:
+    """
+    Stores compressed blobs in a directory tree keyed by SHA-256.
+    """
+
+    def __init__(self, root: str = "./modules/data/blobs", compression_level: int = 6):
+        """
+        Initializes the store.
+
+        Args:
+            root (str): Directory of the blob files.
+            compression_level (int): zlib compression level (1 fastest, 9 smallest).
+        """
+        self.root = root
+        self.compression_level = compression_level
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def digest(data) -> str:
+        """
+        Returns the SHA-256 hex digest of bytes or (UTF-8 encoded) text.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def path_for(self, digest: str) -> str:
+        """
+        Returns the file path of a blob; blobs are fanned out by the first two hex digits.
+        """
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def put(self, data) -> str:
+        """
+        Stores a blob unless identical content is already present.
+
+        Args:
+            data (bytes | str): Content to store (text is UTF-8 encoded).
+
+        Returns:
+            str: SHA-256 hex digest identifying the content.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        digest = self.digest(data)
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(zlib.compress(data, self.compression_level))
+        os.replace(temp_path, path)
+        return digest
+
+    def get(self, digest: str):
+        """
+        Reads a blob.
+
+        Args:
+            digest (str): SHA-256 hex digest returned by `put`.
+
+        Returns:
+            bytes | None: Content, or None if no blob is stored under the digest.
+        """
+        try:
+            with open(self.path_for(digest), "rb") as f:
+                return zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+
+    def get_text(self, digest: str):
+        """
+        Reads a blob as UTF-8 text.
+
+        Returns:
+            str | None: Content, or None if no blob is stored under the digest.
+        """
+        data = self.get(digest)
+        return data.decode("utf-8") if data is not None else None
+
+    def exists(self, digest: str) -> bool:
+        """
+        Checks whether a blob is stored under the digest.
+        """
+        return os.path.exists(self.path_for(digest))
+
+    def delete(self, digest: str) -> int:
+        """
+        Removes a blob.
+
+        Returns:
+            int: Bytes freed on disk (0 if the blob did not exist).
+        """
+        path = self.path_for(digest)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def iter_digests(self):
+        """
+        Yields (digest, size on disk) of every stored blob.
+        """
+        with os.scandir(self.root) as fanout:
+            for directory in fanout:
+                if not directory.is_dir() or len(directory.name) != 2:
+                    continue
+                with os.scandir(directory.path) as blobs:
+                    for blob in blobs:
+                        if blob.is_file() and not blob.name.endswith(".tmp"):
+                            yield directory.name + blob.name, blob.stat().st_size
@@ -0,0 +1,322 @@
+"""
+Splits Python source into top-level symbols and packs them into token-budgeted chunks.
+
+Large files are cut at top-level function and class boundaries (with their decorators and
+leading comments), so each chunk can be explained on its own and the results merged back
+in source order.
+"""
+
+import ast
+import hashlib
+import textwrap
+from dataclasses import dataclass, field
+
+# Rough characters-per-token ratio for code with the Mixtral/LLaMA tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of model tokens in a piece of text.
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Approximate token count.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+@dataclass
+class CodeSymbol:
+    """
+    A top-level piece of a module: a function, a class, or a run of other statements.
+    """
+    name: str
+    kind: str  # 'function', 'class' or 'module'
+    start_line: int
+    end_line: int
+    source: str
+    signature: str = ""
+    node: ast.AST = field(default=None, repr=False, compare=False)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.source)
+
+    @property
+    def title(self) -> str:
+        """
+        Human-readable label, e.g. "Lines 10-42 (load_data)".
+        """
+        label = f"Lines {self.start_line}-{self.end_line}"
+        return label if self.kind == "module" else f"{label} ({self.name})"
+
+
+@dataclass
+class CodeChunk:
+    """
+    A run of consecutive symbols explained together in one request.
+    """
+    symbols: list
+    source: str
+    start_line: int
+    end_line: int
+
+    @property
+    def title(self) -> str:
+        """
+        Human-readable label, e.g. "Lines 10-42 (load_data, Parser)".
+        """
+        names = [symbol.name for symbol in self.symbols if symbol.kind != "module"]
+        label = f"Lines {self.start_line}-{self.end_line}"
+        return f"{label} ({', '.join(names)})" if names else label
+
+
+def _signature(node: ast.AST, lines: list) -> str:
+    """
+    Returns the header line of a function or class definition.
+    """
+    return lines[node.lineno - 1].strip()
+
+
+def split_into_symbols(code: str) -> list:
+    """
+    Splits a module into top-level symbols covering every line of the source.
+
+    Comments and blank lines are attached to the symbol that follows them, and consecutive
+    statements that are not functions or classes are grouped into 'module' symbols.
+    Code that does not parse is returned as a single 'module' symbol.
+
+    Args:
+        code (str): Python source code.
+
+    Returns:
+        list: CodeSymbol objects in source order.
+    """
+    lines = code.splitlines(keepends=True)
+    if not lines:
+        return []
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return [CodeSymbol("module code", "module", 1, len(lines), code)]
+
+    symbols = []
+    pending = None  # (start_line, end_line) of grouped module-level statements
+    next_start = 1
+
+    def flush_pending():
+        if pending is not None:
+            start, end = pending
+            symbols.append(CodeSymbol("module code", "module", start, end, "".join(lines[start - 1:end])))
+
+    for node in tree.body:
+        start = next_start
+        end = node.end_lineno
+        next_start = end + 1
+
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # Comments and blank lines since the previous statement belong to the definition
+            flush_pending()
+            pending = None
+            symbols.append(CodeSymbol(
+                name=node.name,
+                kind="class" if isinstance(node, ast.ClassDef) else "function",
+                start_line=start,
+                end_line=end,
+                source="".join(lines[start - 1:end]),
+                signature=_signature(node, lines),
+                node=node
+            ))
+        else:
+            pending = (pending[0] if pending is not None else start, end)
+
+    # Trailing comments and blank lines go with the last symbol
+    if pending is not None:
+        pending = (pending[0], len(lines))
+        flush_pending()
+    elif symbols and symbols[-1].end_line < len(lines):
+        last = symbols[-1]
+        last.end_line = len(lines)
+        last.source = "".join(lines[last.start_line - 1:])
+
+    return symbols
+
+
+def _statement_cut_lines(symbol: CodeSymbol) -> list:
+    """
+    Returns the lines where a definition's body statements start (methods of a class,
+    statements of a function), including their decorators.
+    """
+    if symbol.node is None:
+        return []
+    cuts = []
+    for child in getattr(symbol.node, "body", []):
+        decorators = getattr(child, "decorator_list", [])
+        cuts.append(min([child.lineno] + [decorator.lineno for decorator in decorators]))
+    return [line for line in cuts if symbol.start_line < line <= symbol.end_line]
+
+
+def _split_oversized(symbol: CodeSymbol, token_budget: int) -> list:
+    """
+    Cuts a symbol that exceeds the budget into parts, preferring body statement boundaries
+    (e.g. between methods) and falling back to plain line breaks.
+    """
+    lines = symbol.source.splitlines(keepends=True)
+    cuts = set(_statement_cut_lines(symbol))
+
+    # Segments that should stay together: one per body statement, or one per line
+    segments, current = [], []
+    for offset, line in enumerate(lines):
+        line_number = symbol.start_line + offset
+        if current and (not cuts or line_number in cuts):
+            segments.append(current)
+            current = []
+        current.append(line)
+    if current:
+        segments.append(current)
+
+    parts, current, current_start = [], [], symbol.start_line
+    line_number = symbol.start_line
+    for segment in segments:
+        # A single statement larger than the budget is split line by line
+        pieces = [segment] if estimate_tokens("".join(segment)) <= token_budget else [[line] for line in segment]
+        for piece in pieces:
+            if current and estimate_tokens("".join(current + piece)) > token_budget:
+                parts.append((current_start, current))
+                current, current_start = [], line_number
+            current.extend(piece)
+            line_number += len(piece)
+    if current:
+        parts.append((current_start, current))
+
+    return [
+        CodeSymbol(
+            name=f"{symbol.name} (part {number})",
+            kind=symbol.kind,
+            start_line=start,
+            end_line=start + len(part_lines) - 1,
+            source="".join(part_lines),
+            signature=symbol.signature
+        )
+        for number, (start, part_lines) in enumerate(parts, start=1)
+    ]
+
+
+def pack_chunks(symbols: list, token_budget: int = 1500) -> list:
+    """
+    Greedily packs consecutive symbols into chunks that fit the token budget.
+
+    Args:
+        symbols (list): CodeSymbol objects in source order.
+        token_budget (int): Maximum estimated tokens per chunk.
+
+    Returns:
+        list: CodeChunk objects in source order.
+    """
+    chunks, current = [], []
+
+    def close_chunk():
+        if current:
+            chunks.append(CodeChunk(
+                symbols=list(current),
+                source="".join(symbol.source for symbol in current),
+                start_line=current[0].start_line,
+                end_line=current[-1].end_line
+            ))
+            current.clear()
+
+    for symbol in symbols:
+        pieces = [symbol] if symbol.tokens <= token_budget else _split_oversized(symbol, token_budget)
+        for piece in pieces:
+            if current and sum(s.tokens for s in current) + piece.tokens > token_budget:
+                close_chunk()
+            current.append(piece)
+    close_chunk()
+
+    return chunks
+
+
+def outline(symbols: list) -> str:
+    """
+    Builds a compact outline of a module from its symbols.
+
+    Args:
+        symbols (list): CodeSymbol objects in source order.
+
+    Returns:
+        str: One line per function, class and method, e.g. "def load(path):  # line 12".
+    """
+    entries = []
+    for symbol in symbols:
+        if symbol.kind == "module":
+            continue
+        entries.append(f"{symbol.signature}  # line {symbol.start_line}")
+
+        if symbol.kind == "class" and symbol.node is not None:
+            source_lines = symbol.source.splitlines()
+            for child in symbol.node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    offset = child.lineno - symbol.start_line
+                    entries.append(f"    {source_lines[offset].strip()}  # line {child.lineno}")
+    return "\n".join(entries)
+
+
+def symbol_fingerprint(symbol: CodeSymbol) -> str:
+    """
+    Hashes a symbol's normalized AST, so edits to comments, blank lines, formatting or
+    position in the file do not change it.
+
+    Args:
+        symbol (CodeSymbol): Symbol to fingerprint.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    node = symbol.node
+    if node is None:
+        try:
+            node = ast.parse(textwrap.dedent(symbol.source))
+        except SyntaxError:
+            node = None
+
+    if node is not None:
+        normalized = ast.dump(node, annotate_fields=False, include_attributes=False)
+    else:
+        # Unparseable code: fall back to whitespace-insensitive text
+        normalized = " ".join(symbol.source.split())
+    return hashlib.sha256(f"{symbol.kind}:{normalized}".encode("utf-8")).hexdigest()
+
+
+def diff_symbols(old_code: str, new_code: str) -> dict:
+    """
+    Compares the top-level symbols of two versions of a module.
+
+    Args:
+        old_code (str): Previous version of the source.
+        new_code (str): Current version of the source.
+
+    Returns:
+        dict: Names of 'added', 'changed', 'removed' and 'unchanged' symbols.
+    """
+    def fingerprints(code):
+        # Module-level statement groups share a name, so tell them apart by position
+        result, groups = {}, 0
+        for symbol in split_into_symbols(code or ""):
+            name = symbol.name
+            if symbol.kind == "module":
+                groups += 1
+                name = f"{name} #{groups}"
+            result[name] = symbol_fingerprint(symbol)
+        return result
+
+    old, new = fingerprints(old_code), fingerprints(new_code)
+    return {
+        "added": [name for name in new if name not in old],
+        "changed": [name for name in new if name in old and old[name] != new[name]],
+        "removed": [name for name in old if name not in new],
+        "unchanged": [name for name in new if name in old and old[name] == new[name]],
+    }
@@ -0,0 +1,140 @@
+"""
+Local retrieval index over the chunks of an uploaded file.
+
+Splits code into small AST-derived chunks and ranks them against a question with BM25,
+so question prompts can carry only the relevant code plus a compact outline of the file
+instead of the whole upload. Indexes are built once per file content and cached.
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from modules.code_chunker import outline, pack_chunks, split_into_symbols
+
+# Words too common in code and questions to help ranking
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "how", "i",
+    "if", "in", "is", "it", "of", "on", "or", "the", "this", "to", "what", "when", "where",
+    "which", "why", "with", "self", "def", "return", "import", "none", "true", "false",
+}
+
+# Number of built indexes kept in memory
+MAX_CACHED_INDEXES = 16
+
+
+def tokenize_text(text: str) -> list:
+    """
+    Splits code or a question into lowercase search terms.
+
+    Identifiers are kept whole and also split on snake_case and camelCase boundaries, so
+    "loadUserData" matches questions about "user data".
+
+    Args:
+        text (str): Code or natural-language text.
+
+    Returns:
+        list: Search terms (with repeats, for term frequencies).
+    """
+    terms = []
+    for word in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", text):
+        parts = [part for part in re.split(r"_|(?<=[a-z0-9])(?=[A-Z])", word) if part]
+        for term in {word.lower(), *(part.lower() for part in parts)}:
+            if len(term) > 1 and term not in STOP_WORDS:
+                terms.append(term)
+    return terms
+
+
+class CodeIndex:
+    """
+    BM25 index over the chunks of one source file.
+    """
+
+    def __init__(self, code: str, chunk_tokens: int = 300, k1: float = 1.5, b: float = 0.75):
+        """
+        Splits the code into chunks and indexes them.
+
+        Args:
+            code (str): Python source code.
+            chunk_tokens (int): Token budget of each indexed chunk.
+            k1 (float): BM25 term-frequency saturation.
+            b (float): BM25 length normalization.
+        """
+        symbols = split_into_symbols(code)
+        self.chunks = pack_chunks(symbols, chunk_tokens)
+        self.outline = outline(symbols)
+        self.k1 = k1
+        self.b = b
+
+        self._term_counts = [Counter(tokenize_text(chunk.source)) for chunk in self.chunks]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self.chunks)
+        self._idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+    def score(self, query_terms: list, index: int) -> float:
+        """
+        Computes the BM25 score of one chunk for the given query terms.
+        """
+        counts = self._term_counts[index]
+        length_norm = 1 - self.b + self.b * (self._lengths[index] / self._avg_length if self._avg_length else 0)
+        score = 0.0
+        for term in query_terms:
+            freq = counts.get(term)
+            if freq:
+                score += self._idf[term] * freq * (self.k1 + 1) / (freq + self.k1 * length_norm)
+        return score
+
+    def search(self, query: str, top_k: int = 3) -> list:
+        """
+        Finds the chunks most relevant to a query.
+
+        Args:
+            query (str): Natural-language question or keywords.
+            top_k (int): Maximum number of chunks to return.
+
+        Returns:
+            list: (score, CodeChunk) tuples, best first; chunks with no matching term are left out.
+        """
+        query_terms = list(set(tokenize_text(query)))
+        scored = [(self.score(query_terms, index), index) for index in range(len(self.chunks))]
+        scored = sorted((item for item in scored if item[0] > 0), reverse=True)[:top_k]
+        return [(score, self.chunks[index]) for score, index in scored]
+
+
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def get_code_index(code: str) -> CodeIndex:
+    """
+    Returns the index for a file, building it only the first time its content is seen.
+
+    Args:
+        code (str): Python source code.
+
+    Returns:
+        CodeIndex: Cached or newly built index.
+    """
+    key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+
+    index = CodeIndex(code)
+    with _index_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > MAX_CACHED_INDEXES:
+            _index_cache.popitem(last=False)
+    return index
@@ -6,28 +6,311 @@ Provides functionality to generate and send prompts to large language models
 to produce explanations or answers based on the uploaded code and selected explanation style.
 """
 
-import requests
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.answer_cache import AnswerCache, code_names
+from modules.code_chunker import (
+    CodeChunk,
+    diff_symbols,
+    estimate_tokens,
+    outline,
+    pack_chunks,
+    split_into_symbols,
+    symbol_fingerprint
+)
+from modules.code_index import get_code_index
+from modules.http_transport import HttpTransport
+from modules.prompt_compactor import PromptCompactor
 
 # Default model URL for inference
 DEFAULT_MODEL_URL = "https://api-inference.huggingface.co/models/mistralai/Mixtral-8x7B-Instruct-v0.1"
 # DEFAULT_MODEL_URL ="https://api-inference.huggingface.co/models/meta-llama/Llama-3.1-8B-Instruct"
 
-class CodeExplainer:
+# Returned when the API replies with a payload we cannot interpret
+UNEXPECTED_FORMAT_MESSAGE = "⚠️ Unexpected response format from API."
+
+# Default directory for cached explanations
+DEFAULT_CACHE_DIR = "./modules/data/cache/explanations"
+
+
+class StreamError(Exception):
     """
-    A helper class that interacts with Hugging Face's inference API
-    to explain Python code or answer code-related questions in various styles.
+    Raised when a streamed response fails part-way. The text yielded before it is incomplete;
+    it is not cached and should not be saved.
     """
 
-    def __init__(self, api_key: str, model_url: str = None):
+
+class ExplanationCache:
+    """
+    Content-addressed cache for model explanations.
+
+    Keeps a small in-memory LRU in front of an on-disk store (one JSON file per key),
+    with TTL expiry, size-based eviction and hit/miss counters.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_memory_entries: int = 128,
+        max_disk_bytes: int = 50 * 1024 * 1024,
+        ttl_seconds: float = 7 * 24 * 3600,
+        sweep_every: int = 256
+    ):
         """
-        Initializes the CodeExplainer.
+        Initializes the cache.
+
+        Args:
+            cache_dir (str): Directory for the on-disk store.
+            max_memory_entries (int): Maximum number of entries kept in memory.
+            max_disk_bytes (int): Maximum total size of the on-disk store in bytes.
+            ttl_seconds (float): Time-to-live of an entry in seconds (None disables expiry).
+            sweep_every (int): Number of writes between full scans of the on-disk store, which
+                remove expired entries and pick up changes made by other processes.
+        """
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_every = sweep_every
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()  # Explanations may be cached from worker threads
+        self._disk_bytes = None  # Size of the on-disk store, tracked per write after the first scan
+        self._writes_since_sweep = 0
+        self.sweeps = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(**fields) -> str:
+        """
+        Builds a stable cache key from the given fields.
+
+        Returns:
+            str: SHA-256 hex digest of the JSON-serialized fields.
+        """
+        raw = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str):
+        """
+        Looks up a cached value, checking memory first and then disk.
+
+        Args:
+            key (str): Cache key from `make_key`.
+
+        Returns:
+            str | None: Cached value, or None on a miss.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry["created_at"]):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry["value"]
+                del self._memory[key]
+
+            path = self._path(key)
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    entry = None
+
+                if entry is not None and not self._expired(entry["created_at"]):
+                    self._remember(key, entry)
+                    try:
+                        os.utime(path)  # Mark as recently used for disk eviction
+                    except OSError:
+                        pass
+                    self.hits += 1
+                    return entry["value"]
+
+                self._discard(path)
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Stores a value in memory and on disk, evicting old disk entries if needed.
+
+        The store's size is tracked per write; the directory is only scanned on the first
+        write, when the size limit is crossed and every `sweep_every` writes.
+
+        Args:
+            key (str): Cache key from `make_key`.
+            value (str): Value to store.
+        """
+        with self._lock:
+            entry = {"created_at": time.time(), "value": value}
+            self._remember(key, entry)
+
+            # Write to a temp file first so readers never see a partial entry
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            replaced_size = self._file_size(path)
+            os.replace(tmp_path, path)
+
+            if self._disk_bytes is None:
+                self._evict_disk()
+                return
+            self._disk_bytes += self._file_size(path) - replaced_size
+            self._writes_since_sweep += 1
+            if self._disk_bytes > self.max_disk_bytes or self._writes_since_sweep >= self.sweep_every:
+                self._evict_disk()
+
+    def _remember(self, key: str, entry: dict) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """
+        Removes expired entries, then least recently used ones until under the size limit, and
+        resets the tracked size of the store.
+
+        Eviction goes down to 90% of the limit so that a full cache is not scanned again on
+        the very next write.
+        """
+        self.sweeps += 1
+        files = []
+        total = 0
+        for item in os.scandir(self.cache_dir):
+            if not item.name.endswith(".json"):
+                continue
+            stat = item.stat()
+            if self.ttl_seconds is not None and time.time() - stat.st_mtime > self.ttl_seconds:
+                self._remove(item.path)
+                continue
+            files.append((stat.st_mtime, stat.st_size, item.path))
+            total += stat.st_size
+
+        if total > self.max_disk_bytes:
+            files.sort()
+            for _, size, path in files:
+                if total <= self.max_disk_bytes * 0.9:
+                    break
+                self._remove(path)
+                total -= size
+
+        self._disk_bytes = total
+        self._writes_since_sweep = 0
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _discard(self, path: str) -> None:
+        # Removes an entry file and keeps the tracked size of the store in step
+        size = self._file_size(path)
+        self._remove(path)
+        if self._disk_bytes is not None:
+            self._disk_bytes = max(0, self._disk_bytes - size)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        # Another process sharing the cache directory may have removed it already
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        """
+        Removes all cached entries from memory and disk.
+        """
+        with self._lock:
+            self._memory.clear()
+            for item in os.scandir(self.cache_dir):
+                if item.name.endswith(".json"):
+                    self._remove(item.path)
+            self._disk_bytes = 0
+            self._writes_since_sweep = 0
+
+    def stats(self) -> dict:
+        """
+        Returns cache statistics.
+
+        Returns:
+            dict: Hit and miss counts, hit rate and number of in-memory entries.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+class BaseExplainer:
+    """
+    Prompt building, caching and response parsing shared by the sync and async explainers.
+    Subclasses only add the transport that talks to the inference API.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model_url: str = None,
+        cache: ExplanationCache = None,
+        compactor: PromptCompactor = None,
+        answer_cache: AnswerCache = None
+    ):
+        """
+        Initializes the shared explainer state.
 
         Args:
             api_key (str): Hugging Face API key.
             model_url (str, optional): Custom model URL. Defaults to Mixtral 8x7B model.
+            cache (ExplanationCache, optional): Cache for explanations. Defaults to a disk-backed
+                cache under ./modules/data/cache.
+            compactor (PromptCompactor, optional): Compacts code before it goes into a prompt.
+                Defaults to 'light' compaction.
+            answer_cache (AnswerCache, optional): Cache for answers to questions. Defaults to an
+                in-memory cache with near-duplicate matching.
         """
         self.api_key = api_key
         self.api_url = model_url or DEFAULT_MODEL_URL
+        self.cache = cache if cache is not None else ExplanationCache()
+        self.compactor = compactor or PromptCompactor()
+        self.answer_cache = answer_cache if answer_cache is not None else AnswerCache()
+        self.last_compaction = None  # Report of the most recent compaction
+        self.tokens_saved = 0  # Total estimated tokens saved by compaction
+        self.generation_params = {
+            "max_new_tokens": 512,
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "do_sample": True
+        }
+        # Files above this estimated size are explained chunk by chunk
+        self.chunk_token_budget = 1500
+        # Files above this estimated size only send the chunks relevant to a question
+        self.retrieval_threshold = 800
+        self.retrieval_top_k = 3
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -49,6 +332,35 @@ class CodeExplainer:
             )
         }
 
+    def for_session(self) -> "BaseExplainer":
+        """
+        Returns an explainer for one user session. It shares the caches and HTTP transport of
+        this explainer; only its compaction level and token counters are its own.
+
+        Returns:
+            BaseExplainer: Explainer of the session.
+        """
+        session = copy.copy(self)
+        session.compactor = copy.copy(self.compactor)
+        session.last_compaction = None
+        session.tokens_saved = 0
+        return session
+
+    def compact_code(self, code: str) -> str:
+        """
+        Compacts code for a prompt and records how many tokens were saved.
+
+        Args:
+            code (str): Python source code.
+
+        Returns:
+            str: Compacted code.
+        """
+        compacted, report = self.compactor.compact(code)
+        self.last_compaction = report
+        self.tokens_saved += report["saved_tokens"]
+        return compacted
+
     def generate_prompt(self, code: str, style: str = "concise") -> str:
         """
         Constructs a prompt for the model using the selected explanation style.
@@ -63,50 +375,29 @@ class CodeExplainer:
         instruction = self.instruction_map.get(style.lower(), self.instruction_map["concise"])
         return f"<s>[INST] {instruction}\n\n{code}\n\n[/INST]"
 
-    def explain_code(self, code: str, style: str = "concise") -> str:
+    def explanation_cache_key(self, code: str, style: str = "concise") -> str:
         """
-        Sends a code snippet to the API for explanation.
+        Builds the cache key for an explanation request.
 
         Args:
-            code (str): Python code to be explained.
-            style (str): Explanation style ('concise', 'reiterate', 'in-depth').
+            code (str): The code snippet to be explained.
+            style (str): The explanation style.
 
         Returns:
-            str: Model-generated explanation or error message.
+            str: Key derived from the code, style, compaction level, model URL and generation parameters.
         """
-        prompt = self.generate_prompt(code, style)
-        payload = {
-            "inputs": prompt,
-            "parameters": {
-                "max_new_tokens": 512,
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "do_sample": True
-            }
-        }
-
-        try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload, timeout=40)
-            response.raise_for_status()
-            result = response.json()
-
-            # Extract explanation
-            # Handle both list and dict return formats
-            if isinstance(result, list) and len(result) > 0 and "generated_text" in result[0]:
-                generated_text = result[0]["generated_text"]
-            elif isinstance(result, dict) and "generated_text" in result:
-                generated_text = result["generated_text"]
-            else:
-                return "⚠️ Unexpected response format from API."
-            explanation = generated_text.replace(prompt, "").strip().replace("\\_", "_")
-            return explanation
-
-        except Exception as e:
-            return f"❌ Error explaining code: {str(e)}"
+        return ExplanationCache.make_key(
+            kind="explanation",
+            code=code,
+            style=style.lower(),
+            compaction=self.compactor.level,
+            model_url=self.api_url,
+            parameters=self.generation_params
+        )
 
-    def answer_question(self, question: str, style: str = "concise", uploaded_code: str = None) -> str:
+    def generate_question_prompt(self, question: str, style: str = "concise", uploaded_code: str = None) -> str:
         """
-        Sends a natural language question (with optional code context) to the API.
+        Constructs a question-answering prompt with optional code context.
 
         Args:
             question (str): The user's question.
@@ -114,14 +405,11 @@ class CodeExplainer:
             uploaded_code (str, optional): Python code to provide as context.
 
         Returns:
-            str: Model-generated answer or error message.
+            str: Formatted prompt for model inference.
         """
-        if not question:
-            return "❌ Please enter a question."
-
         # Contextual code block (if any)
         code_section = (
-            f"The code is:\n```python\n{uploaded_code}\n```"
+            self.build_code_context(question, uploaded_code)
             if uploaded_code else "just reply normally with the given style"
         )
 
@@ -132,31 +420,662 @@ class CodeExplainer:
             f"Answer ({style} style):"
         )
 
-        prompt = (
+        return (
             "You are Codi, an assistant that helps explain code and answer code-related and regular questions. "
             f"{code_section} {chat_box}"
         )
 
-        try:
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json={"inputs": prompt},
-                timeout=40
+    def build_code_context(self, question: str, code: str) -> str:
+        """
+        Builds the code section of a question prompt.
+
+        Small files are included whole. For larger files only the chunks most relevant to
+        the question (ranked by a cached BM25 index) are sent, along with an outline of
+        the file's top-level definitions.
+
+        Args:
+            question (str): The user's question.
+            code (str): Uploaded Python code.
+
+        Returns:
+            str: Code context for the prompt.
+        """
+        if estimate_tokens(code) <= self.retrieval_threshold:
+            return f"The code is:\n```python\n{self.compact_code(code)}\n```"
+
+        index = get_code_index(code)
+        hits = index.search(question, self.retrieval_top_k)
+        # Show the relevant chunks in source order; without any match, fall back to the start
+        chunks = sorted((chunk for _, chunk in hits), key=lambda chunk: chunk.start_line) or index.chunks[:1]
+        snippets = "\n\n".join(f"# {chunk.title}\n{self.compact_code(chunk.source)}" for chunk in chunks)
+
+        return (
+            "The file is too long to show in full. Its top-level definitions are:\n"
+            f"{index.outline}\n"
+            f"The parts of the code most relevant to the question are:\n```python\n{snippets}\n```"
+        )
+
+    def answer_context_key(self, style: str = "concise", uploaded_code: str = None) -> str:
+        """
+        Builds the key that groups cached answers for one file, style and model.
+
+        Args:
+            style (str): Response style.
+            uploaded_code (str, optional): Python code provided as context.
+
+        Returns:
+            str: Context key for the answer cache.
+        """
+        code_hash = hashlib.sha256((uploaded_code or "").encode("utf-8")).hexdigest()
+        return ExplanationCache.make_key(
+            kind="answer",
+            code=code_hash,
+            style=style.lower(),
+            compaction=self.compactor.level,
+            model_url=self.api_url
+        )
+
+    def lookup_answer(self, question: str, style: str = "concise", uploaded_code: str = None):
+        """
+        Returns a cached answer to the same or a near-duplicate question, if any.
+
+        Args:
+            question (str): The user's question.
+            style (str): Response style.
+            uploaded_code (str, optional): Python code provided as context.
+
+        Returns:
+            str | None: Cached answer, or None on a miss.
+        """
+        return self.answer_cache.get(
+            self.answer_context_key(style, uploaded_code), question, code_names(uploaded_code)
+        )
+
+    def store_answer(self, question: str, style: str, uploaded_code: str, answer: str) -> None:
+        """
+        Caches an answer unless it is an error or warning message.
+        """
+        if answer and not answer.startswith(("❌", "⚠️")):
+            self.answer_cache.set(
+                self.answer_context_key(style, uploaded_code), question, answer, code_names(uploaded_code)
             )
+
+    @staticmethod
+    def extract_generated_text(result):
+        """
+        Extracts the generated text from an inference API response.
+
+        Args:
+            result (list | dict): Decoded JSON response.
+
+        Returns:
+            str | None: Generated text, or None if the format is not recognised.
+        """
+        # Handle both list and dict return formats
+        if isinstance(result, list) and len(result) > 0 and "generated_text" in result[0]:
+            return result[0]["generated_text"]
+        if isinstance(result, dict) and "generated_text" in result:
+            return result["generated_text"]
+        return None
+
+    @staticmethod
+    def iter_stream_tokens(lines):
+        """
+        Parses a text-generation server-sent-event stream into token texts.
+
+        Args:
+            lines (Iterable[bytes | str]): Raw lines of the event stream.
+
+        Yields:
+            str: Text of each non-special generated token.
+
+        Raises:
+            RuntimeError: If the stream reports an error event.
+        """
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if not line.startswith("data:"):
+                continue  # Skip blank keep-alives, comments and other SSE fields
+
+            data = line[len("data:"):].strip()
+            if not data or data == "[DONE]":
+                continue
+
+            event = json.loads(data)
+            if "error" in event:
+                raise RuntimeError(event["error"])
+
+            token = event.get("token") or {}
+            if token.get("text") and not token.get("special"):
+                yield token["text"]
+
+    def explanation_payload(self, code: str, style: str = "concise") -> dict:
+        """
+        Builds the request payload for an explanation.
+
+        Args:
+            code (str): The code snippet to be explained.
+            style (str): The explanation style.
+
+        Returns:
+            dict: JSON payload for the inference API.
+        """
+        return {
+            "inputs": self.generate_prompt(self.compact_code(code), style),
+            "parameters": self.generation_params
+        }
+
+    def parse_explanation(self, result, prompt: str) -> str:
+        """
+        Turns an inference API response into an explanation.
+
+        Args:
+            result (list | dict): Decoded JSON response.
+            prompt (str): Prompt that was sent (echoed back by some models).
+
+        Returns:
+            str: Explanation, or a warning message if the format is not recognised.
+        """
+        generated_text = self.extract_generated_text(result)
+        if generated_text is None:
+            return UNEXPECTED_FORMAT_MESSAGE
+        return generated_text.replace(prompt, "").strip().replace("\\_", "_")
+
+    def parse_answer(self, result, prompt: str) -> str:
+        """
+        Turns an inference API response into an answer.
+
+        Args:
+            result (list | dict): Decoded JSON response.
+            prompt (str): Prompt that was sent (echoed back by some models).
+
+        Returns:
+            str: Answer, or a warning message if the format is not recognised.
+        """
+        full_response = self.extract_generated_text(result)
+        if full_response is None:
+            return UNEXPECTED_FORMAT_MESSAGE
+        return full_response.replace(prompt, "").strip()
+
+
+    def needs_chunking(self, code: str) -> bool:
+        """
+        Checks whether code is too large to explain in a single request.
+
+        Args:
+            code (str): Python source code.
+
+        Returns:
+            bool: True if the code exceeds the chunk token budget.
+        """
+        return estimate_tokens(code) > self.chunk_token_budget
+
+    def plan_chunks(self, code: str) -> tuple:
+        """
+        Splits code at top-level function and class boundaries into token-budgeted chunks.
+
+        Args:
+            code (str): Python source code.
+
+        Returns:
+            tuple: (chunks, outline) where chunks is a list of CodeChunk objects in source
+                order and outline lists the module's top-level definitions.
+        """
+        symbols = split_into_symbols(code)
+        return pack_chunks(symbols, self.chunk_token_budget), outline(symbols)
+
+    def summary_payload(self, outline_text: str) -> dict:
+        """
+        Builds the request payload for a short file-level summary.
+
+        Args:
+            outline_text (str): Outline of the module's top-level definitions.
+
+        Returns:
+            dict: JSON payload for the inference API.
+        """
+        prompt = (
+            "<s>[INST] In two or three sentences, summarize what a Python module with the "
+            f"following top-level definitions does:\n\n{outline_text}\n\n[/INST]"
+        )
+        return {
+            "inputs": prompt,
+            "parameters": {**self.generation_params, "max_new_tokens": 128}
+        }
+
+    def summary_cache_key(self, outline_text: str) -> str:
+        """
+        Builds the cache key for a file-level summary.
+        """
+        return ExplanationCache.make_key(
+            kind="summary",
+            outline=outline_text,
+            model_url=self.api_url,
+            parameters=self.generation_params
+        )
+
+    def chunk_cache_key(self, chunk, style: str = "concise") -> str:
+        """
+        Builds the cache key for the explanation of a chunk of consecutive symbols.
+        The key uses the normalized ASTs of the chunk's symbols, so formatting-only edits and
+        moving the chunk within the file still hit the cache.
+
+        Args:
+            chunk (CodeChunk): Chunk of functions, classes and module-level statement groups.
+            style (str): The explanation style.
+
+        Returns:
+            str: Cache key.
+        """
+        return ExplanationCache.make_key(
+            kind="chunk",
+            fingerprints=[symbol_fingerprint(symbol) for symbol in chunk.symbols],
+            style=style.lower(),
+            compaction=self.compactor.level,
+            model_url=self.api_url,
+            parameters=self.generation_params
+        )
+
+    @staticmethod
+    def merge_chunk_explanations(summary: str, chunks: list, explanations: list) -> str:
+        """
+        Joins per-chunk explanations into one explanation in source order.
+
+        Args:
+            summary (str): File-level summary (may be empty).
+            chunks (list): CodeChunk or CodeSymbol objects in source order.
+            explanations (list): Explanation of each chunk, in the same order.
+
+        Returns:
+            str: Merged explanation with an overview followed by one section per chunk.
+        """
+        sections = [f"Overview:\n{summary}"] if summary else []
+        for chunk, explanation in zip(chunks, explanations):
+            sections.append(f"{chunk.title}:\n{explanation}")
+        return "\n\n".join(sections)
+
+
+class CodeExplainer(BaseExplainer):
+    """
+    A helper class that interacts with Hugging Face's inference API
+    to explain Python code or answer code-related questions in various styles.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model_url: str = None,
+        cache: ExplanationCache = None,
+        transport: HttpTransport = None,
+        compactor: PromptCompactor = None,
+        answer_cache: AnswerCache = None
+    ):
+        """
+        Initializes the CodeExplainer.
+
+        Args:
+            api_key (str): Hugging Face API key.
+            model_url (str, optional): Custom model URL. Defaults to Mixtral 8x7B model.
+            cache (ExplanationCache, optional): Cache for explanations. Defaults to a disk-backed
+                cache under ./modules/data/cache.
+            transport (HttpTransport, optional): Shared HTTP transport. Defaults to a pooled
+                keep-alive session with retries.
+            compactor (PromptCompactor, optional): Compacts code before it goes into a prompt.
+            answer_cache (AnswerCache, optional): Cache for answers to questions.
+        """
+        super().__init__(api_key, model_url, cache, compactor, answer_cache)
+        self.transport = transport or HttpTransport(self.headers)
+
+    def _stream_completion(self, payload: dict):
+        """
+        Posts a streaming request and yields token texts as they arrive.
+
+        Args:
+            payload (dict): Request payload (the `stream` flag is added here).
+
+        Yields:
+            str: Generated token texts.
+        """
+        response = self.transport.post(self.api_url, {**payload, "stream": True}, stream=True)
+        with response:
             response.raise_for_status()
-            result = response.json()
+            # chunk_size=None hands over bytes as soon as they arrive instead of buffering
+            yield from self.iter_stream_tokens(response.iter_lines(chunk_size=None))
 
-            # Handle both list and dict return formats
-            if isinstance(result, list) and len(result) > 0 and "generated_text" in result[0]:
-                full_response = result[0]["generated_text"]
-            elif isinstance(result, dict) and "generated_text" in result:
-                full_response = result["generated_text"]
-            else:
-                return "⚠️ Unexpected response format from API."
+    def explain_code(self, code: str, style: str = "concise") -> str:
+        """
+        Sends a code snippet to the API for explanation.
+        Repeated requests for the same code, style and model are served from the cache.
 
-            answer = full_response.replace(prompt, "").strip()
+        Args:
+            code (str): Python code to be explained.
+            style (str): Explanation style ('concise', 'reiterate', 'in-depth').
+
+        Returns:
+            str: Model-generated explanation or error message.
+        """
+        return self._generate_cached(
+            self.explanation_cache_key(code, style),
+            lambda: self.explanation_payload(code, style),
+            "❌ Error explaining code"
+        )
+
+    def _generate_cached(self, cache_key: str, make_payload, error_prefix: str, check_cache: bool = True) -> str:
+        """
+        Returns a cached completion, or requests one and caches it if it parsed cleanly.
+
+        Args:
+            cache_key (str): Cache key for the request.
+            make_payload (Callable[[], dict]): Builds the JSON payload; only called on a miss.
+            error_prefix (str): Prefix of the message returned when the request fails.
+            check_cache (bool): Whether to look up the cache first (callers that already
+                missed it can skip the second lookup).
+
+        Returns:
+            str: Generated text or error message.
+        """
+        if check_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        payload = make_payload()
+        try:
+            response = self.transport.post(self.api_url, payload)
+            response.raise_for_status()
+
+            text = self.parse_explanation(response.json(), payload["inputs"])
+            if text != UNEXPECTED_FORMAT_MESSAGE:
+                self.cache.set(cache_key, text)
+            return text
+
+        except Exception as e:
+            return f"{error_prefix}: {str(e)}"
+
+    def summarize_outline(self, outline_text: str) -> str:
+        """
+        Produces a short file-level summary from a module outline.
+
+        Args:
+            outline_text (str): Outline of the module's top-level definitions.
+
+        Returns:
+            str: Summary or error message.
+        """
+        return self._generate_cached(
+            self.summary_cache_key(outline_text),
+            lambda: self.summary_payload(outline_text),
+            "❌ Error summarizing code"
+        )
+
+    def explain_large_code(self, code: str, style: str = "concise", max_workers: int = 4) -> str:
+        """
+        Explains a large file by splitting it at top-level function and class boundaries.
+
+        Chunks and a file-level summary are requested concurrently, so latency follows the
+        slowest chunk rather than the size of the file. Small files take the single-request path.
+
+        Args:
+            code (str): Python code to be explained.
+            style (str): Explanation style ('concise', 'reiterate', 'in-depth').
+            max_workers (int): Maximum number of requests in flight at once.
+
+        Returns:
+            str: Merged explanation in source order.
+        """
+        chunks, outline_text = self.plan_chunks(code) if self.needs_chunking(code) else ([], "")
+        if len(chunks) <= 1:
+            return self.explain_code(code, style)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            summary_future = pool.submit(self.summarize_outline, outline_text) if outline_text else None
+            chunk_futures = [pool.submit(self.explain_code, chunk.source, style) for chunk in chunks]
+            explanations = [future.result() for future in chunk_futures]
+            summary = summary_future.result() if summary_future else ""
+
+        # The overview is a nice-to-have; leave it out rather than show an error
+        if summary.startswith("❌"):
+            summary = ""
+        return self.merge_chunk_explanations(summary, chunks, explanations)
+
+    def explain_incremental(
+        self,
+        code: str,
+        style: str = "concise",
+        previous_code: str = None,
+        max_workers: int = 4
+    ) -> tuple:
+        """
+        Explains a large file in token-budgeted chunks, reusing cached explanations of chunks
+        whose code is unchanged.
+
+        The file is packed into chunks like `explain_large_code`, and each chunk is cached
+        under the normalized ASTs of its symbols. After an edit, cached chunks of the current
+        or the previous version whose symbols are all still there, in order and unchanged, are
+        stitched back in; the remaining symbols are packed into new chunks and sent to the
+        model, on one pool together with the file-level summary.
+
+        Args:
+            code (str): Current version of the Python code.
+            style (str): Explanation style ('concise', 'reiterate', 'in-depth').
+            previous_code (str, optional): Previously explained version, whose chunks may be
+                reused and which is compared against for the report.
+            max_workers (int): Maximum number of requests in flight at once.
+
+        Returns:
+            tuple: (explanation, report) where report counts 'reused' and 'fresh' chunks and,
+                if `previous_code` was given, lists 'added', 'changed' and 'removed' symbols.
+        """
+        symbols = split_into_symbols(code)
+        if not symbols:
+            return self.explain_code(code, style), {"reused": 0, "fresh": 1}
+
+        planned = pack_chunks(symbols, self.chunk_token_budget)
+        pieces = [piece for chunk in planned for piece in chunk.symbols]  # Oversized symbols come split
+        fingerprints = [symbol_fingerprint(piece) for piece in pieces]
+
+        candidates = list(planned)
+        if previous_code is not None:
+            candidates += pack_chunks(split_into_symbols(previous_code), self.chunk_token_budget)
+
+        covered = [False] * len(pieces)
+        sections = []  # (chunk, explanation or None while pending), in no particular order
+        looked_up = set()
+        for candidate in candidates:
+            key = self.chunk_cache_key(candidate, style)
+            start = self._find_run(fingerprints, covered, [symbol_fingerprint(s) for s in candidate.symbols])
+            if start is None or key in looked_up:
+                continue
+            looked_up.add(key)
+            explanation = self.cache.get(key)
+            if explanation is not None:
+                end = start + len(candidate.symbols)
+                covered[start:end] = [True] * (end - start)
+                sections.append((self._join_pieces(pieces[start:end]), explanation))
+
+        # Pack each run of symbols without a cached explanation into fresh chunks
+        fresh = []
+        run = []
+        for piece, is_covered in zip(pieces + [None], covered + [True]):
+            if not is_covered:
+                run.append(piece)
+            elif run:
+                for chunk in pack_chunks(run, self.chunk_token_budget):
+                    key = self.chunk_cache_key(chunk, style)
+                    explanation = self.cache.get(key) if key not in looked_up else None
+                    looked_up.add(key)
+                    if explanation is not None:
+                        sections.append((chunk, explanation))
+                    else:
+                        fresh.append((chunk, key))
+                run = []
+
+        outline_text = outline(symbols)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            summary_future = pool.submit(self.summarize_outline, outline_text) if outline_text else None
+            futures = [
+                (chunk, pool.submit(
+                    self._generate_cached,
+                    key,
+                    lambda chunk=chunk: self.explanation_payload(chunk.source, style),
+                    "❌ Error explaining code",
+                    False
+                ))
+                for chunk, key in fresh
+            ]
+            report = {"reused": len(sections), "fresh": len(futures)}
+            sections += [(chunk, future.result()) for chunk, future in futures]
+            summary = summary_future.result() if summary_future else ""
+
+        if summary.startswith("❌"):
+            summary = ""
+
+        if previous_code is not None:
+            diff = diff_symbols(previous_code, code)
+            report.update({key: diff[key] for key in ("added", "changed", "removed")})
+
+        sections.sort(key=lambda section: section[0].start_line)
+        chunks, explanations = zip(*sections)
+        return self.merge_chunk_explanations(summary, chunks, explanations), report
+
+    @staticmethod
+    def _find_run(fingerprints: list, covered: list, run: list):
+        """
+        Returns where `run` occurs in `fingerprints` on symbols not yet covered, or None.
+        """
+        for start in range(len(fingerprints) - len(run) + 1):
+            end = start + len(run)
+            if fingerprints[start:end] == run and not any(covered[start:end]):
+                return start
+        return None
+
+    @staticmethod
+    def _join_pieces(pieces: list) -> CodeChunk:
+        return CodeChunk(
+            symbols=list(pieces),
+            source="".join(piece.source for piece in pieces),
+            start_line=pieces[0].start_line,
+            end_line=pieces[-1].end_line
+        )
+
+    def explain_code_stream(self, code: str, style: str = "concise"):
+        """
+        Streams an explanation token by token.
+        A cached explanation is yielded in one piece; a freshly streamed one is cached once complete.
+
+        Args:
+            code (str): Python code to be explained.
+            style (str): Explanation style ('concise', 'reiterate', 'in-depth').
+
+        Yields:
+            str: Explanation text fragments.
+
+        Raises:
+            StreamError: If the request or the stream fails (the message is user-facing).
+        """
+        cache_key = self.explanation_cache_key(code, style)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        payload = self.explanation_payload(code, style)
+
+        parts = []
+        try:
+            for token in self._stream_completion(payload):
+                if not parts:
+                    token = token.lstrip()
+                    if not token:
+                        continue
+                token = token.replace("\\_", "_")
+                parts.append(token)
+                yield token
+        except Exception as e:
+            raise StreamError(f"❌ Error explaining code: {str(e)}") from e
+
+        explanation = "".join(parts).strip()
+        if explanation:
+            self.cache.set(cache_key, explanation)
+
+    def answer_question(self, question: str, style: str = "concise", uploaded_code: str = None) -> str:
+        """
+        Sends a natural language question (with optional code context) to the API.
+
+        Args:
+            question (str): The user's question.
+            style (str): Response style ('concise', 'reiterate', or 'in-depth').
+            uploaded_code (str, optional): Python code to provide as context.
+
+        Returns:
+            str: Model-generated answer or error message.
+        """
+        if not question:
+            return "❌ Please enter a question."
+
+        cached = self.lookup_answer(question, style, uploaded_code)
+        if cached is not None:
+            return cached
+
+        prompt = self.generate_question_prompt(question, style, uploaded_code)
+
+        try:
+            response = self.transport.post(self.api_url, {"inputs": prompt})
+            response.raise_for_status()
+            answer = self.parse_answer(response.json(), prompt)
+            self.store_answer(question, style, uploaded_code, answer)
             return answer
 
         except Exception as e:
             return f"❌ Error fetching answer: {str(e)}"
+
+    def answer_question_stream(
+        self,
+        question: str,
+        style: str = "concise",
+        uploaded_code: str = None,
+        check_cache: bool = True
+    ):
+        """
+        Streams the answer to a question token by token.
+        A cached answer is yielded in one piece; a freshly streamed one is cached once complete.
+
+        Args:
+            question (str): The user's question.
+            style (str): Response style ('concise', 'reiterate', or 'in-depth').
+            uploaded_code (str, optional): Python code to provide as context.
+            check_cache (bool): Whether to look up the answer cache first (callers that
+                already did so with `lookup_answer` can skip it).
+
+        Yields:
+            str: Answer text fragments, or a message asking for a question.
+
+        Raises:
+            StreamError: If the request or the stream fails (the message is user-facing).
+        """
+        if not question:
+            yield "❌ Please enter a question."
+            return
+
+        if check_cache:
+            cached = self.lookup_answer(question, style, uploaded_code)
+            if cached is not None:
+                yield cached
+                return
+
+        payload = {"inputs": self.generate_question_prompt(question, style, uploaded_code)}
+
+        parts = []
+        try:
+            for token in self._stream_completion(payload):
+                if not parts:
+                    token = token.lstrip()
+                    if not token:
+                        continue
+                parts.append(token)
+                yield token
+        except Exception as e:
+            raise StreamError(f"❌ Error fetching answer: {str(e)}") from e
+
+        self.store_answer(question, style, uploaded_code, "".join(parts).strip())
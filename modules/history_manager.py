@@ -1,17 +1,40 @@
 """
 Manages upload, explanation, and chat histories for the application.
 
-Supports saving, loading, and clearing JSON-based records.
+Supports saving, loading, and clearing records in a pluggable storage backend (SQLite by
+default, or the original JSON files). Uploaded code is kept once per content in a
+compressed blob store and referenced from upload entries by its hash. Saved entries are
+added to a full-text search index as they are stored. Each user or session can keep its own
+history namespace (see `for_namespace`).
 Also handles cleanup of generated audio and PDF files.
 """
 
-import json
+import copy
 import os
+import threading
+from collections import OrderedDict
+
+from modules.blob_store import BlobStore
+from modules.history_search import (
+    DEFAULT_SEARCH_DB_PATH,
+    SEARCH_KINDS,
+    HistorySearchIndex,
+    index_files,
+    indexed_namespaces,
+    namespace_search_path,
+)
+from modules.history_storage import DEFAULT_NAMESPACE, JsonHistoryStorage, SqliteHistoryStorage, normalize_namespace
+
+# Storage marker set once uploads saved before the blob store have been converted
+UPLOAD_BLOBS_MARKER = "upload_blobs_migrated"
+
+# Namespace managers kept open (least recently used ones are closed first)
+MAX_NAMESPACE_MANAGERS = 64
 
 class HistoryManager:
     """
     Manages upload, explanation, and chat history along with associated audio and PDF files.
-    Stores history in JSON format and handles cleanup of media files.
+    Stores history through a `HistoryStorage` backend and handles cleanup of media files.
     """
 
     def __init__(
@@ -19,8 +42,12 @@ class HistoryManager:
         upload_history_path: str = "./modules/data/upload_history.json",
         explanation_history_path: str = "./modules/data/explanation_history.json",
         chat_history_path: str = "./modules/data/chat_history.json",
-        audio_dir: str = "./modules/data/audio",
-        pdf_dir: str = "./modules/data"
+        audio_dir: str = "./modules/data/cache/audio",
+        pdf_dir: str = "./modules/data",
+        backend: str = "sqlite",
+        db_path: str = "./modules/data/history.db",
+        blob_dir: str = "./modules/data/blobs",
+        search_db_path: str = DEFAULT_SEARCH_DB_PATH
     ):
         """
         Initializes the history manager with file paths for various types of histories.
@@ -29,14 +56,20 @@ class HistoryManager:
             upload_history_path (str): File path for upload history JSON.
             explanation_history_path (str): File path for explanation history JSON.
             chat_history_path (str): File path for chat history JSON.
-            audio_dir (str): Directory for storing audio (MP3) files.
+            audio_dir (str): Directory of the cached audio (MP3) files.
             pdf_dir (str): Directory for storing PDF files.
+            backend (str): 'sqlite' (default) or 'json' (the JSON files above).
+            db_path (str): SQLite database file of the 'sqlite' backend.
+            blob_dir (str): Directory of the blob store for uploaded code.
+            search_db_path (str): SQLite file of the full-text search index.
         """
         self.upload_history_path = upload_history_path
         self.explanation_history_path = explanation_history_path
         self.chat_history_path = chat_history_path
         self.audio_dir = audio_dir
         self.pdf_dir = pdf_dir
+        self.search_db_path = search_db_path
+        self.namespace = DEFAULT_NAMESPACE
 
         # Ensure all necessary directories exist
         os.makedirs(os.path.dirname(self.upload_history_path), exist_ok=True)
@@ -45,118 +78,503 @@ class HistoryManager:
         os.makedirs(self.audio_dir, exist_ok=True)
         os.makedirs(self.pdf_dir, exist_ok=True)
 
+        json_paths = {
+            "upload": upload_history_path,
+            "explanation": explanation_history_path,
+            "chat": chat_history_path,
+        }
+        if backend == "json":
+            self.storage = JsonHistoryStorage(json_paths)
+        else:
+            self.storage = SqliteHistoryStorage(db_path)
+            # One-time import of histories saved by earlier versions
+            self.storage.migrate_json(json_paths)
+
+        self.blobs = BlobStore(blob_dir)
+        if self.storage.get_marker(UPLOAD_BLOBS_MARKER) is None:
+            # One-time move of code saved inline by earlier versions
+            converted = self.migrate_upload_blobs()
+            self.storage.set_marker(UPLOAD_BLOBS_MARKER, str(converted))
+
+        self.search_index = HistorySearchIndex(search_db_path)
+        if self.search_index.created:
+            # Index histories saved before the index existed
+            self.rebuild_search_index()
+
+        # Open namespace managers, shared by every manager created through `for_namespace`
+        self._namespace_managers = OrderedDict({DEFAULT_NAMESPACE: self})
+        self._namespace_lock = threading.Lock()
+
+    # === Namespaces ===
+    def for_namespace(self, namespace: str) -> "HistoryManager":
+        """
+        Returns the history manager of a namespace (a user or session). It shares storage
+        connections, the blob store and file directories with this manager; only its
+        entries and search index are its own.
+
+        Args:
+            namespace (str): User name or session id (normalized with `normalize_namespace`).
+
+        Returns:
+            HistoryManager: Manager of the namespace.
+        """
+        namespace = normalize_namespace(namespace)
+        with self._namespace_lock:
+            manager = self._namespace_managers.get(namespace)
+            if manager is None:
+                manager = copy.copy(self)
+                manager.namespace = namespace
+                manager.storage = self.storage.with_namespace(namespace)
+                manager.search_index = HistorySearchIndex(namespace_search_path(self.search_db_path, namespace))
+                if manager.search_index.created:
+                    manager.rebuild_search_index()
+                self._namespace_managers[namespace] = manager
+                while len(self._namespace_managers) > MAX_NAMESPACE_MANAGERS:
+                    oldest = next(name for name in self._namespace_managers if name != DEFAULT_NAMESPACE)
+                    self._namespace_managers.pop(oldest).search_index.close()
+            self._namespace_managers.move_to_end(namespace)
+        return manager
+
+    def namespaces(self) -> list:
+        """
+        Returns the namespaces that have stored history.
+        """
+        return self.storage.namespaces()
+
+    def known_namespaces(self) -> list:
+        """
+        Returns the namespaces that have stored history or a search index (a session that
+        opened the History tab but never saved anything only has the latter).
+        """
+        return sorted(set(self.namespaces()) | set(indexed_namespaces(self.search_db_path)))
+
+    def namespace_activity(self, namespace: str) -> float:
+        """
+        Returns the last time a namespace's search index changed (0 if it has none).
+        """
+        namespace = normalize_namespace(namespace)
+        mtimes = []
+        for path in index_files(namespace_search_path(self.search_db_path, namespace)):
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except FileNotFoundError:
+                continue
+        return max(mtimes, default=0)
+
+    def remove_namespace(self, namespace: str) -> int:
+        """
+        Removes a namespace: its entries, its search index files and, for JSON histories, its
+        directory. Files its entries referenced are left to the retention sweeper. The default
+        namespace cannot be removed.
+
+        Args:
+            namespace (str): User name or session id.
+
+        Returns:
+            int: Bytes freed by removing the index files.
+        """
+        namespace = normalize_namespace(namespace)
+        if namespace == DEFAULT_NAMESPACE:
+            raise ValueError("The default history namespace cannot be removed")
+        with self._namespace_lock:
+            manager = self._namespace_managers.pop(namespace, None)
+        if manager is not None:
+            manager.search_index.close()
+        self.storage.with_namespace(namespace).drop()
+
+        freed = 0
+        for path in index_files(namespace_search_path(self.search_db_path, namespace)):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+            except FileNotFoundError:
+                continue
+        return freed
+
+    def referenced_files(self, all_namespaces: bool = False) -> tuple:
+        """
+        Collects the files history entries reference.
+
+        Args:
+            all_namespaces (bool): Include the entries of every namespace, not only this one.
+
+        Returns:
+            tuple: Absolute paths of PDF and audio files, and digests of upload blobs.
+        """
+        paths, digests = set(), set()
+        for namespace in (self.namespaces() if all_namespaces else [self.namespace]):
+            storage = self.storage.with_namespace(namespace)
+            for entry in storage.query("explanation", fields=("pdf_path", "audio_path")):
+                for field in ("pdf_path", "audio_path"):
+                    if entry.get(field):
+                        paths.add(os.path.abspath(entry[field]))
+            for entry in storage.query("upload", fields=("content_hash",)):
+                if entry.get("content_hash"):
+                    digests.add(entry["content_hash"])
+        return paths, digests
+
+    # === Queries ===
+    def clear_file_references(self, paths: set) -> int:
+        """
+        Clears the PDF and audio paths of entries (in every namespace) that reference the
+        given files, e.g. after the files were removed.
+
+        Args:
+            paths (set): Absolute paths of the removed files.
+
+        Returns:
+            int: Number of updated entries.
+        """
+        updated = 0
+        for namespace in self.namespaces():
+            storage = self.storage.with_namespace(namespace)
+            for entry in storage.query("explanation", fields=("pdf_path", "audio_path")):
+                fields = {
+                    field: None for field in ("pdf_path", "audio_path")
+                    if entry.get(field) and os.path.abspath(entry[field]) in paths
+                }
+                if fields:
+                    storage.update("explanation", entry["id"], fields)
+                    updated += 1
+        return updated
+
+    def query(
+        self,
+        kind: str,
+        offset: int = 0,
+        limit: int = None,
+        newest_first: bool = True,
+        fields: tuple = None,
+        filters: dict = None
+    ) -> list:
+        """
+        Loads one page of a history.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+            offset (int): Number of entries to skip.
+            limit (int): Maximum number of entries (None for all).
+            newest_first (bool): Order of the entries.
+            fields (tuple): Fields to load besides 'id' and 'created_at' (None for all), e.g.
+                only the titles needed to list entries.
+            filters (dict): Field values entries must equal.
+
+        Returns:
+            list: History entries.
+        """
+        return self.storage.query(kind, offset, limit, newest_first, fields, filters)
+
+    def count(self, kind: str) -> int:
+        """
+        Returns the number of entries of a history.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+
+        Returns:
+            int: Number of entries.
+        """
+        return self.storage.count(kind)
+
+    def get_entry(self, kind: str, entry_id: int):
+        """
+        Loads a single history entry with all of its fields.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+            entry_id (int): Id of the entry.
+
+        Returns:
+            dict | None: The entry, or None if it no longer exists.
+        """
+        return self.storage.get(kind, entry_id)
+
+    # === Search ===
+    def _search_text(self, kind: str, entry: dict) -> tuple:
+        """
+        Returns the indexed (title, body) of an entry.
+        """
+        if kind == "upload":
+            return entry.get("filename"), self.load_upload_content(entry)
+        if kind == "explanation":
+            return entry.get("filename"), entry.get("explanation")
+        return entry.get("question"), entry.get("answer")
+
+    def _index_entries(self, kind: str, entries: list) -> None:
+        self.search_index.index_many(
+            kind, [(entry["id"], *self._search_text(kind, entry)) for entry in entries]
+        )
+
+    def search(self, text: str, kinds: tuple = None, limit: int = 20) -> list:
+        """
+        Searches uploads, explanations and chats.
+
+        Args:
+            text (str): Search text; entries must contain every word.
+            kinds (tuple): History kinds to search (None for all).
+            limit (int): Maximum number of results.
+
+        Returns:
+            list: Ranked results with 'kind', 'id', 'title' and a highlighted 'snippet'.
+        """
+        return self.search_index.search(text, kinds, limit)
+
+    def rebuild_search_index(self, batch_size: int = 500) -> dict:
+        """
+        Re-creates the search index from the stored histories.
+
+        Args:
+            batch_size (int): Entries read and indexed per transaction.
+
+        Returns:
+            dict: Number of indexed entries per kind.
+        """
+        self.search_index.clear()
+        indexed = {}
+        for kind in SEARCH_KINDS:
+            indexed[kind] = 0
+            while True:
+                entries = self.storage.query(kind, indexed[kind], batch_size, newest_first=False)
+                if not entries:
+                    break
+                self._index_entries(kind, entries)
+                indexed[kind] += len(entries)
+        self.search_index.optimize()
+        return indexed
+
+    def delete_entries(self, kind: str, entry_ids: list) -> None:
+        """
+        Removes entries from a history and from the search index. Files they referenced are
+        left to the retention sweeper, which removes them once nothing references them.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+            entry_ids (list): Ids of the entries.
+        """
+        if not entry_ids:
+            return
+        self.storage.delete(kind, entry_ids)
+        self.search_index.remove(kind, entry_ids)
+
     # === Upload History ===
+    def add_upload(self, entry: dict) -> int:
+        """
+        Adds an upload as the newest history entry. The code is moved into the blob store;
+        the entry keeps its hash and size instead.
+
+        Args:
+            entry (dict): Upload entry (filename and content).
+
+        Returns:
+            int: Id of the stored entry (also set as entry['id']).
+        """
+        content = self._store_upload_content(entry)
+        entry_id = self.storage.append("upload", entry)
+        self.search_index.index("upload", entry_id, entry.get("filename"), content)
+        return entry_id
+
+    def _store_upload_content(self, entry: dict):
+        """
+        Moves the code of an upload entry into the blob store, leaving its hash and size.
+
+        Returns:
+            str | None: The moved code (None if the entry had none inline).
+        """
+        content = entry.pop("content", None)
+        if content is not None:
+            entry["content_hash"] = self.blobs.put(content)
+            entry["size"] = len(content.encode("utf-8"))
+        return content
+
+    def load_upload_content(self, entry: dict):
+        """
+        Fetches the code of an upload entry.
+
+        Args:
+            entry (dict): Upload history entry.
+
+        Returns:
+            str | None: Uploaded code, or None if its blob is missing.
+        """
+        if entry.get("content") is not None:
+            return entry["content"]  # Saved before the blob store existed
+        return self.blobs.get_text(entry["content_hash"]) if entry.get("content_hash") else None
+
+    def migrate_upload_blobs(self) -> int:
+        """
+        Moves code stored inline in older upload entries of every namespace into the blob
+        store. Runs once per storage, on the first construction of a manager (see
+        `UPLOAD_BLOBS_MARKER`).
+
+        Returns:
+            int: Number of converted entries.
+        """
+        converted = 0
+        for namespace in self.storage.namespaces():
+            storage = self.storage.with_namespace(namespace)
+            for entry in storage.query("upload", fields=("content",)):
+                if entry.get("content") is None:
+                    continue
+                fields = {"content": entry["content"]}
+                self._store_upload_content(fields)
+                storage.update("upload", entry["id"], {"content": None, **fields})
+                converted += 1
+        return converted
+
+    def find_previous_upload(self, filename: str, content_hash: str):
+        """
+        Finds the newest upload of a file whose content differs from the given version.
+
+        Args:
+            filename (str): Uploaded file name.
+            content_hash (str): Digest of the current content.
+
+        Returns:
+            dict | None: Upload entry, or None if the file was never uploaded with other content.
+        """
+        for entry in self.storage.query("upload", fields=("content", "content_hash"), filters={"filename": filename}):
+            if entry.get("content_hash") != content_hash:
+                return entry
+        return None
+
     def save_upload_history(self, data: list) -> None:
         """
-        Saves the upload history to a JSON file.
+        Replaces the stored upload history (prefer `add_upload` for new entries). Code in
+        the entries is moved into the blob store, as by `add_upload`.
 
         Args:
             data (list): List of uploaded file metadata.
         """
-        with open(self.upload_history_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        entries = [dict(entry) for entry in data]
+        for entry in entries:
+            self._store_upload_content(entry)
+        self.storage.replace_all("upload", entries)
+        self.search_index.clear("upload")
+        self._index_entries("upload", self.storage.query("upload"))
 
     def load_upload_history(self) -> list:
         """
-        Loads the upload history from a JSON file.
+        Loads the upload history, newest first.
 
         Returns:
             list: List of uploaded file metadata.
         """
-        if os.path.exists(self.upload_history_path):
-            try:
-                with open(self.upload_history_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return []
-        return []
+        return self.storage.load("upload")
 
     def clear_upload_history(self) -> None:
         """
-        Deletes the upload history file if it exists.
+        Removes all upload history entries.
         """
-        with open(self.upload_history_path, "w", encoding="utf-8") as f:
-            json.dump([], f)
+        self.storage.clear("upload")
+        self.search_index.clear("upload")
 
     # === Explanation History ===
+    def add_explanation(self, entry: dict) -> int:
+        """
+        Adds an explanation as the newest history entry.
+
+        Args:
+            entry (dict): Explanation entry (filename and explanation).
+
+        Returns:
+            int: Id of the stored entry (also set as entry['id']).
+        """
+        entry_id = self.storage.append("explanation", entry)
+        self.search_index.index("explanation", entry_id, *self._search_text("explanation", entry))
+        return entry_id
+
+    def update_explanation(self, entry_id: int, fields: dict) -> None:
+        """
+        Updates a stored explanation entry, e.g. with its PDF and audio paths.
+
+        Args:
+            entry_id (int): Id returned by `add_explanation`.
+            fields (dict): Fields to set.
+        """
+        self.storage.update("explanation", entry_id, fields)
+        if "filename" in fields or "explanation" in fields:
+            entry = self.storage.get("explanation", entry_id)
+            if entry is not None:
+                self._index_entries("explanation", [entry])
+
     def save_explanation_history(self, data: list) -> None:
         """
-        Saves the explanation history to a JSON file.
+        Replaces the stored explanation history (prefer `add_explanation` for new entries).
 
         Args:
             data (list): List of explanation entries.
         """
-        with open(self.explanation_history_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        self.storage.replace_all("explanation", data)
+        self.search_index.clear("explanation")
+        self._index_entries("explanation", self.storage.query("explanation"))
 
     def load_explanation_history(self) -> list:
         """
-        Loads the explanation history from a JSON file.
+        Loads the explanation history, newest first.
 
         Returns:
             list: List of explanation entries.
         """
-        if os.path.exists(self.explanation_history_path):
-            try:
-                with open(self.explanation_history_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return []
-        return []
+        return self.storage.load("explanation")
 
     def clear_explanation_history(self) -> None:
         """
-        Clears the explanation history and removes associated MP3 and PDF files.
+        Clears the explanation history and removes its audio and PDF files, except files other
+        namespaces still reference. Unreferenced cached audio is left to the retention sweeper.
         """
-        # Clear explanation history JSON file
-        with open(self.explanation_history_path, "w", encoding="utf-8") as f:
-            json.dump([], f)
+        paths, _ = self.referenced_files()
 
-        # Remove all MP3 files in audio directory
-        for file in os.listdir(self.audio_dir):
-            if file.endswith(".mp3"):
-                os.remove(os.path.join(self.audio_dir, file))
+        # Clear explanation history entries
+        self.storage.clear("explanation")
+        self.search_index.clear("explanation")
 
-        # Remove PDF files starting with "expl_"
-        for file in os.listdir(self.pdf_dir):
-            if file.startswith("expl_") and file.endswith(".pdf"):
-                os.remove(os.path.join(self.pdf_dir, file))
+        # PDFs and audio are content-addressed, so other users' entries may share them
+        still_referenced, _ = self.referenced_files(all_namespaces=True)
+        for path in paths - still_referenced:
+            if os.path.exists(path):
+                os.remove(path)
 
     # === Chat History ===
+    def add_chat(self, entry: dict) -> int:
+        """
+        Adds a question and answer as the newest chat history entry.
+
+        Args:
+            entry (dict): Chat entry (question, answer and whether it was cached).
+
+        Returns:
+            int: Id of the stored entry (also set as entry['id']).
+        """
+        entry_id = self.storage.append("chat", entry)
+        self.search_index.index("chat", entry_id, *self._search_text("chat", entry))
+        return entry_id
+
     def save_chat_history(self, data: list) -> None:
         """
-        Saves the chat history to a JSON file.
+        Replaces the stored chat history (prefer `add_chat` for new entries).
 
         Args:
             data (list): List of chat message entries.
         """
-        with open(self.chat_history_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.storage.replace_all("chat", data)
+        self.search_index.clear("chat")
+        self._index_entries("chat", self.storage.query("chat"))
 
     def load_chat_history(self) -> list:
         """
-        Loads the chat history from a JSON file.
+        Loads the chat history, newest first.
 
         Returns:
             list: List of chat message entries.
         """
-        if os.path.exists(self.chat_history_path):
-            try:
-                with open(self.chat_history_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return []
-        return []
+        return self.storage.load("chat")
 
     def clear_chat_history(self) -> None:
         """
-        Clears the chat history and removes associated chat PDF files.
+        Clears the chat history. Chat PDFs are rendered in memory; files left by earlier
+        versions are removed by the retention sweeper.
         """
-        # Clear chat history JSON file
-        with open(self.chat_history_path, "w", encoding="utf-8") as f:
-            json.dump([], f)
-
-        # Remove PDF files starting with "chat_"
-        for file in os.listdir(self.pdf_dir):
-            if file.startswith("chat_") and file.endswith(".pdf"):
-                os.remove(os.path.join(self.pdf_dir, file))
+        # Clear chat history entries
+        self.storage.clear("chat")
+        self.search_index.clear("chat")
@@ -0,0 +1,273 @@
+"""
+Full-text search over upload, explanation and chat histories.
+
+Entries are indexed in a SQLite FTS5 table, kept up to date by `HistoryManager` as entries
+are saved. Results are ranked with BM25 (titles weigh more than bodies) and come with
+highlighted snippets. The index is derived data: it lives in the cache directory and can
+be rebuilt from the stored histories at any time:
+
+    python -m modules.history_search --rebuild [--backend json]
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from modules.history_storage import DEFAULT_NAMESPACE
+
+# Index file (derived from the histories, so it lives with the other caches)
+DEFAULT_SEARCH_DB_PATH = "./modules/data/cache/history_search.db"
+
+# Position of each history kind in index row ids (rowid = entry id * number of kinds + position)
+SEARCH_KINDS = ("upload", "explanation", "chat")
+
+# Marks around matched terms in snippets (Markdown bold)
+HIGHLIGHT = ("**", "**")
+
+
+def namespace_search_path(db_path: str, namespace: str) -> str:
+    """
+    Returns the index file of a history namespace ('history_search.db' for the default
+    namespace, 'history_search.<namespace>.db' for others).
+    """
+    if namespace == DEFAULT_NAMESPACE:
+        return db_path
+    root, extension = os.path.splitext(db_path)
+    return f"{root}.{namespace}{extension}"
+
+
+def indexed_namespaces(db_path: str = DEFAULT_SEARCH_DB_PATH) -> list:
+    """
+    Returns the namespaces, other than the default one, that have an index file next to the
+    default namespace's index.
+    """
+    root, extension = os.path.splitext(os.path.basename(db_path))
+    pattern = re.compile(rf"{re.escape(root)}\.([A-Za-z0-9_-]+){re.escape(extension)}")
+    try:
+        names = os.listdir(os.path.dirname(db_path) or ".")
+    except FileNotFoundError:
+        return []
+    return sorted(match.group(1) for match in map(pattern.fullmatch, names) if match)
+
+
+def index_files(db_path: str) -> list:
+    """
+    Returns the existing files of an index (the database and its WAL and shared-memory files).
+    """
+    return [path for path in (db_path, f"{db_path}-wal", f"{db_path}-shm") if os.path.exists(path)]
+
+
+def build_match_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 query matching entries that contain every word. Words are
+    quoted, so FTS5 operators typed by the user are searched as plain text.
+
+    Args:
+        text (str): Search text as typed by the user.
+
+    Returns:
+        str: FTS5 MATCH expression, or '' if the text has no searchable words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return ""
+    return " ".join(f'"{word}"' for word in words)
+
+
+class HistorySearchIndex:
+    """
+    FTS5 index of history entries, one connection per thread.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_SEARCH_DB_PATH):
+        """
+        Opens (or creates) the index.
+
+        Args:
+            db_path (str): SQLite file of the index.
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.created = not os.path.exists(db_path)  # A new index must be filled by a rebuild
+        self._local = threading.local()
+        self.available = True
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+                    "kind UNINDEXED, entry_id UNINDEXED, title, body, tokenize='unicode61')"
+                )
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5: history still works, search is disabled
+            print(f"⚠️ History search unavailable: {e}")
+            self.available = False
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _rowid(kind: str, entry_id: int) -> int:
+        return int(entry_id) * len(SEARCH_KINDS) + SEARCH_KINDS.index(kind)
+
+    def index(self, kind: str, entry_id: int, title: str, body: str) -> None:
+        """
+        Adds an entry to the index, replacing an earlier version of it.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+            entry_id (int): Id of the history entry.
+            title (str): Filename or question.
+            body (str): Code, explanation or answer.
+        """
+        self.index_many(kind, [(entry_id, title, body)])
+
+    def index_many(self, kind: str, rows) -> None:
+        """
+        Adds several entries of one history in a single transaction.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+            rows (iterable): (entry_id, title, body) tuples.
+        """
+        if not self.available:
+            return
+        rows = [
+            (self._rowid(kind, entry_id), kind, entry_id, title or "", body or "")
+            for entry_id, title, body in rows
+        ]
+        with self._connection() as connection:
+            connection.executemany("DELETE FROM history_fts WHERE rowid = ?", [(row[0],) for row in rows])
+            connection.executemany(
+                "INSERT INTO history_fts (rowid, kind, entry_id, title, body) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def remove(self, kind: str, entry_ids: list) -> None:
+        """
+        Removes entries of one history from the index.
+        """
+        if not self.available:
+            return
+        with self._connection() as connection:
+            connection.executemany(
+                "DELETE FROM history_fts WHERE rowid = ?", [(self._rowid(kind, entry_id),) for entry_id in entry_ids]
+            )
+
+    def clear(self, kind: str = None) -> None:
+        """
+        Removes all entries of a history from the index (all histories if kind is None).
+        """
+        if not self.available:
+            return
+        with self._connection() as connection:
+            if kind is None:
+                connection.execute("DELETE FROM history_fts")
+            else:
+                connection.execute("DELETE FROM history_fts WHERE kind = ?", (kind,))
+
+    def optimize(self) -> None:
+        """
+        Merges the index segments (worth doing after a rebuild).
+        """
+        if not self.available:
+            return
+        with self._connection() as connection:
+            connection.execute("INSERT INTO history_fts (history_fts) VALUES ('optimize')")
+
+    def search(self, text: str, kinds: tuple = None, limit: int = 20) -> list:
+        """
+        Finds the entries best matching a search text.
+
+        Every match is ranked, however old, so no match is left out; SQLite keeps only the best
+        `limit` while sorting (about 150 ms for words found in 80,000 entries).
+
+        Args:
+            text (str): Search text; entries must contain every word.
+            kinds (tuple): History kinds to search (None for all).
+            limit (int): Maximum number of results.
+
+        Returns:
+            list: Results, best first, as dicts with 'kind', 'id', 'title', 'snippet' and
+                'score' (lower is better).
+        """
+        match = build_match_query(text)
+        if not self.available or not match:
+            return []
+
+        where = "history_fts MATCH ?"
+        params = [match]
+        if kinds:
+            where += f" AND kind IN ({', '.join('?' for _ in kinds)})"
+            params.extend(kinds)
+        start, end = HIGHLIGHT
+        try:
+            rows = self._connection().execute(
+                f"SELECT kind, entry_id, highlight(history_fts, 2, ?, ?), "
+                f"snippet(history_fts, 3, ?, ?, ' … ', 16), bm25(history_fts, 0, 0, 5.0, 1.0) AS score "
+                f"FROM history_fts WHERE {where} ORDER BY score LIMIT ?",
+                [start, end, start, end] + params + [limit]
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ History search failed: {e}")
+            return []
+        return [
+            {"kind": kind, "id": entry_id, "title": title, "snippet": snippet, "score": score}
+            for kind, entry_id, title, snippet, score in rows
+        ]
+
+    def count(self) -> int:
+        """
+        Returns the number of indexed entries.
+        """
+        if not self.available:
+            return 0
+        return self._connection().execute("SELECT COUNT(*) FROM history_fts").fetchone()[0]
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+def main() -> None:
+    """
+    Command line entry point: rebuilds the index, or runs a search against it.
+    """
+    from modules.history_manager import HistoryManager
+
+    parser = argparse.ArgumentParser(description="Full-text search over Codi's history.")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from the stored histories")
+    parser.add_argument(
+        "--backend", choices=("sqlite", "json"), default="sqlite",
+        help="history storage to index (JSON histories are imported into SQLite first with 'sqlite')"
+    )
+    parser.add_argument("query", nargs="*", help="search text")
+    args = parser.parse_args()
+
+    history_mgr = HistoryManager(backend=args.backend)
+    if args.rebuild:
+        start = time.perf_counter()
+        indexed = history_mgr.rebuild_search_index()
+        print(f"Indexed {sum(indexed.values())} entries {indexed} in {time.perf_counter() - start:.2f}s")
+    if args.query:
+        start = time.perf_counter()
+        results = history_mgr.search(" ".join(args.query))
+        print(f"{len(results)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for result in results:
+            print(f"[{result['kind']} #{result['id']}] {result['title']}\n    {result['snippet']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,622 @@
+"""
+Storage backends for upload, explanation and chat histories.
+
+`JsonHistoryStorage` keeps the original one-JSON-file-per-history layout. `SqliteHistoryStorage`
+stores each history in an indexed SQLite table in WAL mode, so appending an entry is a single
+insert, clearing is one transaction, and concurrent sessions never see a half-written file.
+Existing JSON histories are imported into SQLite once. Histories are read a page at a time
+through `query`, optionally with only the fields needed to list them.
+
+Every backend keeps a separate history per namespace (a user or session). JSON files are
+replaced atomically under a file lock, so concurrent sessions and processes never lose
+writes or read a half-written file (`python -m benchmarks.history_stress` runs a stress test
+with many concurrent writers).
+"""
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# History kinds and the fields stored in their own (indexable) columns; any other entry
+# fields are kept in a JSON `extra` column
+HISTORY_COLUMNS = {
+    "upload": ("filename", "content", "content_hash", "size"),
+    "explanation": ("filename", "explanation", "pdf_path", "audio_path"),
+    "chat": ("question", "answer", "cached"),
+}
+
+# SQLite type of columns that are not TEXT
+COLUMN_TYPES = {"size": "INTEGER"}
+
+# Table name of each history kind
+HISTORY_TABLES = {"upload": "uploads", "explanation": "explanations", "chat": "chats"}
+
+# Namespace of the history shared by sessions that do not name a user
+DEFAULT_NAMESPACE = "default"
+
+
+def normalize_namespace(name) -> str:
+    """
+    Turns a user or session name into a namespace that is safe in file names and queries.
+
+    Args:
+        name (str): User name, session id, etc.
+
+    Returns:
+        str: Up to 64 letters, digits, '-' and '_' (DEFAULT_NAMESPACE if nothing is left).
+    """
+    namespace = re.sub(r"[^A-Za-z0-9_-]", "_", str(name or "")).strip("_")[:64]
+    return namespace or DEFAULT_NAMESPACE
+
+
+class FileLock:
+    """
+    Exclusive lock on '<path>.lock', held across threads and processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = f"{path}.lock"
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+class HistoryStorage:
+    """
+    Interface of history storage backends. Entries are dicts; lists are newest first.
+    """
+
+    def append(self, kind: str, entry: dict) -> int:
+        """
+        Adds an entry as the newest of its history.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+            entry (dict): Entry fields.
+
+        Returns:
+            int: Id of the stored entry (also set as entry['id']).
+        """
+        raise NotImplementedError
+
+    def update(self, kind: str, entry_id: int, fields: dict) -> None:
+        """
+        Changes fields of a stored entry.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+            entry_id (int): Id returned by `append`.
+            fields (dict): Fields to set.
+        """
+        raise NotImplementedError
+
+    def load(self, kind: str) -> list:
+        """
+        Returns all entries of a history, newest first.
+        """
+        raise NotImplementedError
+
+    def query(
+        self,
+        kind: str,
+        offset: int = 0,
+        limit: int = None,
+        newest_first: bool = True,
+        fields: tuple = None,
+        filters: dict = None
+    ) -> list:
+        """
+        Returns a page of a history.
+
+        Args:
+            kind (str): 'upload', 'explanation' or 'chat'.
+            offset (int): Number of entries to skip.
+            limit (int): Maximum number of entries (None for all).
+            newest_first (bool): Order of the entries.
+            fields (tuple): Fields to load besides 'id' and 'created_at' (None for all).
+            filters (dict): Field values entries must equal.
+
+        Returns:
+            list: Matching entries.
+        """
+        raise NotImplementedError
+
+    def count(self, kind: str, filters: dict = None) -> int:
+        """
+        Returns the number of entries of a history (matching `filters`, if given).
+        """
+        raise NotImplementedError
+
+    def get(self, kind: str, entry_id: int):
+        """
+        Returns the entry with the given id, or None.
+        """
+        entries = self.query(kind, limit=1, filters={"id": entry_id})
+        return entries[0] if entries else None
+
+    def replace_all(self, kind: str, entries: list) -> None:
+        """
+        Replaces a whole history with the given entries (newest first).
+        """
+        raise NotImplementedError
+
+    def delete(self, kind: str, entry_ids: list) -> None:
+        """
+        Removes the entries with the given ids.
+        """
+        raise NotImplementedError
+
+    def clear(self, kind: str) -> None:
+        """
+        Removes all entries of a history.
+        """
+        raise NotImplementedError
+
+    def with_namespace(self, namespace: str) -> "HistoryStorage":
+        """
+        Returns a backend for another namespace, sharing this backend's resources.
+        """
+        raise NotImplementedError
+
+    def namespaces(self) -> list:
+        """
+        Returns the namespaces that have stored entries (always including the default one).
+        """
+        raise NotImplementedError
+
+    def get_marker(self, key: str):
+        """
+        Returns the value of a marker shared by all namespaces (e.g. a finished one-time
+        migration), or None if it was never set.
+        """
+        raise NotImplementedError
+
+    def set_marker(self, key: str, value: str) -> None:
+        """
+        Sets a marker shared by all namespaces.
+        """
+        raise NotImplementedError
+
+    def drop(self) -> None:
+        """
+        Removes every entry of this namespace, along with any files the backend keeps for it.
+        """
+        for kind in HISTORY_TABLES:
+            self.clear(kind)
+
+    def close(self) -> None:
+        """
+        Releases resources held by the backend.
+        """
+
+
+class JsonHistoryStorage(HistoryStorage):
+    """
+    Stores each history as a JSON list in its own file (the original format).
+    Every write rewrites the file, so this backend suits small histories only.
+    The default namespace uses the given paths; other namespaces keep the same file names
+    in `<directory of the files>/users/<namespace>/`, created on their first write.
+    """
+
+    def __init__(self, paths: dict, namespace: str = DEFAULT_NAMESPACE):
+        """
+        Initializes the backend.
+
+        Args:
+            paths (dict): History kind to JSON file path of the default namespace.
+            namespace (str): Namespace whose files are used.
+        """
+        self.base_paths = paths
+        self.namespace = normalize_namespace(namespace)
+        if self.namespace == DEFAULT_NAMESPACE:
+            self.paths = dict(paths)
+        else:
+            self.paths = {
+                kind: os.path.join(self._users_dir(path), self.namespace, os.path.basename(path))
+                for kind, path in paths.items()
+            }
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _users_dir(path: str) -> str:
+        return os.path.join(os.path.dirname(path), "users")
+
+    def _read(self, kind: str) -> list:
+        path = self.paths[kind]
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except json.JSONDecodeError:
+                return []
+            # Entries saved before ids existed are numbered from the oldest
+            for position, entry in enumerate(reversed(entries), start=1):
+                entry.setdefault("id", position)
+            return entries
+        return []
+
+    def _write(self, kind: str, entries: list) -> None:
+        """
+        Replaces a history file atomically: readers see either the old or the new list.
+        """
+        path = self.paths[kind]
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+    def _locked(self, kind: str):
+        """
+        Guards a read-modify-write of a history file against other threads and processes.
+        """
+        os.makedirs(os.path.dirname(self.paths[kind]), exist_ok=True)
+        return FileLock(self.paths[kind])
+
+    def append(self, kind: str, entry: dict) -> int:
+        with self._lock, self._locked(kind):
+            entries = self._read(kind)
+            entry["id"] = max((e["id"] for e in entries), default=0) + 1
+            entry.setdefault("created_at", time.time())
+            entries.insert(0, entry)
+            self._write(kind, entries)
+            return entry["id"]
+
+    def update(self, kind: str, entry_id: int, fields: dict) -> None:
+        with self._lock, self._locked(kind):
+            entries = self._read(kind)
+            for entry in entries:
+                if entry["id"] == entry_id:
+                    entry.update(fields)
+                    break
+            self._write(kind, entries)
+
+    def load(self, kind: str) -> list:
+        # Files are only ever replaced whole, so reading needs no lock
+        return self._read(kind)
+
+    def query(self, kind, offset=0, limit=None, newest_first=True, fields=None, filters=None) -> list:
+        entries = self.load(kind)
+        if filters:
+            entries = [e for e in entries if all(e.get(key) == value for key, value in filters.items())]
+        if not newest_first:
+            entries.reverse()
+        entries = entries[offset:offset + limit if limit is not None else None]
+        if fields is not None:
+            keep = set(fields) | {"id", "created_at"}
+            entries = [{key: value for key, value in e.items() if key in keep} for e in entries]
+        return entries
+
+    def count(self, kind: str, filters: dict = None) -> int:
+        return len(self.query(kind, filters=filters, fields=()))
+
+    def replace_all(self, kind: str, entries: list) -> None:
+        with self._lock, self._locked(kind):
+            self._write(kind, entries)
+
+    def delete(self, kind: str, entry_ids: list) -> None:
+        removed = set(entry_ids)
+        with self._lock, self._locked(kind):
+            self._write(kind, [entry for entry in self._read(kind) if entry["id"] not in removed])
+
+    def clear(self, kind: str) -> None:
+        with self._lock, self._locked(kind):
+            self._write(kind, [])
+
+    def with_namespace(self, namespace: str) -> "JsonHistoryStorage":
+        return JsonHistoryStorage(self.base_paths, namespace)
+
+    def _markers_path(self) -> str:
+        return os.path.join(os.path.dirname(next(iter(self.base_paths.values()))), "history_markers.json")
+
+    def _read_markers(self) -> dict:
+        try:
+            with open(self._markers_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get_marker(self, key: str):
+        return self._read_markers().get(key)
+
+    def set_marker(self, key: str, value: str) -> None:
+        path = self._markers_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock, FileLock(path):
+            markers = self._read_markers()
+            markers[key] = value
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(markers, f, indent=2)
+            os.replace(temp_path, path)
+
+    def drop(self) -> None:
+        if self.namespace == DEFAULT_NAMESPACE:
+            super().drop()
+        else:
+            shutil.rmtree(os.path.dirname(next(iter(self.paths.values()))), ignore_errors=True)
+
+    def namespaces(self) -> list:
+        users_dir = self._users_dir(next(iter(self.base_paths.values())))
+        names = {DEFAULT_NAMESPACE}
+        if os.path.isdir(users_dir):
+            names.update(entry.name for entry in os.scandir(users_dir) if entry.is_dir())
+        return sorted(names)
+
+
+class SqliteHistoryStorage(HistoryStorage):
+    """
+    Stores histories in SQLite tables (WAL mode), one connection per thread. Entries of all
+    namespaces share the tables and are told apart by a `namespace` column.
+    """
+
+    def __init__(self, db_path: str = "./modules/data/history.db", namespace: str = DEFAULT_NAMESPACE):
+        """
+        Opens (or creates) the database and its tables.
+
+        Args:
+            db_path (str): SQLite database file.
+            namespace (str): Namespace whose entries are read and written.
+        """
+        self.db_path = db_path
+        self.namespace = normalize_namespace(namespace)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=30000")
+            self._local.connection = connection
+        return connection
+
+    def _create_schema(self) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            for kind, table in HISTORY_TABLES.items():
+                columns = ", ".join(f"{column} {COLUMN_TYPES.get(column, 'TEXT')}" for column in HISTORY_COLUMNS[kind])
+                connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    f"id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, {columns}, extra TEXT, "
+                    f"namespace TEXT NOT NULL DEFAULT '{DEFAULT_NAMESPACE}')"
+                )
+                # Add columns introduced after the table was created (existing rows join the
+                # default namespace)
+                existing = {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+                for column in HISTORY_COLUMNS[kind]:
+                    if column not in existing:
+                        connection.execute(
+                            f"ALTER TABLE {table} ADD COLUMN {column} {COLUMN_TYPES.get(column, 'TEXT')}"
+                        )
+                if "namespace" not in existing:
+                    connection.execute(
+                        f"ALTER TABLE {table} ADD COLUMN namespace TEXT NOT NULL DEFAULT '{DEFAULT_NAMESPACE}'"
+                    )
+                connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_created_at ON {table} (created_at)")
+                connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_namespace ON {table} (namespace, id)")
+            # Superseded by the namespace-aware index below
+            connection.execute("DROP INDEX IF EXISTS uploads_filename")
+            connection.execute("CREATE INDEX IF NOT EXISTS uploads_namespace_filename ON uploads (namespace, filename)")
+            connection.execute("CREATE INDEX IF NOT EXISTS uploads_content_hash ON uploads (content_hash)")
+            connection.execute("CREATE INDEX IF NOT EXISTS explanations_filename ON explanations (filename)")
+
+    def _writing(self):
+        """
+        Queues writers of all threads and processes on a file lock. Waiters wake as soon as
+        the lock is free, instead of polling with SQLite's growing busy-timeout sleeps, so
+        throughput holds up as concurrent sessions are added.
+        """
+        return FileLock(self.db_path)
+
+    def with_namespace(self, namespace: str) -> "SqliteHistoryStorage":
+        view = object.__new__(SqliteHistoryStorage)
+        view.__dict__.update(self.__dict__)  # Shares the per-thread connections
+        view.namespace = normalize_namespace(namespace)
+        return view
+
+    def namespaces(self) -> list:
+        names = {DEFAULT_NAMESPACE}
+        connection = self._connection()
+        for table in HISTORY_TABLES.values():
+            names.update(row[0] for row in connection.execute(f"SELECT DISTINCT namespace FROM {table}"))
+        return sorted(names)
+
+    def _row_values(self, kind: str, entry: dict) -> tuple:
+        """
+        Splits an entry into column values and the JSON of its remaining fields.
+        """
+        columns = HISTORY_COLUMNS[kind]
+        extra = {key: value for key, value in entry.items() if key not in columns and key not in ("id", "created_at")}
+        values = tuple(
+            json.dumps(entry[column]) if column == "cached" and column in entry else entry.get(column)
+            for column in columns
+        )
+        return values + (json.dumps(extra, ensure_ascii=False) if extra else None,)
+
+    def _row_to_entry(self, kind: str, row: sqlite3.Row) -> dict:
+        entry = {"id": row["id"], "created_at": row["created_at"]}
+        names = row.keys()
+        for column in HISTORY_COLUMNS[kind]:
+            value = row[column] if column in names else None
+            if value is not None:
+                entry[column] = json.loads(value) if column == "cached" else value
+        if "extra" in names and row["extra"]:
+            entry.update(json.loads(row["extra"]))
+        return entry
+
+    def _where(self, kind: str, filters: dict) -> tuple:
+        """
+        Builds the WHERE clause and parameters selecting this namespace and equality filters on columns.
+        """
+        filters = filters or {}
+        allowed = set(HISTORY_COLUMNS[kind]) | {"id", "created_at"}
+        for key in filters:
+            if key not in allowed:
+                raise ValueError(f"Cannot filter {kind} history by '{key}'")
+        clause = " AND ".join(["namespace = ?"] + [f"{key} IS ?" for key in filters])
+        return f" WHERE {clause}", (self.namespace,) + tuple(filters.values())
+
+    def _insert(self, connection: sqlite3.Connection, kind: str, entry: dict) -> int:
+        columns = HISTORY_COLUMNS[kind]
+        placeholders = ", ".join("?" for _ in range(len(columns) + 3))
+        cursor = connection.execute(
+            f"INSERT INTO {HISTORY_TABLES[kind]} (created_at, {', '.join(columns)}, extra, namespace) "
+            f"VALUES ({placeholders})",
+            (entry.get("created_at") or time.time(),) + self._row_values(kind, entry) + (self.namespace,)
+        )
+        return cursor.lastrowid
+
+    def append(self, kind: str, entry: dict) -> int:
+        connection = self._connection()
+        entry.setdefault("created_at", time.time())
+        with self._writing(), connection:
+            entry["id"] = self._insert(connection, kind, entry)
+        return entry["id"]
+
+    def update(self, kind: str, entry_id: int, fields: dict) -> None:
+        connection = self._connection()
+        table = HISTORY_TABLES[kind]
+        with self._writing(), connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                f"SELECT * FROM {table} WHERE id = ? AND namespace = ?", (entry_id, self.namespace)
+            ).fetchone()
+            if row is None:
+                return
+            entry = {**self._row_to_entry(kind, row), **fields}
+            columns = HISTORY_COLUMNS[kind]
+            assignments = ", ".join(f"{column} = ?" for column in columns)
+            connection.execute(
+                f"UPDATE {table} SET {assignments}, extra = ? WHERE id = ?",
+                self._row_values(kind, entry) + (entry_id,)
+            )
+
+    def load(self, kind: str) -> list:
+        return self.query(kind)
+
+    def query(self, kind, offset=0, limit=None, newest_first=True, fields=None, filters=None) -> list:
+        if fields is None:
+            selected = "*"
+        else:
+            # Only real columns can be selected; other fields live in `extra`
+            columns = [column for column in HISTORY_COLUMNS[kind] if column in fields]
+            needs_extra = any(field not in HISTORY_COLUMNS[kind] for field in fields)
+            selected = ", ".join(["id", "created_at"] + columns + (["extra"] if needs_extra else []))
+        where, params = self._where(kind, filters)
+        rows = self._connection().execute(
+            f"SELECT {selected} FROM {HISTORY_TABLES[kind]}{where} "
+            f"ORDER BY id {'DESC' if newest_first else 'ASC'} LIMIT ? OFFSET ?",
+            params + (-1 if limit is None else limit, offset)
+        ).fetchall()
+        return [self._row_to_entry(kind, row) for row in rows]
+
+    def count(self, kind: str, filters: dict = None) -> int:
+        where, params = self._where(kind, filters)
+        return self._connection().execute(f"SELECT COUNT(*) FROM {HISTORY_TABLES[kind]}{where}", params).fetchone()[0]
+
+    def replace_all(self, kind: str, entries: list) -> None:
+        connection = self._connection()
+        with self._writing(), connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(f"DELETE FROM {HISTORY_TABLES[kind]} WHERE namespace = ?", (self.namespace,))
+            # Oldest first, so ids keep the newest-first order of the list
+            for entry in reversed(entries):
+                entry["id"] = self._insert(connection, kind, entry)
+
+    def delete(self, kind: str, entry_ids: list) -> None:
+        entry_ids = list(entry_ids)
+        connection = self._connection()
+        with self._writing(), connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # Stay below SQLite's limit on bound parameters
+            for start in range(0, len(entry_ids), 500):
+                batch = entry_ids[start:start + 500]
+                connection.execute(
+                    f"DELETE FROM {HISTORY_TABLES[kind]} WHERE namespace = ? AND id IN ({', '.join('?' for _ in batch)})",
+                    [self.namespace] + batch
+                )
+
+    def clear(self, kind: str) -> None:
+        connection = self._connection()
+        with self._writing(), connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(f"DELETE FROM {HISTORY_TABLES[kind]} WHERE namespace = ?", (self.namespace,))
+
+    def migrate_json(self, paths: dict) -> dict:
+        """
+        Imports JSON histories into the database, once. Later calls do nothing, so the JSON
+        files can stay in place as a backup.
+
+        Args:
+            paths (dict): History kind to JSON file path.
+
+        Returns:
+            dict: Number of imported entries per kind (empty if already migrated).
+        """
+        connection = self._connection()
+        imported = {}
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if connection.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return imported
+            legacy = JsonHistoryStorage(paths)
+            for kind in paths:
+                entries = legacy.load(kind)
+                for entry in reversed(entries):
+                    entry.pop("id", None)
+                    self._insert(connection, kind, entry)
+                imported[kind] = len(entries)
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (json.dumps(imported),)
+            )
+        return imported
+
+    def get_marker(self, key: str):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_marker(self, key: str, value: str) -> None:
+        connection = self._connection()
+        with self._writing(), connection:
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,181 @@
+"""
+Pooled HTTP transport for the Hugging Face inference API.
+
+Keeps connections alive across requests through a shared `requests.Session`,
+uses separate connect/read timeouts, and retries transient failures with jittered
+backoff, waiting out "model is loading" replies for the time the endpoint reports.
+Read timeouts are not retried: the model may still be generating, and posting again would
+start a second generation on top of it.
+"""
+
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting, model loading and gateway hiccups
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """
+    Computes an exponential backoff delay with full jitter.
+
+    Args:
+        attempt (int): Zero-based retry attempt.
+        base (float): Delay of the first attempt in seconds.
+        cap (float): Upper bound for the delay in seconds.
+
+    Returns:
+        float: Number of seconds to wait.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_delay(
+    attempt: int,
+    status: int = None,
+    body=None,
+    retry_after: str = None,
+    base: float = 1.0,
+    cap: float = 30.0,
+    max_loading_wait: float = 120.0
+) -> float:
+    """
+    Chooses how long to wait before retrying a failed request.
+
+    A 503 carrying `estimated_time` (the model is still loading) waits that long plus a
+    little jitter, a `Retry-After` header is honoured as-is, and everything else falls back
+    to jittered exponential backoff.
+
+    Args:
+        attempt (int): Zero-based retry attempt.
+        status (int, optional): HTTP status of the failed response, if any.
+        body (dict, optional): Decoded JSON body of the failed response, if any.
+        retry_after (str, optional): Value of the `Retry-After` header, if any.
+        base (float): Delay of the first backoff attempt in seconds.
+        cap (float): Upper bound for backoff delays in seconds.
+        max_loading_wait (float): Upper bound for model-loading waits in seconds.
+
+    Returns:
+        float: Number of seconds to wait.
+    """
+    if status == 503 and isinstance(body, dict) and "estimated_time" in body:
+        try:
+            estimated = float(body["estimated_time"])
+        except (TypeError, ValueError):
+            estimated = None
+        if estimated is not None:
+            return min(max_loading_wait, estimated) + random.uniform(0, base)
+
+    if retry_after:
+        try:
+            return min(max_loading_wait, float(retry_after))
+        except ValueError:
+            pass
+
+    return backoff_delay(attempt, base, cap)
+
+
+class HttpTransport:
+    """
+    Shared HTTP transport with connection pooling, keep-alive and retries.
+    """
+
+    def __init__(
+        self,
+        headers: dict = None,
+        pool_size: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 40.0,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 30.0,
+        max_loading_wait: float = 120.0
+    ):
+        """
+        Initializes the transport and its connection pool.
+
+        Args:
+            headers (dict, optional): Headers sent with every request.
+            pool_size (int): Maximum number of pooled connections per host.
+            connect_timeout (float): Seconds to wait for a connection to be established.
+            read_timeout (float): Seconds to wait between bytes of the response.
+            max_retries (int): Number of retries after the first attempt.
+            backoff_base (float): Delay of the first backoff attempt in seconds.
+            backoff_cap (float): Upper bound for backoff delays in seconds.
+            max_loading_wait (float): Upper bound for a single model-loading wait in seconds.
+        """
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_loading_wait = max_loading_wait
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post(self, url: str, payload: dict, stream: bool = False) -> requests.Response:
+        """
+        Posts a JSON payload, retrying connection errors (including connect timeouts) and
+        retryable status codes. A read timeout is raised right away.
+
+        Args:
+            url (str): Endpoint URL.
+            payload (dict): JSON request body.
+            stream (bool): Whether to stream the response body.
+
+        Returns:
+            requests.Response: The final response (callers should still check its status).
+
+        Raises:
+            requests.ReadTimeout: If the response stalls for longer than `read_timeout`.
+            requests.ConnectionError: If the last attempt fails to connect.
+        """
+        for attempt in range(self.max_retries + 1):
+            is_last = attempt == self.max_retries
+            try:
+                response = self.session.post(
+                    url,
+                    json=payload,
+                    timeout=(self.connect_timeout, self.read_timeout),
+                    stream=stream
+                )
+            except requests.ConnectionError:  # Also covers ConnectTimeout, but not ReadTimeout
+                if is_last:
+                    raise
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                continue
+
+            if response.status_code not in RETRY_STATUS_CODES or is_last:
+                return response
+
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            delay = retry_delay(
+                attempt,
+                status=response.status_code,
+                body=body,
+                retry_after=response.headers.get("Retry-After"),
+                base=self.backoff_base,
+                cap=self.backoff_cap,
+                max_loading_wait=self.max_loading_wait
+            )
+            response.close()  # Return the connection to the pool before waiting
+            time.sleep(delay)
+
+        return response
+
+    def close(self) -> None:
+        """
+        Closes all pooled connections.
+        """
+        self.session.close()
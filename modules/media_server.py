@@ -0,0 +1,204 @@
+"""
+Small local HTTP endpoint for audio files.
+
+Lets the audio player reference files by URL instead of inlining them as base64 on every
+render. Only files explicitly published through `url_for` are served, and HTTP Range
+requests are supported so the browser can seek and stream without loading a whole file.
+The app only starts it when browsers can reach it (CODI_MEDIA_URL or CODI_MEDIA_SERVER=1);
+otherwise audio is inlined.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from modules.audio_encoder import mime_type_for
+
+# Size of the blocks file bodies are sent in
+CHUNK_SIZE = 64 * 1024
+
+# Number of published files remembered (oldest are unpublished first)
+MAX_PUBLISHED_FILES = 4096
+
+
+def parse_range(header: str, size: int):
+    """
+    Parses a single-range `Range` header.
+
+    Args:
+        header (str): Header value, e.g. 'bytes=0-1023', 'bytes=500-' or 'bytes=-500'.
+        size (int): Size of the file in bytes.
+
+    Returns:
+        tuple | None: Inclusive (start, end) byte positions, None for an unsupported
+            header (the whole file is sent), or () if the range cannot be satisfied.
+    """
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if start == "":
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0 or size == 0:
+            return ()
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return ()
+    return start, end
+
+
+class _MediaRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves published files with Range support.
+    """
+
+    server_version = "CodiMedia/1.0"
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool) -> None:
+        path = self.server.media.resolve(self.path.split("?", 1)[0].lstrip("/"))
+        if path is None or not os.path.isfile(path):
+            self.send_error(404, "File not found")
+            return
+
+        size = os.path.getsize(path)
+        byte_range = parse_range(self.headers.get("Range"), size)
+        if byte_range == ():
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = byte_range if byte_range else (0, size - 1)
+        length = end - start + 1 if size else 0
+        self.send_response(206 if byte_range else 200)
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Type", mime_type_for(path))
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        # Published files are content-addressed, so they never change under their URL
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        if not send_body:
+            return
+
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                block = f.read(min(CHUNK_SIZE, remaining))
+                if not block:
+                    break
+                try:
+                    self.wfile.write(block)
+                except (BrokenPipeError, ConnectionResetError):
+                    return  # Player stopped reading (seek or page change)
+                remaining -= len(block)
+
+    def log_message(self, format, *args):
+        pass  # Keep the Streamlit console quiet
+
+
+class MediaServer:
+    """
+    Local media endpoint serving published audio files by URL.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, public_url: str = None):
+        """
+        Initializes the server; call `start` to begin serving.
+
+        Args:
+            host (str): Interface to bind (local only by default).
+            port (int): Port to bind (0 picks a free port).
+            public_url (str): Base URL the browser uses to reach the server, e.g. behind a
+                reverse proxy (defaults to http://localhost:<port>).
+        """
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self._server = None
+        self._published = OrderedDict()  # token -> absolute file path
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the server is accepting requests.
+        """
+        return self._server is not None
+
+    def start(self) -> bool:
+        """
+        Starts serving on a background thread.
+
+        Returns:
+            bool: False if the port could not be bound (callers fall back to inline audio).
+        """
+        if self._server is not None:
+            return True
+        try:
+            server = ThreadingHTTPServer((self.host, self.port), _MediaRequestHandler)
+        except OSError as e:
+            print(f"⚠️ Media server could not start: {e}")
+            return False
+
+        server.daemon_threads = True
+        server.media = self
+        self.port = server.server_address[1]
+        if not self.public_url:
+            self.public_url = f"http://localhost:{self.port}"
+        self._server = server
+        threading.Thread(target=server.serve_forever, name="codi-media", daemon=True).start()
+        return True
+
+    def url_for(self, path: str) -> str:
+        """
+        Publishes a file and returns the URL it is served under.
+
+        Args:
+            path (str): Path to a local file.
+
+        Returns:
+            str: URL of the file.
+        """
+        abs_path = os.path.abspath(path)
+        token = hashlib.sha256(abs_path.encode("utf-8")).hexdigest()[:32] + os.path.splitext(abs_path)[1]
+        with self._lock:
+            self._published[token] = abs_path
+            self._published.move_to_end(token)
+            while len(self._published) > MAX_PUBLISHED_FILES:
+                self._published.popitem(last=False)
+        return f"{self.public_url.rstrip('/')}/{token}"
+
+    def resolve(self, token: str):
+        """
+        Returns the file path published under a URL token, or None.
+        """
+        with self._lock:
+            return self._published.get(token)
+
+    def stop(self) -> None:
+        """
+        Stops the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,216 @@
+"""
+Fast, cached PDF rendering of explanations and chats.
+
+The Unicode font is loaded once per process into a template document, and each render
+starts from a copy of that template which shares the font's (read-only) glyph width
+table. Lines are wrapped with the width table directly instead of measuring every
+character through `multi_cell`. Finished PDFs are cached by a hash of their content,
+in memory and on disk, so identical text is never laid out twice.
+
+The font is parsed once, but not subset once: PyFPDF 1.7 re-reads the TTF file and builds
+the subset of used glyphs in every `output()`, about half of an uncached render. Only the
+content cache avoids that; the subset depends on the characters of each document, so it
+is not cached separately.
+
+Run `python -m benchmarks.pdf_render` for a throughput benchmark.
+"""
+
+import copy
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from fpdf import FPDF
+
+# Unicode font used for generated PDFs
+FONT_PATH = "./modules/data/fonts/DejaVuSans.ttf"
+
+# Directory of cached PDF files
+DEFAULT_PDF_DIR = "./modules/data"
+
+# Characters outside the Basic Multilingual Plane (emoji and the like), which PyFPDF's
+# Unicode font support cannot lay out, and what they are replaced with
+ASTRAL_CHARACTERS = re.compile("[\U00010000-\U0010FFFF]")
+ASTRAL_REPLACEMENT = "\ufffd"
+
+
+class PdfRenderer:
+    """
+    Renders text to PDF from a shared template, caching results by content hash.
+    """
+
+    def __init__(
+        self,
+        font_path: str = FONT_PATH,
+        pdf_dir: str = DEFAULT_PDF_DIR,
+        font_size: int = 12,
+        line_height: float = 10,
+        max_memory_entries: int = 64
+    ):
+        """
+        Loads the font and prepares the template document.
+
+        Args:
+            font_path (str): TrueType font with the glyphs of the rendered text.
+            pdf_dir (str): Directory for PDF files written by `render_to_file`.
+            font_size (int): Font size in points.
+            line_height (float): Height of a text line in millimeters.
+            max_memory_entries (int): Number of rendered PDFs kept in memory.
+        """
+        self.font_path = font_path
+        self.pdf_dir = pdf_dir
+        self.font_size = font_size
+        self.line_height = line_height
+        self.max_memory_entries = max_memory_entries
+        os.makedirs(self.pdf_dir, exist_ok=True)
+
+        template = FPDF()
+        template.set_auto_page_break(auto=True, margin=15)
+        # Add a Unicode font
+        template.add_font("DejaVu", "", font_path, uni=True)
+        template.set_font("DejaVu", size=font_size)
+        self._template = template
+
+        font = template.fonts["dejavu"]
+        self._char_widths = font["cw"]
+        self._missing_width = font["desc"].get("MissingWidth", 500)
+
+        self._cache = OrderedDict()  # content hash -> PDF bytes
+        self._lock = threading.Lock()
+
+    def content_key(self, text: str) -> str:
+        """
+        Builds the cache key of a document from its text and layout settings.
+
+        Args:
+            text (str): Document text.
+
+        Returns:
+            str: Hex digest identifying the rendered PDF.
+        """
+        raw = f"{self.font_path}\x00{self.font_size}\x00{self.line_height}\x00{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _new_document(self) -> FPDF:
+        """
+        Copies the template; the glyph width table is shared instead of duplicated.
+        """
+        pdf = copy.deepcopy(self._template, {id(self._char_widths): self._char_widths})
+        pdf.add_page()
+        return pdf
+
+    def text_width(self, text: str) -> float:
+        """
+        Measures text in width-table units (1/1000 of the font size).
+        """
+        widths, limit, missing = self._char_widths, len(self._char_widths), self._missing_width
+        return sum(widths[code] if code < limit else missing for code in map(ord, text))
+
+    def wrap_line(self, line: str, max_width: float) -> list:
+        """
+        Breaks one line of text into lines that fit the page width, at spaces where possible.
+
+        Args:
+            line (str): Text without line breaks.
+            max_width (float): Available width in width-table units.
+
+        Returns:
+            list: Wrapped lines (one empty string for an empty line).
+        """
+        if self.text_width(line) <= max_width:
+            return [line]
+
+        widths, limit, missing = self._char_widths, len(self._char_widths), self._missing_width
+        lines = []
+        start, last_space, width = 0, -1, 0
+        i = 0
+        while i < len(line):
+            code = ord(line[i])
+            if line[i] == " ":
+                last_space = i
+            width += widths[code] if code < limit else missing
+            if width > max_width:
+                if last_space > start:
+                    # Break at the last space, which is dropped
+                    lines.append(line[start:last_space])
+                    start = i = last_space + 1
+                else:
+                    # A single word wider than the page is cut mid-word
+                    end = max(i, start + 1)
+                    lines.append(line[start:end])
+                    start = i = end
+                last_space, width = -1, 0
+                continue
+            i += 1
+        lines.append(line[start:])
+        return lines
+
+    def _build(self, text: str) -> FPDF:
+        """
+        Lays out text on a fresh document.
+        """
+        text = ASTRAL_CHARACTERS.sub(ASTRAL_REPLACEMENT, text)
+        pdf = self._new_document()
+        available = pdf.w - pdf.l_margin - pdf.r_margin - 2 * pdf.c_margin
+        max_width = available * 1000.0 / pdf.font_size
+
+        for line in text.replace("\r", "").split("\n"):
+            for wrapped in self.wrap_line(line, max_width):
+                pdf.cell(0, self.line_height, txt=wrapped, ln=1)
+        return pdf
+
+    def _layout(self, text: str) -> bytes:
+        """
+        Lays out text on a fresh document and returns the PDF bytes.
+        """
+        data = self._build(text).output(dest="S")
+        # PyFPDF returns a latin-1 string, fpdf2 returns bytes
+        return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+    def render(self, text: str) -> bytes:
+        """
+        Renders text to PDF bytes, reusing a cached result for identical text.
+
+        Args:
+            text (str): Document text.
+
+        Returns:
+            bytes: PDF document.
+        """
+        key = self.content_key(text)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                return data
+
+        data = self._layout(text)
+        with self._lock:
+            self._cache[key] = data
+            while len(self._cache) > self.max_memory_entries:
+                self._cache.popitem(last=False)
+        return data
+
+    def render_to_file(self, text: str, prefix: str = "expl") -> str:
+        """
+        Writes the PDF of a text to `pdf_dir`, named by its content hash. An existing file
+        for the same content is returned without rendering.
+
+        Args:
+            text (str): Document text.
+            prefix (str): File name prefix (e.g. 'expl' or 'chat').
+
+        Returns:
+            str: Path to the PDF file.
+        """
+        pdf_path = os.path.join(self.pdf_dir, f"{prefix}_{self.content_key(text)[:32]}.pdf")
+        if os.path.exists(pdf_path):
+            return pdf_path
+
+        temp_path = f"{pdf_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.render(text))
+        os.replace(temp_path, pdf_path)
+        return pdf_path
@@ -0,0 +1,181 @@
+"""
+Shrinks code before it is embedded in a prompt.
+
+Strips comments, shortens or drops docstrings, collapses blank lines and truncates long
+string literals depending on the selected level, then keeps the result under a token
+budget. Indentation is never touched, so the model still sees (and can correct) the
+original structure.
+"""
+
+import ast
+import io
+import re
+import tokenize
+
+from modules.code_chunker import estimate_tokens
+
+# Available compaction levels, from no changes to the smallest prompt
+COMPACTION_LEVELS = ("none", "light", "standard", "aggressive")
+
+
+def _docstring_nodes(tree: ast.AST) -> list:
+    """
+    Returns the docstring expression nodes of a module and all its classes and functions.
+    """
+    nodes = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if (
+                body
+                and isinstance(body[0], ast.Expr)
+                and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str)
+            ):
+                nodes.append(body[0])
+    return nodes
+
+
+def _strip_comments(code: str) -> str:
+    """
+    Removes comments, leaving the code on each line intact. Returns the code unchanged if it
+    cannot be tokenized (e.g. broken indentation the model is asked to fix).
+    """
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO(code).readline))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return code
+
+    lines = code.splitlines(keepends=True)
+    for token in reversed(tokens):
+        if token.type == tokenize.COMMENT:
+            row, col = token.start
+            line = lines[row - 1]
+            newline = "\n" if line.endswith("\n") else ""
+            lines[row - 1] = line[:col].rstrip() + newline
+    return "".join(lines)
+
+
+class PromptCompactor:
+    """
+    Compacts source code for prompts at a selectable level and within a token budget.
+    """
+
+    def __init__(self, level: str = "light", token_budget: int = 3000, max_literal_length: int = 120):
+        """
+        Initializes the compactor.
+
+        Args:
+            level (str): One of 'none', 'light', 'standard' or 'aggressive'.
+            token_budget (int): Maximum estimated tokens of compacted code (None disables it).
+            max_literal_length (int): Longer string literals are truncated at 'standard' and above.
+        """
+        self.level = level
+        self.token_budget = token_budget
+        self.max_literal_length = max_literal_length
+
+    def compact(self, code: str) -> tuple:
+        """
+        Compacts code according to the configured level and token budget.
+
+        Levels:
+            - none: code is only cut down to the token budget.
+            - light: comments, trailing whitespace and repeated blank lines are removed.
+            - standard: additionally docstrings are cut to their first line and long
+              string literals are truncated.
+            - aggressive: additionally docstrings and all blank lines are removed.
+
+        Args:
+            code (str): Python source code.
+
+        Returns:
+            tuple: (compacted_code, report) where report holds the level, original and
+                compacted token estimates, tokens saved and whether code was truncated.
+        """
+        level = self.level if self.level in COMPACTION_LEVELS else "light"
+        original_tokens = estimate_tokens(code)
+        compacted = code
+
+        if level in ("standard", "aggressive"):
+            compacted = self._shrink_literals(compacted, drop_docstrings=level == "aggressive")
+        if level != "none":
+            compacted = _strip_comments(compacted)
+            compacted = "\n".join(line.rstrip() for line in compacted.splitlines())
+            blank_runs = r"\n\s*\n" if level == "aggressive" else r"\n\s*\n(\s*\n)+"
+            compacted = re.sub(blank_runs, "\n" if level == "aggressive" else "\n\n", compacted).strip("\n")
+
+        compacted, truncated = self._fit_budget(compacted)
+        compacted_tokens = estimate_tokens(compacted)
+        return compacted, {
+            "level": level,
+            "original_tokens": original_tokens,
+            "compacted_tokens": compacted_tokens,
+            "saved_tokens": original_tokens - compacted_tokens,
+            "truncated": truncated,
+        }
+
+    def _shrink_literals(self, code: str, drop_docstrings: bool = False) -> str:
+        """
+        Shortens docstrings and single-line string literals using their AST positions.
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return code
+
+        lines = code.splitlines(keepends=True)
+        docstrings = _docstring_nodes(tree)
+        docstring_ids = {id(node.value) for node in docstrings}
+        edits = []  # (start_row, start_col, end_row, end_col, replacement)
+
+        for node in docstrings:
+            first_line = node.value.value.strip().splitlines()[0] if node.value.value.strip() else ""
+            # `...` keeps a body that only had a docstring syntactically valid
+            replacement = "..." if drop_docstrings else repr(first_line)
+            edits.append((node.lineno, node.col_offset, node.end_lineno, node.end_col_offset, replacement))
+
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Constant)
+                and isinstance(node.value, (str, bytes))
+                and id(node) not in docstring_ids
+                and node.lineno == node.end_lineno
+                and len(node.value) > self.max_literal_length
+            ):
+                replacement = repr(node.value[:self.max_literal_length]) + " + ..."
+                edits.append((node.lineno, node.col_offset, node.end_lineno, node.end_col_offset, replacement))
+
+        # Apply from the end so earlier positions stay valid; skip overlapping edits
+        # (e.g. literals inside f-strings)
+        last_start = None
+        for start_row, start_col, end_row, end_col, replacement in sorted(edits, reverse=True):
+            if last_start is not None and (end_row, end_col) > last_start:
+                continue
+            # AST column offsets are in UTF-8 bytes
+            start_line = lines[start_row - 1].encode("utf-8")
+            end_line = lines[end_row - 1].encode("utf-8")
+            prefix = start_line[:start_col].decode("utf-8")
+            suffix = end_line[end_col:].decode("utf-8")
+            lines[start_row - 1:end_row] = [prefix + replacement + suffix]
+            last_start = (start_row, start_col)
+
+        return "".join(lines)
+
+    def _fit_budget(self, code: str) -> tuple:
+        """
+        Cuts code at a line boundary so it fits the token budget.
+        """
+        if self.token_budget is None or estimate_tokens(code) <= self.token_budget:
+            return code, False
+
+        lines = code.splitlines(keepends=True)
+        kept, used = [], 0
+        for line in lines:
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                break
+            kept.append(line)
+            used += cost
+
+        marker = f"\n# ... {len(lines) - len(kept)} more lines truncated to fit the prompt budget\n"
+        return "".join(kept).rstrip("\n") + marker, True
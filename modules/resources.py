@@ -0,0 +1,271 @@
+"""
+Process-wide registry of the app's long-lived resources.
+
+Streamlit re-runs `app.py` on every interaction, so anything built at module level is built
+again each time. The registry creates each resource once per server process, on first use or
+during warm-up, and shares it with every session. It records how long each resource took to
+build and runs a health check per resource for the sidebar.
+
+`app.py` keeps a single registry in `st.cache_resource`; `create_app_resources` registers the
+resources the app uses.
+"""
+
+import os
+import threading
+import time
+
+from modules.answer_cache import AnswerCache
+from modules.artifact_pipeline import ArtifactPipeline
+from modules.explainer import CodeExplainer
+from modules.history_manager import HistoryManager
+from modules.media_server import MediaServer
+from modules.retention import RetentionSweeper
+from modules.settings_manager import SettingsManager
+
+# Resource states
+PENDING = "pending"
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+
+class _Resource:
+    """
+    A registered resource: its factory, health check, instance and timings.
+    """
+
+    def __init__(self, name: str, factory, health_check=None, description: str = "", warm_up=None):
+        self.name = name
+        self.factory = factory
+        self.health_check = health_check
+        self.warm_up = warm_up
+        self.description = description
+        self.instance = None
+        self.state = PENDING
+        self.error = None
+        self.build_seconds = None
+        self.created_at = None
+        self.lock = threading.Lock()
+
+
+class ResourceRegistry:
+    """
+    Creates registered resources once and shares them between threads and sessions.
+    """
+
+    def __init__(self):
+        self._resources = {}  # name -> _Resource, in registration order
+        self.warm_up_seconds = None  # Duration of the last warm-up, once it has finished
+
+    def register(self, name: str, factory, health_check=None, description: str = "", warm_up=None) -> None:
+        """
+        Registers a resource; it is created by the first `get` or `warm_up`.
+
+        Args:
+            name (str): Name of the resource.
+            factory (callable): Creates the resource (may `get` other resources).
+            health_check (callable): Called with the resource; returns a short status text,
+                or False (or raises) if the resource is unhealthy.
+            description (str): What the resource is, for display.
+            warm_up (callable): Called with the resource after `warm_up` creates it, for work
+                worth doing ahead of the first request (e.g. starting worker processes).
+        """
+        self._resources[name] = _Resource(name, factory, health_check, description, warm_up)
+
+    def names(self) -> list:
+        """
+        Returns the names of the registered resources, in registration order.
+        """
+        return list(self._resources)
+
+    def get(self, name: str):
+        """
+        Returns a resource, creating it first if needed. Concurrent callers wait for the one
+        creating it. A resource whose creation failed is retried on the next call.
+
+        Args:
+            name (str): Name of the resource.
+
+        Returns:
+            object: The resource.
+        """
+        resource = self._resources[name]
+        if resource.state == READY:
+            return resource.instance
+        with resource.lock:
+            if resource.state != READY:
+                resource.state = STARTING
+                start = time.perf_counter()
+                try:
+                    resource.instance = resource.factory()
+                except Exception as e:
+                    resource.state = FAILED
+                    resource.error = f"{type(e).__name__}: {e}"
+                    resource.build_seconds = time.perf_counter() - start
+                    raise
+                resource.build_seconds = time.perf_counter() - start
+                resource.created_at = time.time()
+                resource.error = None
+                resource.state = READY
+        return resource.instance
+
+    def warm_up(self, names: list = None, background: bool = True):
+        """
+        Creates resources ahead of their first use, each on its own thread, and runs their
+        warm-up hooks.
+
+        Args:
+            names (list): Resources to create (all registered resources if None).
+            background (bool): Return right away instead of waiting for the resources.
+
+        Returns:
+            threading.Thread | None: Thread running the warm-up if background, else None.
+        """
+        names = list(names or self._resources)
+
+        def run():
+            start = time.perf_counter()
+            threads = [
+                threading.Thread(target=self._warm_up_one, args=(name,), name=f"codi-warm-{name}", daemon=True)
+                for name in names
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.warm_up_seconds = time.perf_counter() - start
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="codi-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up_one(self, name: str) -> None:
+        try:
+            instance = self.get(name)
+            if self._resources[name].warm_up is not None:
+                self._resources[name].warm_up(instance)
+        except Exception as e:
+            print(f"⚠️ Could not start {name}: {e}")
+
+    def health(self) -> list:
+        """
+        Checks every resource. Resources that are not created yet are not checked (and not
+        created).
+
+        Returns:
+            list: One dict per resource with 'name', 'description', 'state', 'healthy'
+                (None until checked), 'detail', 'build_seconds', 'created_at' and
+                'check_seconds'.
+        """
+        statuses = []
+        for resource in self._resources.values():
+            status = {
+                "name": resource.name,
+                "description": resource.description,
+                "state": resource.state,
+                "healthy": None,
+                "detail": resource.error or "",
+                "build_seconds": resource.build_seconds,
+                "created_at": resource.created_at,
+                "check_seconds": None,
+            }
+            if resource.state == FAILED:
+                status["healthy"] = False
+            elif resource.state == READY:
+                status["healthy"] = True
+                if resource.health_check is not None:
+                    start = time.perf_counter()
+                    try:
+                        result = resource.health_check(resource.instance)
+                        status["healthy"] = result is not False
+                        status["detail"] = result if isinstance(result, str) else ""
+                    except Exception as e:
+                        status["healthy"] = False
+                        status["detail"] = f"{type(e).__name__}: {e}"
+                    status["check_seconds"] = time.perf_counter() - start
+            statuses.append(status)
+        return statuses
+
+
+def create_app_resources(hf_token: str) -> ResourceRegistry:
+    """
+    Registers the resources of the Streamlit app.
+
+    Args:
+        hf_token (str): Hugging Face API key for the explainer.
+
+    Returns:
+        ResourceRegistry: Registry with the settings, explainer, history, artifact pipeline,
+            media server and retention sweeper resources.
+    """
+    registry = ResourceRegistry()
+    media_server_enabled = bool(os.getenv("CODI_MEDIA_URL")) or os.getenv("CODI_MEDIA_SERVER") == "1"
+
+    def settings():
+        return SettingsManager()
+
+    def explainer():
+        # Sessions use `for_session` views that share its caches and HTTP connections
+        return CodeExplainer(hf_token, answer_cache=AnswerCache())
+
+    def history():
+        # Sessions use the namespaces of this manager
+        return HistoryManager()
+
+    def pipeline():
+        # One set of PDF/TTS workers for the whole server process
+        return ArtifactPipeline()
+
+    def media_server():
+        # Serves audio to the player by URL (with Range support) instead of inlined base64.
+        # It listens on localhost, which browsers on other machines cannot reach, so it is only
+        # started when CODI_MEDIA_URL gives an address they can use, or CODI_MEDIA_SERVER=1
+        # says every browser runs on this machine
+        server = MediaServer(
+            port=int(os.getenv("CODI_MEDIA_PORT", "0")),
+            public_url=os.getenv("CODI_MEDIA_URL")
+        )
+        if media_server_enabled:
+            server.start()
+        return server
+
+    def retention():
+        # Removes expired history and unreferenced PDF/audio/blob files in the background
+        # (limits from CODI_RETENTION_DAYS, CODI_MAX_HISTORY_ENTRIES and CODI_MAX_ARTIFACT_MB)
+        return RetentionSweeper(registry.get("history")).start()
+
+    def check_settings(instance):
+        return "saved settings" if os.path.exists(instance.settings_path) else "defaults"
+
+    def check_explainer(instance):
+        stats = instance.cache.stats()
+        return f"{stats['hits']} cache hits, {stats['misses']} misses"
+
+    def check_history(instance):
+        return f"{instance.count('upload')} uploads, {instance.count('explanation')} explanations"
+
+    def check_pipeline(instance):
+        return "TTS worker running" if instance.tts_running else "TTS worker starts with the first audio job"
+
+    def check_media_server(instance):
+        if not media_server_enabled:
+            return "off, audio is inlined (set CODI_MEDIA_URL to serve it by URL)"
+        return f"serving at {instance.public_url}" if instance.running else False
+
+    def check_retention(instance):
+        report = instance.last_report
+        return f"last sweep {report['duration']:.2f}s" if report else "first sweep running"
+
+    registry.register("settings", settings, check_settings, "Settings file")
+    registry.register("explainer", explainer, check_explainer, "Code explainer and answer cache")
+    registry.register("history", history, check_history, "History storage and search index")
+    registry.register(
+        "pipeline", pipeline, check_pipeline, "PDF and TTS workers",
+        warm_up=lambda instance: instance.warm_up()
+    )
+    registry.register("media_server", media_server, check_media_server, "Audio endpoint")
+    registry.register("retention", retention, check_retention, "Retention sweeper")
+    return registry
@@ -0,0 +1,302 @@
+"""
+Retention of history entries and generated files.
+
+PDFs, audio and uploaded-code blobs pile up in `modules/data` as the app is used. A
+`RetentionPolicy` bounds them by age, number of history entries and total size of the
+generated PDF and audio files, and files no history entry references any more (orphans)
+are removed after a grace period, as are user and session namespaces left without history
+(with their search indexes). Files history entries still reference are only evicted for
+the size budget once no unreferenced file is left, and their entries then lose the link. `RetentionSweeper` applies the policy on a background
+thread and keeps a report of what each sweep reclaimed.
+"""
+
+import os
+import re
+import threading
+import time
+
+from modules.audio_encoder import AUDIO_FORMATS
+from modules.history_storage import DEFAULT_NAMESPACE, HISTORY_TABLES
+
+# Entries read per query while looking for expired ones
+SWEEP_PAGE_SIZE = 1000
+
+# Names of audio cache files: the hex digest of `VoiceAssistant.audio_cache_key`, with
+# '.<pid>.partial' while being written, and the extension of an audio format
+AUDIO_CACHE_FILE = re.compile(
+    r"[0-9a-f]{64}(\.\d+\.partial)?("
+    + "|".join(re.escape(audio_format["extension"]) for audio_format in AUDIO_FORMATS.values())
+    + ")"
+)
+
+
+def format_bytes(size: int) -> str:
+    """
+    Formats a byte count for display, e.g. '12.3 MB'.
+    """
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class RetentionPolicy:
+    """
+    Limits applied by a sweep. A limit of None means no limit; entry limits apply to each
+    namespace (user or session) separately.
+    """
+
+    def __init__(
+        self,
+        max_age_days: float = None,
+        max_entries: int = None,
+        max_bytes: int = 500 * 1024 * 1024,
+        orphan_grace_seconds: float = 24 * 3600
+    ):
+        """
+        Initializes the policy.
+
+        Args:
+            max_age_days (float): History entries older than this are removed.
+            max_entries (int | dict): Most entries kept per history, as one number for all
+                kinds or a dict of kind to number.
+            max_bytes (int): Size budget of generated PDF and audio files; the least recently
+                used files are removed beyond it.
+            orphan_grace_seconds (float): Age a file must reach before it is removed for being
+                unreferenced (protects files of jobs still running and recently used cache entries).
+        """
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.orphan_grace_seconds = orphan_grace_seconds
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        """
+        Builds a policy from the CODI_RETENTION_DAYS, CODI_MAX_HISTORY_ENTRIES and
+        CODI_MAX_ARTIFACT_MB environment variables (unset variables keep the defaults).
+        """
+        policy = cls()
+        if os.getenv("CODI_RETENTION_DAYS"):
+            policy.max_age_days = float(os.getenv("CODI_RETENTION_DAYS"))
+        if os.getenv("CODI_MAX_HISTORY_ENTRIES"):
+            policy.max_entries = int(os.getenv("CODI_MAX_HISTORY_ENTRIES"))
+        if os.getenv("CODI_MAX_ARTIFACT_MB"):
+            policy.max_bytes = int(float(os.getenv("CODI_MAX_ARTIFACT_MB")) * 1024 * 1024)
+        return policy
+
+    def entry_limit(self, kind: str):
+        """
+        Returns the most entries kept for a history kind, or None.
+        """
+        if isinstance(self.max_entries, dict):
+            return self.max_entries.get(kind)
+        return self.max_entries
+
+
+def _expired_entry_ids(history_mgr, kind: str, policy: RetentionPolicy, now: float) -> list:
+    """
+    Collects the ids of entries beyond the age and count limits, oldest first.
+    """
+    expired = []
+    limit = policy.entry_limit(kind)
+    if limit is not None:
+        excess = history_mgr.count(kind) - limit
+        if excess > 0:
+            expired = [entry["id"] for entry in history_mgr.query(kind, 0, excess, newest_first=False, fields=())]
+
+    if policy.max_age_days is not None:
+        cutoff = now - policy.max_age_days * 86400
+        offset = len(expired)
+        while True:
+            entries = history_mgr.query(kind, offset, SWEEP_PAGE_SIZE, newest_first=False, fields=())
+            old = [entry["id"] for entry in entries if entry.get("created_at", now) < cutoff]
+            expired.extend(old)
+            if len(old) < SWEEP_PAGE_SIZE:
+                break
+            offset += SWEEP_PAGE_SIZE
+    return expired
+
+
+def _artifact_files(history_mgr) -> list:
+    """
+    Lists generated PDF and audio files as (path, size, mtime), with one scan per directory.
+    """
+    files = []
+    for directory, is_artifact in (
+        (history_mgr.pdf_dir, lambda name: name.startswith(("expl_", "chat_")) and ".pdf" in name),
+        (history_mgr.audio_dir, lambda name: AUDIO_CACHE_FILE.fullmatch(name) is not None),
+    ):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and is_artifact(entry.name):
+                        stat = entry.stat()
+                        files.append((os.path.abspath(entry.path), stat.st_size, stat.st_mtime))
+        except FileNotFoundError:
+            continue
+    return files
+
+
+def _remove(path: str) -> int:
+    """
+    Removes a file, returning the bytes freed (0 if it was already gone).
+    """
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+def sweep(history_mgr, policy: RetentionPolicy, now: float = None) -> dict:
+    """
+    Applies a retention policy once: removes expired history entries, then namespaces left
+    without entries, then orphaned files and blobs, then the least recently used PDF and audio
+    files beyond the size budget (unreferenced ones first; entries referencing an evicted
+    file have its path cleared).
+
+    Args:
+        history_mgr (HistoryManager): Manager of any namespace; all namespaces are swept.
+        policy (RetentionPolicy): Limits to apply.
+        now (float): Current time (defaults to time.time()).
+
+    Returns:
+        dict: Report with the removed 'entries' per kind, 'namespaces', 'orphans' and 'evicted'
+            file counts, 'unlinked' entries, 'bytes_reclaimed', remaining 'artifact_bytes',
+            'finished_at' and 'duration'.
+    """
+    started = time.perf_counter()
+    now = now or time.time()
+    report = {"entries": {}, "namespaces": 0, "orphans": 0, "evicted": 0, "unlinked": 0, "bytes_reclaimed": 0}
+    grace_cutoff = now - policy.orphan_grace_seconds
+
+    # 1. History entries beyond the age and count limits, in every namespace
+    if policy.max_age_days is not None or policy.max_entries is not None:
+        for namespace in history_mgr.namespaces():
+            namespace_mgr = history_mgr.for_namespace(namespace)
+            for kind in HISTORY_TABLES:
+                expired = _expired_entry_ids(namespace_mgr, kind, policy, now)
+                namespace_mgr.delete_entries(kind, expired)
+                report["entries"][kind] = report["entries"].get(kind, 0) + len(expired)
+
+    # 2. Namespaces (users or sessions) without entries and unused for the grace period
+    for namespace in history_mgr.known_namespaces():
+        if namespace == DEFAULT_NAMESPACE or history_mgr.namespace_activity(namespace) >= grace_cutoff:
+            continue
+        storage = history_mgr.storage.with_namespace(namespace)
+        if any(storage.count(kind) for kind in HISTORY_TABLES):
+            continue
+        report["bytes_reclaimed"] += history_mgr.remove_namespace(namespace)
+        report["namespaces"] += 1
+
+    # 3. Files and blobs no remaining entry of any namespace references
+    referenced_paths, referenced_digests = history_mgr.referenced_files(all_namespaces=True)
+    remaining = []
+    for path, size, mtime in _artifact_files(history_mgr):
+        if path not in referenced_paths and mtime < grace_cutoff:
+            report["bytes_reclaimed"] += _remove(path)
+            report["orphans"] += 1
+        else:
+            remaining.append((path, size, mtime))
+
+    for digest, _ in history_mgr.blobs.iter_digests():
+        if digest in referenced_digests:
+            continue
+        path = history_mgr.blobs.path_for(digest)
+        try:
+            if os.path.getmtime(path) >= grace_cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        report["bytes_reclaimed"] += history_mgr.blobs.delete(digest)
+        report["orphans"] += 1
+
+    # 4. Least recently used PDF and audio files beyond the size budget, unreferenced ones
+    #    (recent cache entries) before those history entries link to
+    total = sum(size for _, size, _ in remaining)
+    unlinked_paths = set()
+    if policy.max_bytes is not None and total > policy.max_bytes:
+        for path, size, mtime in sorted(remaining, key=lambda item: (item[0] in referenced_paths, item[2])):
+            if total <= policy.max_bytes:
+                break
+            if mtime >= grace_cutoff and (".partial" in path or path.endswith(".tmp")):
+                continue  # Still being written by a running job
+            freed = _remove(path)
+            total -= size
+            report["bytes_reclaimed"] += freed
+            report["evicted"] += 1
+            if path in referenced_paths:
+                unlinked_paths.add(path)
+    if unlinked_paths:
+        report["unlinked"] = history_mgr.clear_file_references(unlinked_paths)
+
+    report["artifact_bytes"] = total
+    report["finished_at"] = time.time()
+    report["duration"] = time.perf_counter() - started
+    return report
+
+
+class RetentionSweeper:
+    """
+    Runs `sweep` periodically on a background thread and keeps its reports.
+    """
+
+    def __init__(self, history_mgr, policy: RetentionPolicy = None, interval: float = 3600):
+        """
+        Initializes the sweeper; call `start` to begin sweeping.
+
+        Args:
+            history_mgr (HistoryManager): Histories and file locations to sweep.
+            policy (RetentionPolicy): Limits to apply (defaults to `RetentionPolicy.from_env()`).
+            interval (float): Seconds between sweeps.
+        """
+        self.history_mgr = history_mgr
+        self.policy = policy or RetentionPolicy.from_env()
+        self.interval = interval
+        self.last_report = None
+        self.total_bytes_reclaimed = 0
+        self._sweep_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self) -> "RetentionSweeper":
+        """
+        Starts sweeping in the background, beginning with an immediate sweep.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="codi-retention", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.sweep_now()
+            except Exception as e:
+                print(f"⚠️ Retention sweep failed: {e}")
+            self._stop_event.wait(self.interval)
+
+    def sweep_now(self) -> dict:
+        """
+        Runs a sweep right away (waits for a sweep already in progress).
+
+        Returns:
+            dict: Report of the sweep (see `sweep`).
+        """
+        with self._sweep_lock:
+            report = sweep(self.history_mgr, self.policy)
+            self.last_report = report
+            self.total_bytes_reclaimed += report["bytes_reclaimed"]
+            return report
+
+    def stop(self) -> None:
+        """
+        Stops the background thread after the current sweep.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -32,6 +32,9 @@ class SettingsManager:
             'speech_rate': 165,
             'voice_activation': False,
             'voice_gender': "Neutral",
+            'prompt_compaction': "light",
+            'audio_codec': "mp3",
+            'audio_bitrate': "64k",
             # 'enable_ide_integration': False,  # Reserved for future use
         }
 
@@ -45,7 +48,8 @@ class SettingsManager:
         if os.path.exists(self.settings_path):
             try:
                 with open(self.settings_path, "r") as f:
-                    settings = json.load(f)
+                    # Defaults fill in settings added after the file was saved
+                    settings = {**self.default_settings, **json.load(f)}
                     self._apply_to_session_state(settings)
                     return settings
             except json.JSONDecodeError:
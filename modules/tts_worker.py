@@ -0,0 +1,250 @@
+"""
+Long-lived text-to-speech worker process.
+
+pyttsx3 engines are slow to start and must not be shared between concurrent sessions,
+so a single process owns the engine and serves synthesis requests from a queue, one at
+a time. The available voices are enumerated once and stored as a gender to voice id
+catalog on disk, so later starts skip voice enumeration. Callers receive futures.
+"""
+
+import atexit
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import threading
+from concurrent.futures import Future
+
+from modules.voice_assistant import DEFAULT_AUDIO_CACHE_DIR
+
+# Persisted gender to voice id map of this machine
+DEFAULT_VOICE_CATALOG_PATH = "./modules/data/cache/voice_catalog.json"
+
+# How often (seconds) the worker and the listener check that the other side is alive
+LIVENESS_INTERVAL = 1.0
+
+
+def load_voice_catalog(path: str):
+    """
+    Loads a persisted voice catalog if it was built on this platform.
+
+    Args:
+        path (str): Catalog file path.
+
+    Returns:
+        dict | None: Gender to voice id map, or None if missing or stale.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if data.get("platform") != platform.system():
+        return None
+    return data.get("voices")
+
+
+def save_voice_catalog(catalog: dict, path: str) -> None:
+    """
+    Persists a voice catalog, replacing the file atomically.
+
+    Args:
+        catalog (dict): Gender to voice id map.
+        path (str): Catalog file path.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"platform": platform.system(), "voices": catalog}, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def _worker_main(requests, results, cache_dir: str, catalog_path: str) -> None:
+    """
+    Entry point of the worker process: serves requests until told to stop.
+
+    Requests are (request_id, text, gender, codec, bitrate) tuples, or None to stop. Results are
+    ('segment', request_id, path), ('done', request_id, path) or ('error', request_id, message).
+    """
+    from modules.audio_encoder import AudioEncoder
+    from modules.voice_assistant import VoiceAssistant
+
+    catalog = load_voice_catalog(catalog_path)
+    voice = VoiceAssistant(cache_dir=cache_dir, voice_catalog=catalog)
+    if catalog is None:
+        save_voice_catalog(voice.voice_catalog, catalog_path)
+
+    encoders = {}  # (codec, bitrate) -> AudioEncoder
+    parent = multiprocessing.parent_process()
+    try:
+        while True:
+            try:
+                request = requests.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    break
+                continue
+            if request is None:
+                break
+
+            request_id, text, gender, codec, bitrate = request
+            try:
+                if (codec, bitrate) not in encoders:
+                    encoders[codec, bitrate] = AudioEncoder(codec, bitrate)
+                voice.encoder = encoders[codec, bitrate]
+                voice.set_voice_by_gender(gender)
+                path = voice.synthesize_chunked(
+                    text, on_segment=lambda segment: results.put(("segment", request_id, segment))
+                )
+                results.put(("done", request_id, path))
+            except Exception as e:
+                results.put(("error", request_id, f"{type(e).__name__}: {e}"))
+    finally:
+        voice.close()
+
+
+class TTSWorker:
+    """
+    Client of the TTS worker process: queues requests and resolves their futures.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_AUDIO_CACHE_DIR, catalog_path: str = DEFAULT_VOICE_CATALOG_PATH):
+        """
+        Initializes the client; the process is started on the first request.
+
+        Args:
+            cache_dir (str): Directory of the audio cache used by the worker.
+            catalog_path (str): File path of the persisted voice catalog.
+        """
+        self.cache_dir = cache_dir
+        self.catalog_path = catalog_path
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._requests = None
+        self._results = None
+        self._listener = None
+        self._pending = {}  # request_id -> (future, on_segment), of the current process only
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        # Stop the worker before multiprocessing joins its (non-daemon) children at exit
+        atexit.register(self.shutdown)
+
+    @property
+    def running(self) -> bool:
+        """
+        Whether the worker process is alive.
+        """
+        return self._process is not None and self._process.is_alive()
+
+    def start(self) -> None:
+        """
+        Starts the worker process ahead of the first request, so its TTS engine and voice
+        catalog are loaded before anyone asks for audio.
+        """
+        with self._lock:
+            self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        """
+        Starts (or restarts, after a crash) the worker process and the result listener.
+        """
+        if self._process is not None and self._process.is_alive():
+            return
+        requests, results = self._context.Queue(), self._context.Queue()
+        # Not a daemon: the worker starts its own segment worker processes
+        process = self._context.Process(
+            target=_worker_main,
+            args=(requests, results, self.cache_dir, self.catalog_path),
+            name="codi-tts",
+        )
+        process.start()
+        # Each process gets its own table of pending requests, so the listener of a crashed
+        # process only fails the requests that process owned
+        self._process, self._requests, self._results, self._pending = process, requests, results, {}
+        self._listener = threading.Thread(
+            target=self._listen, args=(process, results, self._pending), name="codi-tts-results", daemon=True
+        )
+        self._listener.start()
+
+    def _listen(self, process, results, pending: dict) -> None:
+        """
+        Resolves futures from a worker process's results; fails its pending requests if it dies.
+        """
+        while True:
+            try:
+                kind, request_id, value = results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                with self._lock:
+                    failed = list(pending.values())
+                    pending.clear()
+                for future, _ in failed:
+                    future.set_exception(RuntimeError("TTS worker process exited"))
+                return
+
+            with self._lock:
+                future, on_segment = pending.get(request_id, (None, None))
+                if kind != "segment":
+                    pending.pop(request_id, None)
+            if future is None:
+                continue
+            if kind == "segment":
+                if on_segment is not None:
+                    on_segment(value)
+            elif kind == "done":
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+    def submit(
+        self,
+        text: str,
+        gender: str = "Neutral",
+        on_segment=None,
+        codec: str = "mp3",
+        bitrate: str = "64k"
+    ) -> Future:
+        """
+        Queues speech synthesis of a text.
+
+        Args:
+            text (str): Text to be converted into speech.
+            gender (str): Voice gender ('Male', 'Female' or 'Neutral').
+            on_segment (callable): Called with each segment path, in playback order, as it
+                becomes ready.
+            codec (str): Output format ('mp3', 'ogg' or 'wav').
+            bitrate (str): Output bitrate, e.g. '64k'.
+
+        Returns:
+            Future: Resolves to the path of the cached audio file.
+        """
+        future = Future()
+        with self._lock:
+            self._ensure_started()
+            request_id = next(self._ids)
+            self._pending[request_id] = (future, on_segment)
+            self._requests.put((request_id, text, gender, codec, bitrate))
+        return future
+
+    def shutdown(self, timeout: float = 30) -> None:
+        """
+        Stops the worker process after the queued requests finish.
+
+        Args:
+            timeout (float): Seconds to wait before the process is terminated.
+        """
+        with self._lock:
+            process = self._process
+            if process is None:
+                return
+            if process.is_alive():
+                self._requests.put(None)
+            self._process = None
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
@@ -2,11 +2,152 @@
 Text-to-speech engine wrapper using pyttsx3.
 
 Allows saving synthesized speech as MP3 and speaking directly from text.
-Supports voice selection by gender and adjustable speech rate.
+Supports voice selection by gender and adjustable speech rate. Synthesized audio is
+cached on disk by text, voice and rate, so repeated explanations are not spoken again.
+Long texts can be split at sentence boundaries and synthesized on a pool of worker
+processes, each with its own engine, so the first segment is playable early. Finished
+audio is compressed with a local encoder when one is installed.
 """
 
-import pyttsx3
+import hashlib
+import multiprocessing
 import os
+import re
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import pyttsx3
+
+from modules.audio_encoder import AUDIO_FORMATS, AudioEncoder
+
+# Directory of cached synthesized audio
+DEFAULT_AUDIO_CACHE_DIR = "./modules/data/cache/audio"
+
+# Engine of a segment worker process (see `_init_segment_worker`)
+_segment_engine = None
+
+
+def split_speech_segments(text: str, max_chars: int = 400, first_segment_chars: int = 150) -> list:
+    """
+    Splits text into segments at paragraph and sentence boundaries.
+
+    Sentences are packed into segments of up to `max_chars` characters; the first segment is
+    kept shorter so playback can start as soon as possible. A single sentence longer than the
+    limit becomes its own segment.
+
+    Args:
+        text (str): Text to be converted into speech.
+        max_chars (int): Target maximum length of a segment.
+        first_segment_chars (int): Target maximum length of the first segment.
+
+    Returns:
+        list: Non-empty text segments in reading order.
+    """
+    sentences = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        sentences.extend(
+            sentence.strip() for sentence in re.split(r"(?<=[.!?:])\s+", paragraph) if sentence.strip()
+        )
+
+    segments, current = [], ""
+    for sentence in sentences:
+        limit = first_segment_chars if not segments else max_chars
+        if current and len(current) + 1 + len(sentence) > limit:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+
+def build_voice_catalog(voices: list) -> dict:
+    """
+    Maps each supported gender to a voice id, using common voice naming patterns.
+
+    Args:
+        voices (list): Voices reported by a pyttsx3 engine.
+
+    Returns:
+        dict: 'male', 'female' and 'neutral' mapped to a voice id (or None if not found).
+    """
+    # 'female' contains 'male', so female names are excluded from the male match
+    male_voice = next(
+        (v for v in voices if ('male' in v.name.lower() and 'female' not in v.name.lower()) or 'david' in v.name.lower()),
+        None
+    )
+    female_voice = next((v for v in voices if 'female' in v.name.lower() or 'zira' in v.name.lower()), None)
+
+    # Default to third voice if available, otherwise use female voice
+    neutral_voice = voices[2] if len(voices) >= 3 else female_voice
+
+    return {
+        "male": male_voice.id if male_voice else None,
+        "female": female_voice.id if female_voice else None,
+        "neutral": neutral_voice.id if neutral_voice else None,
+    }
+
+
+def _partial_path(path: str) -> str:
+    """
+    Returns the temporary name a file is written under before it is moved into place.
+    """
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}.partial{extension}"
+
+
+def _init_segment_worker(rate: int) -> None:
+    """
+    Creates the TTS engine of a segment worker process.
+    """
+    global _segment_engine
+    _segment_engine = pyttsx3.init()
+    _segment_engine.setProperty("rate", rate)
+
+
+def _synthesize_segment(text: str, voice_id: str, output_path: str) -> str:
+    """
+    Synthesizes one segment in a worker process and moves it into place when complete.
+    """
+    if voice_id:
+        _segment_engine.setProperty("voice", voice_id)
+    partial_path = _partial_path(output_path)
+    _segment_engine.save_to_file(text, partial_path)
+    _segment_engine.runAndWait()
+    os.replace(partial_path, output_path)
+    return output_path
+
+
+def concatenate_audio(segment_paths: list, output_path: str) -> bool:
+    """
+    Joins WAV-encoded segments (the format pyttsx3 writes) into one file.
+
+    Args:
+        segment_paths (list): Segment files in playback order.
+        output_path (str): File path of the joined audio.
+
+    Returns:
+        bool: False if the segments are not WAV data with matching parameters.
+    """
+    try:
+        with wave.open(output_path, "wb") as output:
+            params = None
+            for path in segment_paths:
+                with wave.open(path, "rb") as segment:
+                    segment_params = segment.getparams()[:3]  # channels, sample width, rate
+                    if params is None:
+                        params = segment_params
+                        output.setparams(segment.getparams())
+                    elif segment_params != params:
+                        raise wave.Error("segments have different audio parameters")
+                    output.writeframes(segment.readframes(segment.getnframes()))
+        return True
+    except (wave.Error, EOFError):
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False
+
 
 class VoiceAssistant:
     """
@@ -14,16 +155,49 @@ class VoiceAssistant:
     Supports saving audio to files and selecting voices by gender.
     """
 
-    def __init__(self, rate: int = 175):
+    def __init__(
+        self,
+        rate: int = 175,
+        cache_dir: str = DEFAULT_AUDIO_CACHE_DIR,
+        max_cache_bytes: int = 200 * 1024 * 1024,
+        segment_workers: int = None,
+        voice_catalog: dict = None,
+        encoder: AudioEncoder = None
+    ):
         """
         Initializes the TTS engine with a given speech rate.
 
         Args:
             rate (int): Speed of the spoken text (default is 175 words per minute).
+            cache_dir (str): Directory of cached audio files.
+            max_cache_bytes (int): Size limit of the audio cache; least recently used
+                files are removed beyond it.
+            segment_workers (int): Worker processes for chunked synthesis (defaults to
+                up to 4, depending on the CPU count).
+            voice_catalog (dict): Precomputed gender to voice id map; built from the
+                engine's voices when omitted.
+            encoder (AudioEncoder): Output encoder (MP3 at 64 kbps when available).
         """
         self.engine = pyttsx3.init()
+        self.rate = rate
         self.engine.setProperty("rate", rate)
-        self.voices = self.engine.getProperty('voices')  # Get available voices
+        self._voices = None  # Enumerated on first use
+        self.voice_catalog = voice_catalog if voice_catalog is not None else build_voice_catalog(self.voices)
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self._cache_bytes = None  # Size of the audio cache, tracked per store after the first scan
+        self.segment_workers = segment_workers or min(4, os.cpu_count() or 1)
+        self._segment_pool = None
+        self.encoder = encoder or AudioEncoder()
+
+    @property
+    def voices(self) -> list:
+        """
+        Returns the voices available to the engine, enumerating them only once.
+        """
+        if self._voices is None:
+            self._voices = self.engine.getProperty('voices')
+        return self._voices
 
     def set_voice_by_gender(self, gender: str):
         """
@@ -34,24 +208,11 @@ class VoiceAssistant:
 
         Notes:
             - Falls back to a default voice if the specified one isn't found.
-            - Common voices include 'David' (male) and 'Zira' (female) on Windows.
+            - Voices are looked up in the precomputed voice catalog (see `build_voice_catalog`).
         """
-        gender = gender.lower()
-
-        # Attempt to find male or female voices using common naming patterns
-        male_voice = next((v for v in self.voices if 'male' in v.name.lower() or 'david' in v.name.lower()), None)
-        female_voice = next((v for v in self.voices if 'female' in v.name.lower() or 'zira' in v.name.lower()), None)
-
-        # Default to third voice if available, otherwise use female voice
-        neutral_voice = self.voices[2] if len(self.voices) >= 3 else female_voice
-
-        # Assign selected voice based on gender
-        if gender == 'male' and male_voice:
-            self.engine.setProperty('voice', male_voice.id)
-        elif gender == 'female' and female_voice:
-            self.engine.setProperty('voice', female_voice.id)
-        elif gender == 'neutral':
-            self.engine.setProperty('voice', neutral_voice.id)
+        voice_id = self.voice_catalog.get(gender.lower())
+        if voice_id:
+            self.engine.setProperty('voice', voice_id)
         else:
             print("⚠️ Invalid gender or voice not found. Using default voice.")
 
@@ -73,6 +234,193 @@ class VoiceAssistant:
         self.engine.runAndWait()  # Complete the speech task
         return output_path
 
+    def audio_cache_key(self, text: str, encoding: str = None) -> str:
+        """
+        Builds the cache key of an audio file from the text, selected voice, rate and
+        output encoding.
+
+        Args:
+            text (str): Text to be converted into speech.
+            encoding (str): Output encoding signature (defaults to the encoder's).
+
+        Returns:
+            str: Hex digest identifying the synthesized audio.
+        """
+        voice_id = self.engine.getProperty('voice') or ""
+        encoding = encoding or self.encoder.signature
+        raw = f"{text}\x00{voice_id}\x00{self.rate}\x00{encoding}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _cached_audio(self, key: str):
+        """
+        Returns the cached file for a key (encoded, or the WAV kept when encoding failed).
+        """
+        for extension in dict.fromkeys((self.encoder.extension, ".wav")):
+            audio_path = os.path.join(self.cache_dir, key + extension)
+            if os.path.exists(audio_path):
+                os.utime(audio_path)  # Mark as recently used
+                return audio_path
+        return None
+
+    def _store_audio(self, key: str, wav_path: str) -> str:
+        """
+        Encodes a synthesized WAV file and moves the result into the cache.
+        """
+        audio_path = os.path.join(self.cache_dir, key + self.encoder.extension)
+        encoded_path = _partial_path(audio_path)
+        if self.encoder.codec != "wav" and self.encoder.encode(wav_path, encoded_path):
+            os.remove(wav_path)
+            os.replace(encoded_path, audio_path)
+        else:
+            audio_path = os.path.join(self.cache_dir, key + ".wav")
+            os.replace(wav_path, audio_path)
+        self._add_to_cache(audio_path)
+        return audio_path
+
+    def synthesize(self, text: str) -> str:
+        """
+        Returns the audio file for a text, synthesizing it only if it is not cached yet.
+
+        Args:
+            text (str): Text to be converted into speech.
+
+        Returns:
+            str: Path to the cached audio file.
+        """
+        key = self.audio_cache_key(text)
+        audio_path = self._cached_audio(key)
+        if audio_path is not None:
+            return audio_path
+
+        # Synthesize under a temporary name so an interrupted run is never served as a hit
+        wav_path = _partial_path(os.path.join(self.cache_dir, key + ".wav"))
+        self.save_audio(text, wav_path)
+        return self._store_audio(key, wav_path)
+
+    def synthesize_chunked(self, text: str, on_segment=None) -> str:
+        """
+        Synthesizes long text segment by segment on worker processes and joins the result.
+
+        Segments are cached (as WAV) like whole texts, so a partly changed explanation only
+        synthesizes its new sentences. Falls back to `synthesize` for short texts and for
+        engines that do not write joinable WAV data.
+
+        Args:
+            text (str): Text to be converted into speech.
+            on_segment (callable): Called with each segment path, in playback order, as soon
+                as the segment and all segments before it are ready.
+
+        Returns:
+            str: Path to the cached audio file of the whole text.
+        """
+        key = self.audio_cache_key(text)
+        audio_path = self._cached_audio(key)
+        if audio_path is not None:
+            return audio_path
+
+        segments = split_speech_segments(text)
+        if len(segments) < 2:
+            return self.synthesize(text)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        voice_id = self.engine.getProperty('voice')
+        pool = self._get_segment_pool()
+        pending = []
+        for segment in segments:
+            segment_path = os.path.join(self.cache_dir, f"{self.audio_cache_key(segment, 'wav')}.wav")
+            if os.path.exists(segment_path):
+                os.utime(segment_path)
+                pending.append(segment_path)
+            else:
+                pending.append(pool.submit(_synthesize_segment, segment, voice_id, segment_path))
+
+        segment_paths = []
+        for item in pending:
+            if isinstance(item, str):
+                segment_path = item
+            else:
+                segment_path = item.result()
+                self._add_to_cache(segment_path)
+            segment_paths.append(segment_path)
+            if on_segment is not None:
+                on_segment(segment_path)
+
+        wav_path = _partial_path(os.path.join(self.cache_dir, key + ".wav"))
+        if not concatenate_audio(segment_paths, wav_path):
+            return self.synthesize(text)
+        return self._store_audio(key, wav_path)
+
+    def _get_segment_pool(self) -> ProcessPoolExecutor:
+        """
+        Returns the segment worker pool, starting it on first use.
+        """
+        if self._segment_pool is None:
+            # Spawn rather than fork: TTS drivers hold threads and native handles
+            self._segment_pool = ProcessPoolExecutor(
+                max_workers=self.segment_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_segment_worker,
+                initargs=(self.rate,)
+            )
+        return self._segment_pool
+
+    def close(self) -> None:
+        """
+        Stops the segment worker processes, if they were started.
+        """
+        if self._segment_pool is not None:
+            self._segment_pool.shutdown(wait=True)
+            self._segment_pool = None
+
+    def _add_to_cache(self, path: str) -> None:
+        """
+        Counts a new file towards the cache size, evicting old files once it is over the limit.
+        The cache directory is only scanned on the first store and when the limit is crossed.
+
+        Args:
+            path (str): Cached file just written (never removed by the eviction it triggers).
+        """
+        if self._cache_bytes is not None:
+            try:
+                self._cache_bytes += os.path.getsize(path)
+            except OSError:
+                pass
+        if self._cache_bytes is None or self._cache_bytes > self.max_cache_bytes:
+            self._evict_cache(keep=path)
+
+    def _evict_cache(self, keep: str = None) -> None:
+        """
+        Removes the least recently used cached audio files beyond `max_cache_bytes`, and
+        resets the tracked size of the cache.
+
+        Eviction goes down to 90% of the limit so that a full cache is not scanned again on
+        the very next store.
+
+        Args:
+            keep (str): Path that must not be removed (the file just returned).
+        """
+        extensions = tuple(audio_format["extension"] for audio_format in AUDIO_FORMATS.values())
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(extensions) and ".partial." not in entry.name:
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        target = self.max_cache_bytes * 0.9 if total > self.max_cache_bytes else self.max_cache_bytes
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            if os.path.abspath(path) == os.path.abspath(keep or ""):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._cache_bytes = total
+
     # currently not being used
     def speak(self, text: str) -> None:
         """
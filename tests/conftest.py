@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules.history_manager import HistoryManager
+
+# Tests import the app's packages (`modules`, `benchmarks`) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STREAMED_TOKENS = [" The", " function", " adds", " two", " numbers."]
+
+
+class StandInModel(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the inference API: answers every request with a fixed text, streamed
+    as server-sent events when the request asks for a stream.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.payloads.append(payload)
+        if payload.get("stream"):
+            self.stream_tokens()
+            return
+        body = json.dumps([{"generated_text": f"Explained request {len(self.server.payloads)}"}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_tokens(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, text in enumerate(self.server.streamed_tokens):
+            if index == self.server.fail_after:
+                # Drop the connection mid-stream, without the terminating chunk
+                self.close_connection = True
+                return
+            event = f'data:{json.dumps({"token": {"text": text, "special": False}})}\n\n'.encode()
+            self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def model_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInModel)
+    server.payloads = []
+    server.streamed_tokens = STREAMED_TOKENS
+    server.fail_after = None  # Index of the streamed token to drop the connection at
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_history_manager(tmp_path):
+    """
+    Returns a factory of history managers keeping all their files under `tmp_path/data`.
+    """
+    def make(backend="sqlite"):
+        data = tmp_path / "data"
+        return HistoryManager(
+            upload_history_path=str(data / "upload_history.json"),
+            explanation_history_path=str(data / "explanation_history.json"),
+            chat_history_path=str(data / "chat_history.json"),
+            audio_dir=str(data / "cache" / "audio"),
+            pdf_dir=str(data),
+            backend=backend,
+            db_path=str(data / "history.db"),
+            blob_dir=str(data / "blobs"),
+            search_db_path=str(data / "search.db"),
+        )
+    return make
@@ -0,0 +1,87 @@
+from modules.answer_cache import (
+    AnswerCache,
+    code_names,
+    jaccard,
+    normalize_question,
+    question_identifiers,
+    question_shingles,
+)
+
+CODE = '''
+def parse(text):
+    return text.split()
+
+class Renderer:
+    pass
+
+limit: int = 10
+'''
+
+
+def similarity(a, b):
+    return jaccard(question_shingles(normalize_question(a)), question_shingles(normalize_question(b)))
+
+
+def test_questions_differing_in_punctuation_and_case_are_the_same():
+    cache = AnswerCache()
+    cache.set("ctx", "What does load_config() return?", "A dict.")
+
+    assert cache.get("ctx", "what does load_config return") == "A dict."
+    assert cache.get("other ctx", "what does load_config return") is None
+    assert cache.stats()["near_hits"] == 0
+
+
+def test_near_duplicates_match_from_the_threshold():
+    stored = "what does the load_config function return"
+    close = "what does the load_config function return exactly"
+    far = "why does load_config raise errors"
+    assert similarity(stored, close) >= 0.75 > similarity(stored, far)
+
+    cache = AnswerCache(similarity_threshold=0.75)
+    cache.set("ctx", stored, "A dict.")
+    assert cache.get("ctx", close) == "A dict."
+    assert cache.get("ctx", far) is None
+    assert cache.stats()["near_hits"] == 1
+
+    strict = AnswerCache(similarity_threshold=0.9)
+    strict.set("ctx", stored, "A dict.")
+    assert strict.get("ctx", close) is None
+
+    exact_only = AnswerCache(similarity_threshold=None)
+    exact_only.set("ctx", stored, "A dict.")
+    assert exact_only.get("ctx", close) is None
+
+
+def test_near_duplicates_must_mention_the_same_identifiers():
+    cache = AnswerCache(similarity_threshold=0.5)
+    cache.set("ctx", "what does the load_data function return exactly", "Rows.")
+    assert similarity(
+        "what does the load_data function return exactly", "what does the save_data function return exactly"
+    ) >= 0.5
+
+    assert cache.get("ctx", "what does the save_data function return exactly") is None
+    assert cache.get("ctx", "what does the load_data function return") == "Rows."
+
+
+def test_names_defined_by_the_code_count_as_identifiers():
+    names = code_names(CODE)
+    assert names == {"parse", "Renderer", "limit"}
+    assert question_identifiers("what does parse do with the limit", names) == {"parse", "limit"}
+    assert question_identifiers("how is html rendered", names) == frozenset()
+
+    cache = AnswerCache(similarity_threshold=0.5)
+    cache.set("ctx", "what does parse do with the text", "Splits it.", names)
+    assert cache.get("ctx", "what does Renderer do with the text", names) is None
+    assert cache.get("ctx", "what does parse do with text", names) == "Splits it."
+
+
+def test_least_recently_used_answers_are_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.set("ctx", "first question", "1")
+    cache.set("ctx", "second question", "2")
+    assert cache.get("ctx", "first question") == "1"
+    cache.set("ctx", "third question", "3")
+
+    assert cache.get("ctx", "second question") is None
+    assert cache.get("ctx", "first question") == "1"
+    assert cache.stats()["entries"] == 2
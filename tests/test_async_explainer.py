@@ -0,0 +1,39 @@
+import asyncio
+import threading
+
+from modules.async_explainer import AsyncCodeExplainer
+from modules.explainer import ExplanationCache
+
+
+def test_explainer_can_be_reused_across_event_loops(model_server, tmp_path):
+    explainer = AsyncCodeExplainer(
+        "test-token",
+        model_url=f"http://127.0.0.1:{model_server.server_port}",
+        cache=ExplanationCache(cache_dir=str(tmp_path / "cache")),
+        max_concurrency=2
+    )
+    codes = [f"def f{i}():\n    return {i}\n" for i in range(6)]
+
+    first = asyncio.run(explainer.explain_many(codes))
+    second = asyncio.run(explainer.explain_many(codes + ["def g():\n    return 0\n"]))
+
+    assert not any(text.startswith("❌") for text in first + second)
+    assert second[:6] == first  # served from the cache
+    assert len(model_server.payloads) == 7
+    assert explainer._session.closed  # closed when the second loop shut down
+
+
+def test_cache_lookups_run_off_the_event_loop(model_server, tmp_path):
+    cache = ExplanationCache(cache_dir=str(tmp_path / "cache"))
+    threads = []
+    cache_get = cache.get
+    cache.get = lambda key: threads.append(threading.current_thread()) or cache_get(key)
+
+    async def run():
+        async with AsyncCodeExplainer(
+            "test-token", model_url=f"http://127.0.0.1:{model_server.server_port}", cache=cache
+        ) as explainer:
+            return await explainer.explain_code("def f():\n    return 1\n")
+
+    assert not asyncio.run(run()).startswith("❌")
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,70 @@
+import io
+import threading
+import time
+import zipfile
+
+from modules.batch_explainer import explain_files, read_uploaded_files
+
+
+class Upload:
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.data = data
+
+    def read(self) -> bytes:
+        return self.data
+
+
+def zipped(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, code in files.items():
+            archive.writestr(name, code)
+    return buffer.getvalue()
+
+
+def test_unreadable_uploads_are_skipped():
+    uploads = [
+        Upload("pkg.zip", zipped({"pkg/b.py": "b = 2\n", "pkg/a.py": "a = 1\n", "README.md": "-"})),
+        Upload("broken.zip", b"PK\x03\x04 not really a zip"),
+        Upload("latin1.py", "name = 'caf\xe9'\n".encode("latin-1")),
+        Upload("main.py", b"print('hi')\n"),
+    ]
+
+    code_files, skipped = read_uploaded_files(uploads)
+
+    assert code_files == [("pkg/a.py", "a = 1\n"), ("pkg/b.py", "b = 2\n"), ("main.py", "print('hi')\n")]
+    assert [name for name, _ in skipped] == ["broken.zip", "latin1.py"]
+
+
+class CountingExplainer:
+    """
+    Stands in for CodeExplainer and records how many requests could be in flight at once.
+    """
+
+    class transport:
+        pool_size = 10
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.files_in_flight = 0
+        self.peak_requests = 0
+
+    def explain_large_code(self, code: str, style: str = "concise", max_workers: int = 4) -> str:
+        with self.lock:
+            self.files_in_flight += 1
+            self.peak_requests = max(self.peak_requests, self.files_in_flight * max_workers)
+        time.sleep(0.05)
+        with self.lock:
+            self.files_in_flight -= 1
+        return f"explained {code}"
+
+
+def test_files_and_chunks_fit_in_the_connection_pool():
+    explainer = CountingExplainer()
+    code_files = [(f"f{i}.py", str(i)) for i in range(12)]
+
+    results = sorted(explain_files(explainer, code_files, max_workers=4))
+
+    assert [explanation for _, _, explanation in results] == [f"explained {i}" for i in range(12)]
+    assert 0 < explainer.peak_requests <= explainer.transport.pool_size
@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.blob_store import BlobStore
+
+CODE = "def greet(name):\n    return f'Grüße, {name} ✓'\n" * 50
+
+
+def stored_files(root):
+    return sorted(os.path.relpath(os.path.join(directory, name), root)
+                  for directory, _, names in os.walk(root) for name in names)
+
+
+def test_text_and_bytes_round_trip(tmp_path):
+    store = BlobStore(str(tmp_path))
+    text_digest = store.put(CODE)
+    bytes_digest = store.put(b"\x00\xff binary")
+
+    assert store.get_text(text_digest) == CODE
+    assert store.get(bytes_digest) == b"\x00\xff binary"
+    assert text_digest == BlobStore.digest(CODE) == BlobStore.digest(CODE.encode("utf-8"))
+    assert os.path.getsize(store.path_for(text_digest)) < len(CODE.encode("utf-8"))
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        digests = set(pool.map(lambda _: store.put(CODE), range(32)))
+    store.put(CODE.encode("utf-8"))
+
+    digest, = digests
+    assert stored_files(tmp_path) == [os.path.join(digest[:2], digest[2:])]
+    assert [found for found, _ in store.iter_digests()] == [digest]
+
+
+def test_missing_and_deleted_blobs(tmp_path):
+    store = BlobStore(str(tmp_path))
+    digest = store.put(CODE)
+    size = os.path.getsize(store.path_for(digest))
+
+    assert store.delete(digest) == size
+    assert store.delete(digest) == 0
+    assert not store.exists(digest)
+    assert store.get(digest) is None and store.get_text(digest) is None
+
+
+def test_uploads_of_the_same_code_share_a_blob(make_history_manager):
+    manager = make_history_manager()
+    alice = manager.for_namespace("alice")
+    manager.add_upload({"filename": "a.py", "content": CODE})
+    alice.add_upload({"filename": "copy.py", "content": CODE})
+
+    entries = manager.load_upload_history() + alice.load_upload_history()
+    assert {entry["content_hash"] for entry in entries} == {BlobStore.digest(CODE)}
+    assert [manager.load_upload_content(entry) for entry in entries] == [CODE, CODE]
+    assert len(list(manager.blobs.iter_digests())) == 1
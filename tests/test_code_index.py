@@ -0,0 +1,56 @@
+from modules.code_index import CodeIndex, get_code_index, tokenize_text
+
+SOURCE = '''
+def hash_password(password, salt):
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, 100_000)
+    return digest.hex()
+
+
+def loadUserData(user_id):
+    with open(f"users/{user_id}.json") as f:
+        return json.load(f)
+
+
+def render_invoice(order):
+    lines = [f"{item.name}: {item.price}" for item in order.items]
+    total = sum(item.price for item in order.items)
+    return "\\n".join(lines + [f"Total: {total}"])
+
+
+def send_email(recipient, subject, body):
+    message = EmailMessage()
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(body)
+    smtp.send_message(message)
+'''
+
+
+def chunk_names(results):
+    return [symbol.name for _, chunk in results for symbol in chunk.symbols]
+
+
+def test_identifiers_are_split_into_search_terms():
+    terms = tokenize_text("loadUserData(self, user_id)")
+    assert {"loaduserdata", "load", "user", "data", "user_id", "id"} <= set(terms)
+    assert "self" not in terms
+
+
+def test_search_returns_the_relevant_chunk_first():
+    index = CodeIndex(SOURCE, chunk_tokens=60)
+    assert len(index.chunks) == 4
+
+    assert chunk_names(index.search("How is the password hashed?", top_k=1)) == ["hash_password"]
+    assert chunk_names(index.search("where is user data loaded", top_k=1)) == ["loadUserData"]
+    assert chunk_names(index.search("invoice total")[:1]) == ["render_invoice"]
+
+
+def test_chunks_without_matching_terms_are_left_out():
+    index = CodeIndex(SOURCE, chunk_tokens=60)
+    assert chunk_names(index.search("email subject")) == ["send_email"]
+    assert index.search("kubernetes") == []
+
+
+def test_index_is_built_once_per_content():
+    assert get_code_index(SOURCE) is get_code_index(SOURCE)
+    assert get_code_index(SOURCE) is not get_code_index(SOURCE + "\n# changed\n")
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from modules.explainer import CodeExplainer, ExplanationCache, StreamError
+
+@pytest.fixture
+def explainer(model_server, tmp_path):
+    return CodeExplainer(
+        "test-token",
+        model_url=f"http://127.0.0.1:{model_server.server_port}",
+        cache=ExplanationCache(cache_dir=str(tmp_path / "cache"))
+    )
+
+
+def large_module(changed: int = None, inserted: bool = False) -> str:
+    functions = []
+    for i in range(24):
+        value = "changed" if i == changed else i
+        body = "\n".join(f"    total_{j} = {j} * {i!r}" for j in range(40))
+        functions.append(f"def step_{i}():\n{body}\n    return {value!r}\n")
+    if inserted:
+        body = "\n".join(f"    extra_{j} = {j}" for j in range(60))
+        functions.insert(1, f"def helper():\n{body}\n    return None\n")
+    return "\n\n".join(functions)
+
+
+def test_first_upload_is_explained_in_packed_chunks(explainer, model_server):
+    code = large_module()
+    chunks, _ = explainer.plan_chunks(code)
+    assert 1 < len(chunks) < 24
+
+    _, report = explainer.explain_incremental(code)
+    assert report == {"reused": 0, "fresh": len(chunks)}
+    assert len(model_server.payloads) == len(chunks) + 1  # the chunks and the summary
+    assert explainer.cache.misses == len(chunks) + 1  # each key looked up once
+
+    explanation, report = explainer.explain_incremental(code)
+    assert report == {"reused": len(chunks), "fresh": 0}
+    assert len(model_server.payloads) == len(chunks) + 1
+    assert [line for line in explanation.splitlines() if line.startswith("Lines ")] == [
+        f"{chunk.title}:" for chunk in chunks
+    ]
+
+
+def test_edit_re_explains_only_the_chunk_it_touches(explainer, model_server):
+    code = large_module()
+    chunks, _ = explainer.plan_chunks(code)
+    explainer.explain_incremental(code)
+    requests = len(model_server.payloads)
+
+    _, report = explainer.explain_incremental(large_module(changed=20), previous_code=code)
+    assert report["fresh"] == 1 and report["reused"] == len(chunks) - 1
+    assert report["changed"] == ["step_20"]
+    assert len(model_server.payloads) == requests + 1
+
+    # An insertion shifts the packing of the rest of the file; the chunks of the previous
+    # version still match, and only the code around the insertion is sent again
+    edited = large_module(changed=20, inserted=True)
+    assert explainer.plan_chunks(edited)[0][1].symbols[0].name != chunks[1].symbols[0].name
+    _, report = explainer.explain_incremental(edited, previous_code=large_module(changed=20))
+    assert report["reused"] == len(chunks) - 1
+    assert report["fresh"] == 2  # the first chunk and the new function no longer fit one request
+    assert report["added"] == ["helper"]
+
+
+def test_stream_yields_tokens_and_caches_the_result(explainer, model_server):
+    code = "def add(a, b):\n    return a + b\n"
+
+    tokens = list(explainer.explain_code_stream(code))
+    assert "".join(tokens) == "The function adds two numbers."
+    assert len(tokens) == len(model_server.streamed_tokens)
+    assert explainer.cache.get(explainer.explanation_cache_key(code, "concise")) == "The function adds two numbers."
+
+
+def test_failed_stream_raises_and_caches_nothing(explainer, model_server):
+    model_server.fail_after = 2
+    code = "def add(a, b):\n    return a + b\n"
+
+    tokens = []
+    with pytest.raises(StreamError, match="Error explaining code"):
+        for token in explainer.explain_code_stream(code):
+            tokens.append(token)
+    assert tokens == ["The", " function"]
+    assert explainer.cache.get(explainer.explanation_cache_key(code, "concise")) is None
+
+    with pytest.raises(StreamError, match="Error fetching answer"):
+        list(explainer.answer_question_stream("What does add do?", uploaded_code=code))
+    assert explainer.lookup_answer("What does add do?", uploaded_code=code) is None
+
+
+def test_cache_tracks_its_size_without_scanning_every_write(tmp_path):
+    cache = ExplanationCache(cache_dir=str(tmp_path), max_disk_bytes=20_000, sweep_every=1000)
+
+    for i in range(200):
+        cache.set(f"key-{i}", "x" * 500)
+
+    on_disk = sum(item.stat().st_size for item in os.scandir(tmp_path))
+    assert on_disk <= 20_000
+    assert cache._disk_bytes == on_disk
+    # The first write, then once per ~10% of the limit written once the cache is full
+    assert cache.sweeps <= 40
+    assert cache.get("key-199") is not None
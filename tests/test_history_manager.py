@@ -0,0 +1,33 @@
+import pytest
+
+from modules.history_manager import UPLOAD_BLOBS_MARKER, HistoryManager
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "json"])
+def test_saved_upload_history_keeps_code_in_the_blob_store(backend, make_history_manager):
+    manager = make_history_manager(backend)
+    manager.save_upload_history([{"filename": "a.py", "content": "print('a')\n"}])
+
+    entry, = manager.load_upload_history()
+    assert entry.get("content") is None
+    assert manager.load_upload_content(entry) == "print('a')\n"
+    assert [result["id"] for result in manager.search("print")] == [entry["id"]]
+
+
+def test_inline_uploads_are_migrated_once(make_history_manager, monkeypatch):
+    manager = make_history_manager()
+    assert manager.storage.get_marker(UPLOAD_BLOBS_MARKER) == "0"
+    # An entry written inline, as by versions before the blob store
+    manager.storage.with_namespace("alice").append("upload", {"filename": "a.py", "content": "x = 1\n"})
+    manager.storage.set_marker(UPLOAD_BLOBS_MARKER, None)
+
+    make_history_manager()
+    entry, = manager.for_namespace("alice").load_upload_history()
+    assert entry.get("content") is None
+    assert manager.load_upload_content(entry) == "x = 1\n"
+    assert manager.storage.get_marker(UPLOAD_BLOBS_MARKER) == "1"
+
+    calls = []
+    monkeypatch.setattr(HistoryManager, "migrate_upload_blobs", lambda self: calls.append(self))
+    make_history_manager()
+    assert calls == []
@@ -0,0 +1,69 @@
+import os
+
+from modules.history_search import build_match_query, index_files
+
+
+def fill(manager):
+    manager.add_upload({"filename": "parser.py", "content": "def tokenize(source):\n    return source.split()\n"})
+    manager.add_explanation({"filename": "parser.py", "explanation": "Splits the source into tokens."})
+    manager.add_chat({"question": "How is caching done?", "answer": "Answers are kept in an LRU cache."})
+    manager.add_chat({"question": "What does tokenize return?", "answer": "A list of words."})
+
+
+def found(results):
+    return [(result["kind"], result["title"]) for result in results]
+
+
+def test_words_are_quoted_so_operators_are_searched_as_text():
+    assert build_match_query('cache NOT "lru*"') == '"cache" "NOT" "lru"'
+    assert build_match_query("?!") == ""
+
+
+def test_query_returns_the_entries_containing_every_word(make_history_manager):
+    manager = make_history_manager()
+    fill(manager)
+
+    assert found(manager.search("tokenize")) == [
+        ("chat", "What does **tokenize** return?"), ("upload", "parser.py"),
+    ]  # Title matches rank above body matches
+    assert found(manager.search("lru cache")) == [("chat", "How is caching done?")]
+    assert found(manager.search("source", kinds=("explanation",))) == [("explanation", "parser.py")]
+    assert manager.search("tokenize lru") == []
+    assert manager.search("") == []
+
+
+def test_deleted_entries_leave_the_index(make_history_manager):
+    manager = make_history_manager()
+    fill(manager)
+    chat = manager.search("caching")[0]
+
+    manager.delete_entries("chat", [chat["id"]])
+    assert manager.search("caching") == []
+    manager.clear_upload_history()
+    assert found(manager.search("tokenize")) == [("chat", "What does **tokenize** return?")]
+
+
+def test_rebuild_restores_the_index_from_the_histories(make_history_manager):
+    manager = make_history_manager()
+    fill(manager)
+    manager.for_namespace("alice").add_chat({"question": "Only alice asked?", "answer": "Yes."})
+    expected = found(manager.search("tokenize"))
+
+    manager.search_index.clear()
+    assert manager.search("tokenize") == []
+    assert manager.rebuild_search_index(batch_size=1) == {"upload": 1, "explanation": 1, "chat": 2}
+    assert found(manager.search("tokenize")) == expected
+    assert manager.search("alice") == []
+
+
+def test_missing_index_is_rebuilt_on_startup(make_history_manager):
+    manager = make_history_manager()
+    fill(manager)
+    expected = found(manager.search("tokenize"))
+    manager.search_index.close()
+    for path in index_files(manager.search_db_path):
+        os.remove(path)
+
+    restarted = make_history_manager()
+    assert restarted.search_index.count() == 4
+    assert found(restarted.search("tokenize")) == expected
@@ -0,0 +1,41 @@
+import pytest
+
+from benchmarks.history_stress import stress_test
+from modules.history_storage import HISTORY_TABLES, JsonHistoryStorage, SqliteHistoryStorage
+
+
+def make_storage(backend, tmp_path, namespace="default"):
+    if backend == "json":
+        return JsonHistoryStorage(
+            {kind: str(tmp_path / f"{kind}_history.json") for kind in HISTORY_TABLES}, namespace
+        )
+    return SqliteHistoryStorage(str(tmp_path / "history.db"), namespace)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "json"])
+def test_concurrent_writers_lose_no_entries(backend):
+    results = stress_test(backend, writers=4, entries_per_writer=20, namespaces=2)
+    assert results["entries"] == 80
+    assert results["lost"] == 0
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "json"])
+def test_namespaces_are_separate(backend, tmp_path):
+    alice = make_storage(backend, tmp_path, "alice")
+    bob = alice.with_namespace("bob")
+    alice.append("chat", {"question": "a?", "answer": "a", "cached": False})
+    bob.append("chat", {"question": "b?", "answer": "b", "cached": False})
+
+    assert [entry["question"] for entry in alice.load("chat")] == ["a?"]
+    assert [entry["question"] for entry in bob.load("chat")] == ["b?"]
+    assert {"alice", "bob"} <= set(alice.namespaces())
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "json"])
+def test_drop_removes_a_namespace(backend, tmp_path):
+    alice = make_storage(backend, tmp_path, "alice")
+    alice.append("chat", {"question": "a?", "answer": "a", "cached": False})
+    alice.drop()
+
+    assert alice.count("chat") == 0
+    assert "alice" not in alice.namespaces()
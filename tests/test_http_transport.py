@@ -0,0 +1,27 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from modules.http_transport import HttpTransport
+
+
+def failing_transport(error):
+    transport = HttpTransport(max_retries=2, backoff_base=0)
+    transport.session.post = mock.Mock(side_effect=error)
+    return transport
+
+
+@pytest.mark.parametrize("error", [requests.ConnectionError, requests.ConnectTimeout])
+def test_connection_failures_are_retried(error):
+    transport = failing_transport(error)
+    with pytest.raises(error):
+        transport.post("http://model", {"inputs": "x"})
+    assert transport.session.post.call_count == 3
+
+
+def test_read_timeout_is_not_retried():
+    transport = failing_transport(requests.ReadTimeout)
+    with pytest.raises(requests.ReadTimeout):
+        transport.post("http://model", {"inputs": "x"})
+    assert transport.session.post.call_count == 1
@@ -0,0 +1,68 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+from modules.media_server import MediaServer, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-19", (10, 19)),
+    ("bytes=990-2000", (990, 999)),  # End beyond the file is clamped
+    ("bytes=500-", (500, 999)),  # Open-ended
+    ("bytes=-100", (900, 999)),  # Suffix: the last 100 bytes
+    ("bytes=-5000", (0, 999)),  # Suffix longer than the file
+    (" bytes=0-0 ", (0, 0)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1000-1200", "bytes=20-10", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    assert parse_range(header, 1000) == ()
+
+
+@pytest.mark.parametrize("header", [None, "", "bytes=-", "bytes=0-9,20-29", "items=0-9", "bytes=a-b"])
+def test_unsupported_headers_send_the_whole_file(header):
+    assert parse_range(header, 1000) is None
+
+
+def test_empty_file_cannot_satisfy_a_range():
+    assert parse_range("bytes=0-", 0) == ()
+    assert parse_range("bytes=-10", 0) == ()
+
+
+def test_server_answers_range_requests(tmp_path):
+    path = tmp_path / "speech.mp3"
+    path.write_bytes(bytes(range(256)) * 4)
+    server = MediaServer()
+    assert server.start()
+    try:
+        url = server.url_for(str(path))
+
+        request = urllib.request.Request(url, headers={"Range": "bytes=-16"})
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 206
+            assert response.headers["Content-Range"] == "bytes 1008-1023/1024"
+            assert response.headers["Content-Type"] == "audio/mpeg"
+            assert response.read() == bytes(range(240, 256))
+
+        with urllib.request.urlopen(url) as response:
+            assert response.status == 200
+            assert len(response.read()) == 1024
+
+        request = urllib.request.Request(url, headers={"Range": "bytes=2048-"})
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request)
+        assert error.value.code == 416
+        assert error.value.headers["Content-Range"] == "bytes */1024"
+        error.value.close()
+
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url.rsplit("/", 1)[0] + "/unpublished.mp3")
+        assert error.value.code == 404
+        error.value.close()
+    finally:
+        server.stop()
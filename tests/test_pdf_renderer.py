@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+from modules.pdf_renderer import PdfRenderer
+
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "modules", "data", "fonts", "DejaVuSans.ttf")
+
+
+@pytest.fixture(scope="module")
+def renderer(tmp_path_factory):
+    return PdfRenderer(font_path=FONT_PATH, pdf_dir=str(tmp_path_factory.mktemp("pdf")))
+
+
+def test_text_outside_the_basic_plane_is_rendered(renderer):
+    data = renderer.render("Q: does it work? 🚀\n\nA: yes 😀, even with 𝔘nicode math")
+    assert data.startswith(b"%PDF")
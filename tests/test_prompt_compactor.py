@@ -0,0 +1,80 @@
+import ast
+
+import pytest
+
+from modules.prompt_compactor import COMPACTION_LEVELS, PromptCompactor
+
+SOURCE = '''"""
+Module docstring.
+
+With a second paragraph.
+"""
+
+import os  # trailing comment
+
+GREETING = "hash # inside a string stays"
+BANNER = "%s"
+
+
+class Store:
+    """Keeps things."""
+
+    def __init__(self, path):
+        """
+        Opens the store.
+        """
+        # Only a comment before the statement
+        self.path = path
+
+
+    def only_docstring(self):
+        """Nothing else in the body."""
+
+    async def fetch(self, key):
+        label = f"{key}: {'{0}'.format(key)} # not a comment"
+        return label
+
+
+def main():
+    # Comment-only line
+
+
+    return os.path.join(GREETING, BANNER)
+''' % ("x" * 300)
+
+
+@pytest.mark.parametrize("level", COMPACTION_LEVELS)
+def test_every_level_produces_code_that_parses(level):
+    compacted, report = PromptCompactor(level, token_budget=None).compact(SOURCE)
+
+    tree = ast.parse(compacted)
+    definitions = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    names = {node.name for node in ast.walk(tree) if isinstance(node, definitions)}
+    assert names == {"Store", "__init__", "only_docstring", "fetch", "main"}
+    assert "hash # inside a string stays" in compacted
+    assert report["level"] == level and not report["truncated"]
+
+
+def test_light_compaction_keeps_the_syntax_tree():
+    compacted, report = PromptCompactor("light", token_budget=None).compact(SOURCE)
+
+    assert ast.dump(ast.parse(compacted)) == ast.dump(ast.parse(SOURCE))
+    assert "Comment-only line" not in compacted
+    assert report["saved_tokens"] > 0
+
+
+def test_higher_levels_save_more_tokens():
+    compacted_tokens = [
+        PromptCompactor(level, token_budget=None).compact(SOURCE)[1]["compacted_tokens"]
+        for level in COMPACTION_LEVELS
+    ]
+    assert compacted_tokens == sorted(compacted_tokens, reverse=True)
+    assert compacted_tokens[0] > compacted_tokens[-1]
+
+
+def test_budget_cuts_at_a_line_boundary():
+    compacted, report = PromptCompactor("none", token_budget=20).compact(SOURCE)
+
+    assert report["truncated"]
+    kept = compacted.split("\n# ... ")[0]
+    assert SOURCE.startswith(kept)
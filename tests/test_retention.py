@@ -0,0 +1,96 @@
+import os
+import time
+
+from modules.retention import RetentionPolicy, sweep
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def write_file(directory, name, size=1000, age=0):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+    return os.path.abspath(path)
+
+
+def audio_name(digit, extension=".mp3"):
+    return digit * 64 + extension
+
+
+def policy(**limits):
+    return RetentionPolicy(**{"max_bytes": None, "orphan_grace_seconds": HOUR, **limits})
+
+
+def test_entries_older_than_the_age_limit_are_removed(make_history_manager):
+    manager = make_history_manager()
+    manager.add_chat({"question": "old?", "answer": "a", "created_at": time.time() - 10 * DAY})
+    manager.add_chat({"question": "new?", "answer": "b"})
+
+    report = sweep(manager, policy(max_age_days=5))
+
+    assert report["entries"]["chat"] == 1
+    assert [entry["question"] for entry in manager.load_chat_history()] == ["new?"]
+
+
+def test_entries_beyond_the_count_limit_are_removed_oldest_first(make_history_manager):
+    manager = make_history_manager()
+    alice = manager.for_namespace("alice")
+    for question in ("1?", "2?", "3?"):
+        manager.add_chat({"question": question, "answer": "a"})
+    alice.add_chat({"question": "alice?", "answer": "a"})
+
+    report = sweep(manager, policy(max_entries=2))
+
+    assert report["entries"]["chat"] == 1
+    assert [entry["question"] for entry in manager.load_chat_history()] == ["3?", "2?"]
+    assert [entry["question"] for entry in alice.load_chat_history()] == ["alice?"]
+
+
+def test_orphans_are_removed_after_the_grace_period(make_history_manager):
+    manager = make_history_manager()
+    audio_dir = manager.audio_dir
+    referenced = write_file(audio_dir, audio_name("a"), age=DAY)
+    old_orphan = write_file(audio_dir, audio_name("b"), age=DAY)
+    new_orphan = write_file(audio_dir, audio_name("c", ".wav"), age=0)
+    old_pdf = write_file(manager.pdf_dir, "expl_1.pdf", age=DAY)
+    foreign = write_file(audio_dir, "notes.mp3", age=DAY)
+    manager.add_explanation({"filename": "a.py", "explanation": "e", "audio_path": referenced})
+
+    report = sweep(manager, policy())
+
+    assert report["orphans"] == 2
+    assert not os.path.exists(old_orphan) and not os.path.exists(old_pdf)
+    assert os.path.exists(referenced) and os.path.exists(new_orphan) and os.path.exists(foreign)
+
+
+def test_size_budget_evicts_unreferenced_files_before_referenced_ones(make_history_manager):
+    manager = make_history_manager()
+    referenced = write_file(manager.audio_dir, audio_name("a"), age=DAY)
+    cached = write_file(manager.audio_dir, audio_name("b"), age=0)
+    manager.add_explanation({"filename": "a.py", "explanation": "e", "audio_path": referenced})
+
+    report = sweep(manager, policy(max_bytes=1500))
+
+    assert report["evicted"] == 1 and report["unlinked"] == 0
+    assert os.path.exists(referenced) and not os.path.exists(cached)
+    assert report["artifact_bytes"] == 1000
+
+
+def test_evicting_a_referenced_file_clears_its_path(make_history_manager):
+    manager = make_history_manager()
+    alice = manager.for_namespace("alice")
+    referenced = write_file(manager.audio_dir, audio_name("a"), age=DAY)
+    pdf = write_file(manager.pdf_dir, "expl_1.pdf", age=2 * DAY)
+    alice.add_explanation({"filename": "a.py", "explanation": "e", "audio_path": referenced, "pdf_path": pdf})
+
+    report = sweep(manager, policy(max_bytes=1000))
+
+    assert report["evicted"] == 1 and report["unlinked"] == 1
+    assert not os.path.exists(pdf) and os.path.exists(referenced)
+    entry, = alice.load_explanation_history()
+    assert entry.get("pdf_path") is None
+    assert entry["audio_path"] == referenced
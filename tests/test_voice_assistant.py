@@ -0,0 +1,24 @@
+import os
+from unittest import mock
+
+from modules.voice_assistant import VoiceAssistant
+
+
+def test_audio_cache_is_only_scanned_when_it_outgrows_its_limit(tmp_path):
+    with mock.patch("pyttsx3.init"):
+        assistant = VoiceAssistant(cache_dir=str(tmp_path), max_cache_bytes=10_000)
+    scans = []
+    evict = assistant._evict_cache
+    assistant._evict_cache = lambda keep=None: (scans.append(keep), evict(keep))
+
+    for index in range(100):
+        path = tmp_path / f"{index:03}.wav"
+        path.write_bytes(b"x" * 500)
+        os.utime(path, (index, index))
+        assistant._add_to_cache(str(path))
+
+    on_disk = sum(entry.stat().st_size for entry in tmp_path.iterdir())
+    assert on_disk <= 10_000
+    assert assistant._cache_bytes == on_disk
+    assert (tmp_path / "099.wav").exists()
+    assert len(scans) < 40  # one scan per two stores once full, instead of one per store